@@ -258,8 +258,8 @@ NIVEL 6: ANÁLISIS ESTADÍSTICO
     ├─→ Ejemplo resultado:
     │   RiskAction(
     │       type='Attack',
-    │       from_territory='Canada',
-    │       to_territory='Argentina',
+    │       from_territory=8,      # ids de territorio
+    │       to_territory=39,
     │       unidades=None
     │   )
     │
@@ -293,9 +293,10 @@ NIVEL 6: ANÁLISIS ESTADÍSTICO
     │
     ├─→ logfile.write(state.to_string())
     │
-    ├─→ logfile.write(action.to_string())
+    ├─→ logfile.write(action.to_string(state.board))
     │   │
     │   └─→ Formato: RISKACTION|"type"|to_territory|from_territory|unidades|...|
+    │       (con el board, los ids se escriben como nombres de territorio)
     │
     └─→ Logs acumulan iteración a iteración
 
@@ -0,0 +1,153 @@
+"""
+Servidor de Políticas PPO - Inferencia por lotes para torneos
+=============================================================
+
+En un torneo en paralelo (ver tournament.py) cada proceso carga su propia copia de cada modelo PPO
+y hace una pasada de la red por cada acción. Con un PolicyServer el modelo se carga una sola vez,
+en un proceso aparte, y los jugadores de todos los procesos le mandan su observación y su máscara:
+el servidor junta todas las peticiones que le han llegado y las resuelve con una sola pasada de la red.
+
+  - PolicyServer: lanza el proceso del servidor de un modelo (.zip) y guarda su dirección
+  - RemotePPOPlayer: PPOPlayer que pide las acciones al servidor en lugar de cargar el modelo
+
+Las acciones son las mismas que con PPOPlayer (predicción determinista); solo cambia dónde se calcula la red.
+match_engine.run_match(..., policy_server=True) crea los servidores de los modelos del torneo.
+"""
+
+import os
+import sys
+import secrets
+import threading
+import multiprocessing
+from multiprocessing.connection import Listener, Client, wait
+import numpy as np
+
+# Configurar rutas
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from ppo_loader import PPOPlayer
+
+
+def _serve(model_path, device, authkey, address_remote):
+    """Proceso del servidor: carga el modelo y responde a los jugadores por lotes"""
+    try:
+        from sb3_contrib import MaskablePPO
+        model = MaskablePPO.load(model_path, device=device)
+        listener = Listener(('127.0.0.1', 0), authkey=authkey)
+    except Exception as e:
+        address_remote.send((e, None))
+        return
+    address_remote.send((None, listener.address))
+    address_remote.close()
+
+    clients = []
+    lock = threading.Lock()
+
+    def accept():
+        # Los jugadores se conectan cuando los carga cada proceso del torneo
+        while True:
+            conn = listener.accept()
+            with lock:
+                clients.append(conn)
+
+    threading.Thread(target=accept, daemon=True).start()
+
+    while True:
+        with lock:
+            conns = list(clients)
+        requests = []
+        for conn in wait(conns, timeout=0.05):
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                with lock:
+                    clients.remove(conn)
+                continue
+            if message[0] == 'space':
+                conn.send(model.action_space)
+            else:
+                requests.append((conn, message[1], message[2]))
+        if not requests:
+            continue
+        # Una sola pasada de la red para todas las peticiones pendientes
+        obs = np.stack([obs for _, obs, _ in requests])
+        masks = np.stack([mask for _, _, mask in requests])
+        actions, _ = model.predict(obs, action_masks=masks, deterministic=True)
+        for (conn, _, _), action in zip(requests, actions):
+            conn.send(action)
+
+
+class PolicyServer():
+    """
+    Proceso que sirve las acciones de un modelo PPO a los RemotePPOPlayer de cualquier proceso.
+    Se cierra con close (o al salir de un bloque with).
+    """
+    def __init__(self, model_path, device='cpu', start_method=None):
+        self.model_path = PPOPlayer._resolve_model_path(model_path)
+        """ Ruta absoluta del modelo (.zip), resuelta como en PPOPlayer """
+
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(f"Modelo no encontrado: {self.model_path}")
+
+        self.authkey = secrets.token_bytes(16)
+        """ Clave que deben presentar los jugadores al conectarse """
+
+        if start_method is None:
+            # forkserver y spawn no heredan nada del proceso padre (ni modelos ni estado de torch)
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        ctx = multiprocessing.get_context(start_method)
+        remote, work_remote = ctx.Pipe(duplex=False)
+        self.process = ctx.Process(target=_serve, args=(self.model_path, device, self.authkey, work_remote), daemon=True)
+        self.process.start()
+        work_remote.close()
+        try:
+            error, self.address = remote.recv()
+        except EOFError:
+            error, self.address = RuntimeError(f"El servidor de {self.model_path} terminó sin arrancar"), None
+        remote.close()
+        if error is not None:
+            self.close()
+            raise error
+
+    def close(self):
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RemotePPOPlayer(PPOPlayer):
+    """PPOPlayer que pide las predicciones del modelo a un PolicyServer en lugar de cargarlo"""
+
+    def __init__(self, address, authkey, model_path, player_name="RL-Agent"):
+        self.address = address
+        self.authkey = authkey
+        self.conn = None
+        super().__init__(model_path, player_name=player_name)
+
+    def _load_model(self):
+        """Se conecta al servidor y prepara el entorno auxiliar con el espacio de acciones del modelo"""
+        try:
+            self.conn = Client(self.address, authkey=self.authkey)
+            self.conn.send(('space',))
+            self._setup(self.conn.recv())
+            print(f"[PPOPlayer] Conectado al servidor de políticas: {self.player_name}")
+            print(f"[PPOPlayer] Ruta: {self.model_path}")
+        except Exception as e:
+            print(f"[ERROR] No se pudo conectar al servidor de políticas: {e}")
+            raise
+
+    def _predict(self, obs, action_mask):
+        self.conn.send(('predict', obs, np.asarray(action_mask)))
+        return self.conn.recv()
+
+    def __repr__(self):
+        return f"RemotePPOPlayer(name='{self.player_name}', model='{os.path.basename(self.model_path)}')"
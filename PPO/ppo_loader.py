@@ -30,6 +30,7 @@ if parent_dir not in sys.path:
 from sb3_contrib import MaskablePPO
 import risktools
 from risk_gym_env import RiskTotalControlEnv
+from risk_obs_encoder import RiskObservationEncoder
 
 
 class PPOPlayer:
@@ -77,6 +78,8 @@ class PPOPlayer:
         self.device = device
         self.model = None
         self.helper_env = None
+        self.action_mode = "multidiscrete"
+        self.plan = None
         
         # Resolver ruta del modelo
         self.model_path = self._resolve_model_path(model_path)
@@ -90,7 +93,8 @@ class PPOPlayer:
         # Cargar modelo
         self._load_model()
         
-    def _resolve_model_path(self, model_path):
+    @staticmethod
+    def _resolve_model_path(model_path):
         """
         Resuelve la ruta del modelo a una ruta absoluta.
         
@@ -124,10 +128,7 @@ class PPOPlayer:
         """Carga el modelo PPO desde el archivo .zip"""
         try:
             self.model = MaskablePPO.load(self.model_path, device=self.device)
-            
-            # Crear entorno auxiliar para funciones helper
-            # (se usa solo para métodos auxiliares, no para paso por paso)
-            self.helper_env = RiskTotalControlEnv()
+            self._setup(self.model.action_space)
             
             print(f"[PPOPlayer] Modelo cargado exitosamente: {self.player_name}")
             print(f"[PPOPlayer] Ruta: {self.model_path}")
@@ -136,6 +137,33 @@ class PPOPlayer:
             print(f"[ERROR] No se pudo cargar el modelo: {e}")
             raise
     
+    def _setup(self, action_space):
+        """Prepara el entorno auxiliar y el encoder para un modelo con este espacio de acciones"""
+        # Crear entorno auxiliar para funciones helper
+        # (se usa solo para métodos auxiliares, no para paso por paso)
+        # Los modelos con espacio Discrete se entrenaron con action_mode="flat",
+        # y los MultiDiscrete de más de 4 dimensiones con action_mode="phase"
+        if action_space.shape == ():
+            self.action_mode = "flat"
+        elif action_space.shape[0] != 4:
+            self.action_mode = "phase"
+        else:
+            self.action_mode = "multidiscrete"
+        self.helper_env = RiskTotalControlEnv(action_mode=self.action_mode)
+        
+        # Encoder propio: reutiliza su buffer y solo recodifica el tablero cuando cambia
+        self.encoder = RiskObservationEncoder(self.helper_env.n_territories)
+    
+    def _predict(self, obs, action_mask):
+        """Acción del modelo (greedy) para una observación y su máscara"""
+        # MaskablePPO requiere: observación + máscara de acciones
+        action_encoded, _ = self.model.predict(
+            obs, 
+            action_masks=action_mask,
+            deterministic=True  # Modo determinista (greedy, no exploratorio)
+        )
+        return action_encoded
+    
     def getAction(self, state, time_left=None):
         """
         Devuelve la siguiente acción que debe ejecutar este jugador.
@@ -157,7 +185,7 @@ class PPOPlayer:
             La acción que debe ejecutar el modelo.
         """
         
-        if self.model is None:
+        if self.helper_env is None:
             print("[WARNING] Modelo no cargado, devolviendo acción aleatoria.")
             return self._get_random_action(state)
         
@@ -168,28 +196,23 @@ class PPOPlayer:
             self.helper_env.player_idx = state.current_player
             self.helper_env.n_territories = len(state.board.territories)
             
+            # En los modelos de fases el modelo decide una vez por fase y el plan da las acciones
+            if self.action_mode == "phase" and self.plan is not None and self.plan.player == state.current_player and not self.plan.done(state):
+                return self._checked_action(state, self.plan.next_action(state))
+            
             # 2. Obtener observación normalizada
-            obs = self.helper_env._get_obs()
+            obs = self.encoder.encode(state, state.current_player)
             
             # 3. Obtener máscara de acciones válidas
             action_mask = self.helper_env.action_masks()
             
             # 4. Predicción del modelo
-            # MaskablePPO requiere: observación + máscara de acciones
-            action_encoded, _ = self.model.predict(
-                obs, 
-                action_masks=action_mask,
-                deterministic=True  # Modo determinista (greedy, no exploratorio)
-            )
+            action_encoded = self._predict(obs, action_mask)
             
             # 5. Decodificar la acción de índices numéricos a RiskAction
             action_decoded = self._decode_action_from_encoded(state, action_encoded)
             
-            if action_decoded is None:
-                # Fallback: acción aleatoria
-                return self._get_random_action(state)
-            
-            return action_decoded
+            return self._checked_action(state, action_decoded)
             
         except Exception as e:
             print(f"[ERROR] Error en PPOPlayer.getAction: {e}")
@@ -206,8 +229,17 @@ class PPOPlayer:
         - Índice 1: Territorio origen (0-41)
         - Índice 2: Territorio destino (0-41)
         - Índice 3: Cantidad (0-9)
+        o, en los modelos flat, la posición en la tabla de acciones del mapa (ver FlatActionTable)
+        y, en los modelos de fases, el plan de la fase (ver PhasePlan), del que se devuelve su primera acción
         """
         
+        if self.action_mode == "flat":
+            return self.helper_env._decode_flat_action(int(action_encoded))
+        
+        if self.action_mode == "phase":
+            self.plan = self.helper_env._decode_phase_action(action_encoded)
+            return None if self.plan is None else self.plan.next_action(state)
+        
         type_idx, src_id, dst_id, amt_idx = action_encoded
         
         # Usar el método auxiliar del entorno
@@ -220,6 +252,16 @@ class PPOPlayer:
         
         return best_match
     
+    def _checked_action(self, state, action):
+        """
+        Devuelve action si es legal en state (los planes de fases usan ataques completos: macro=True)
+        y, si no, una acción aleatoria válida.
+        """
+        if action is None or not risktools.isLegal(state, action, macro=True):
+            # Fallback: acción aleatoria
+            return self._get_random_action(state)
+        return action
+    
     def _get_random_action(self, state):
         """
         Fallback: devuelve una acción aleatoria válida.
@@ -64,11 +64,11 @@ def getAction(state, time_left=None):
     print(f"Decisión PPO: Tipo={act_type}, Origen={act_src}, Dest={act_dst}, Cant={act_amt}")
     
     if real_action:
-        print(f"Acción Ejecutada: {real_action.to_string()}")
+        print(f"Acción Ejecutada: {real_action.to_string(state.board)}")
     else:
         print(f"Acción PPO Inválida (NULL). Fallback a Random.")
         real_action = random_action(state)
-        print(f"Acción Random: {real_action.to_string()}")
+        print(f"Acción Random: {real_action.to_string(state.board)}")
     print("="*40 + "\n")
     
     return real_action
@@ -0,0 +1,729 @@
+import os
+import sys
+import copy
+import numpy as np
+
+# Configuración de rutas
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+import risktools
+from config_atrib import *
+
+# Tipos de acción del motor por lotes (mismo nombre que RiskAction.type)
+KINDS = ('PreAssign', 'PrePlace', 'Comprar_Soldados', 'Place', 'Invertir', 'Festin',
+         'Attack', 'Occupy', 'Comercio', 'Casino', 'Fortify', 'Pasar')
+(K_PREASSIGN, K_PREPLACE, K_COMPRAR, K_PLACE, K_INVERTIR, K_FESTIN,
+ K_ATTACK, K_OCCUPY, K_COMERCIO, K_CASINO, K_FORTIFY, K_PASAR) = range(len(KINDS))
+K_NONE = -1  # El juego no se mueve en este paso
+
+FASES = ('fase_0', 'fase_1', 'fase_2', 'fase_3')
+
+TURN_TYPES = ('PreAssign', 'PrePlace', 'Place', 'Attack', 'Occupy', 'Fortify', 'GameOver',
+              'Fase 1', 'Fase 2', 'Fase 3', 'Comprar_Soldados')
+(T_PREASSIGN, T_PREPLACE, T_PLACE, T_ATTACK, T_OCCUPY, T_FORTIFY, T_GAMEOVER,
+ T_FASE1, T_FASE2, T_FASE3, T_COMPRAR) = range(len(TURN_TYPES))
+
+# Precio por unidad de las acciones económicas (ver acciones/comprarSoldados, invertir, festin, casino)
+KIND_PRICES = {K_COMPRAR: SOLDADOS_PRC, K_INVERTIR: INVERTIR_PRC, K_FESTIN: FESTIN_PRC, K_CASINO: CASINO_PRC}
+
+WINTER_MONTHS = (11, 12, 1, 2)
+
+
+def _round1(x):
+    """round(x, 1) elemento a elemento (los valores del juego son múltiplos de 0.1, sin empates)"""
+    return np.round(x, 1)
+
+
+class RiskBatchEngine():
+    """
+    Motor de reglas que avanza N partidas a la vez (en lockstep) sobre arrays de NumPy.
+
+    El estado se guarda como struct-of-arrays: owners/armies de forma [n_games, n_territories] y los
+    atributos de los jugadores de forma [n_games, n_players]. Cada llamada a step aplica una acción en cada
+    partida y la transición de fase (nextFase/advanceFase) de todas ellas con operaciones vectorizadas.
+    Las reglas son las del motor escalar (risktools): dados de invierno, felicidad, revoluciones,
+    economía y meses. to_state/load_state convierten una partida de/a RiskState.
+
+    Una acción del lote es una terna (kind, target, amount), un valor por partida:
+        kind:   índice en KINDS (K_NONE para no mover esa partida)
+        target: id de territorio para PreAssign/PrePlace/Place, arista (posición CSR de board.index)
+                para Attack/Fortify, o -1 para dejar de atacar / no fortificar
+        amount: unidades de las acciones económicas, Occupy y Fortify; en Attack, -1 es una sola tirada
+                y un valor >= 1 es un ataque completo hasta ese umbral (ver getBattleOutcomes)
+    Las acciones se suponen legales (como en modo EXEC_TRUSTED); is_legal permite comprobarlo.
+    """
+    STATE_FIELDS = ('owners', 'armies', 'free_armies', 'economy', 'happiness', 'development', 'conquered', 'game_over',
+                    'renamed', 'fase', 'turn_type', 'current_player', 'mes', 'turn_in_number', 'last_attacker', 'last_defender')
+    """ Arrays con el estado de las partidas (la primera dimensión es la partida) """
+
+    def __init__(self, board, n_games, seed=None):
+        """Creates n_games games on the given board (with its players) and resets them"""
+        index = board.index
+        self.board = board
+        """ The RiskBoard shared by every game """
+
+        self.n_games = n_games
+        self.n_players = len(board.players)
+        self.n_territories = index.n_territories
+
+        offsets = np.array(index.neighbor_offsets)
+        self.edge_src = np.repeat(np.arange(self.n_territories), np.diff(offsets))
+        """ Territorio de origen de cada arista (en el orden CSR de board.index y de board.action_pool.attack) """
+
+        self.edge_dst = np.array(index.neighbor_ids, dtype=np.int64)
+        """ Territorio de destino de cada arista """
+
+        self.n_edges = len(self.edge_dst)
+        self.edge_of = {(int(a), int(b)): e for e, (a, b) in enumerate(zip(self.edge_src, self.edge_dst))}
+        """ Diccionario (from, to) -> arista """
+
+        # tropas_aliadas_frontera compara los vecinos con el id del jugador (no con su dueño)
+        self.other_neighbor = np.array([[any(m != p for m in index.neighbors[t]) for t in range(self.n_territories)]
+                                        for p in range(self.n_players)], dtype=bool)
+
+        self.continent_territories = [np.array(c, dtype=np.int64) for c in index.continent_territories]
+        self.continent_rewards = np.array(index.continent_rewards)
+
+        # Tabla de tiradas (ATTACK_OUTCOMES) rellenada a 3 resultados por combinación de dados
+        self.dice_cum = np.ones((3, 3, 3))
+        self.dice_a_loss = np.zeros((3, 3, 3), dtype=np.int64)
+        self.dice_d_loss = np.zeros((3, 3, 3), dtype=np.int64)
+        for a in range(3):
+            for d in range(3):
+                outcomes = risktools.ATTACK_OUTCOMES[a][d]
+                self.dice_cum[a, d, :len(outcomes)] = np.cumsum([o[2] for o in outcomes])
+                self.dice_cum[a, d, len(outcomes)-1:] = np.inf
+                self.dice_a_loss[a, d, :len(outcomes)] = [o[0] for o in outcomes]
+                self.dice_d_loss[a, d, :len(outcomes)] = [o[1] for o in outcomes]
+
+        self.rng = np.random.default_rng(seed)
+        """ Generador para los dados y el casino """
+
+        n, t, p = n_games, self.n_territories, self.n_players
+        self.owners = np.full((n, t), -1, dtype=np.int64)
+        """ Dueño de cada territorio (-1 si no tiene) """
+
+        self.armies = np.zeros((n, t), dtype=np.int64)
+        self.free_armies = np.zeros((n, p), dtype=np.int64)
+        self.economy = np.zeros((n, p))
+        self.happiness = np.zeros((n, p), dtype=np.int64)
+        self.development = np.zeros((n, p))
+        self.conquered = np.zeros((n, p), dtype=bool)
+        self.game_over = np.zeros((n, p), dtype=bool)
+        self.renamed = np.zeros((n, p), dtype=bool)
+        """ Jugadores derrocados por una revolución (su nombre pasa a ser 'Muerto') """
+
+        self.fase = np.zeros(n, dtype=np.int64)
+        """ Índice en FASES """
+
+        self.turn_type = np.zeros(n, dtype=np.int64)
+        """ Índice en TURN_TYPES """
+
+        self.current_player = np.zeros(n, dtype=np.int64)
+        self.mes = np.zeros(n, dtype=np.int64)
+        self.turn_in_number = np.zeros(n, dtype=np.int64)
+        self.last_attacker = np.full(n, -1, dtype=np.int64)
+        self.last_defender = np.full(n, -1, dtype=np.int64)
+
+        self.reset()
+
+    def take(self, games):
+        """Returns a new engine with a copy of the given games (index array), sharing the board geometry and the generator"""
+        sub = copy.copy(self)
+        sub.n_games = len(games)
+        for name in self.STATE_FIELDS:
+            setattr(sub, name, getattr(self, name)[games])
+        return sub
+
+    def put(self, games, sub):
+        """Writes back into the given games the state of an engine returned by take"""
+        for name in self.STATE_FIELDS:
+            getattr(self, name)[games] = getattr(sub, name)
+
+    # ------------------------------------------------------------------------------------------
+    # Conversión con RiskState
+    # ------------------------------------------------------------------------------------------
+
+    def reset(self, games=None):
+        """Resets the given games (all by default) to the initial state of getInitialState"""
+        g = np.arange(self.n_games) if games is None else np.asarray(games)
+        players = self.board.players
+        self.owners[g] = -1
+        self.armies[g] = 0
+        self.free_armies[g] = 45 - 5*(self.n_players-1)
+        self.economy[g] = [p.economy for p in players]
+        self.happiness[g] = [p.happiness for p in players]
+        self.development[g] = [p.development for p in players]
+        self.conquered[g] = [bool(p.conquered_territory) for p in players]
+        self.game_over[g] = [bool(p.game_over) for p in players]
+        self.renamed[g] = False
+        self.fase[g] = 0
+        self.turn_type[g] = T_PREASSIGN
+        self.current_player[g] = 0
+        self.mes[g] = 6
+        self.turn_in_number[g] = 0
+        self.last_attacker[g] = -1
+        self.last_defender[g] = -1
+
+    def load_state(self, i, state):
+        """Copies a RiskState into game i"""
+        self.owners[i] = [-1 if o is None else o for o in state.owners]
+        self.armies[i] = list(state.armies)
+        for p, player in enumerate(state.players):
+            self.free_armies[i, p] = player.free_armies
+            self.economy[i, p] = player.economy
+            self.happiness[i, p] = player.happiness
+            self.development[i, p] = player.development
+            self.conquered[i, p] = bool(player.conquered_territory)
+            self.game_over[i, p] = bool(player.game_over)
+            self.renamed[i, p] = player.name == 'Muerto'
+        self.fase[i] = FASES.index(state.fase)
+        self.turn_type[i] = TURN_TYPES.index(state.turn_type)
+        self.current_player[i] = state.current_player
+        self.mes[i] = state.mes
+        self.turn_in_number[i] = state.turn_in_number
+        self.last_attacker[i] = -1 if state.last_attacker is None else state.last_attacker
+        self.last_defender[i] = -1 if state.last_defender is None else state.last_defender
+
+    def to_state(self, i):
+        """Returns game i as a new RiskState"""
+        players = []
+        for p, base in enumerate(self.board.players):
+            name = 'Muerto' if self.renamed[i, p] else base.name
+            players.append(risktools.RiskPlayer(name, base.id, int(self.free_armies[i, p]), bool(self.conquered[i, p]),
+                                                float(self.economy[i, p]), int(self.happiness[i, p]),
+                                                float(self.development[i, p]), bool(self.game_over[i, p])))
+        last_attacker = int(self.last_attacker[i])
+        last_defender = int(self.last_defender[i])
+        return risktools.RiskState(FASES[self.fase[i]], players, self.armies[i].tolist(),
+                                   [None if o < 0 else o for o in self.owners[i].tolist()],
+                                   int(self.current_player[i]), TURN_TYPES[self.turn_type[i]], int(self.turn_in_number[i]),
+                                   None if last_attacker < 0 else last_attacker, None if last_defender < 0 else last_defender,
+                                   self.board, int(self.mes[i]))
+
+    def encode_action(self, action):
+        """Returns the (kind, target, amount) of a RiskAction"""
+        kind = KINDS.index(action.type)
+        target, amount = -1, -1
+        if kind in (K_PREASSIGN, K_PREPLACE, K_PLACE):
+            target = action.to_territory
+        elif kind in (K_ATTACK, K_FORTIFY):
+            if action.from_territory is not None:
+                target = self.edge_of[(action.from_territory, action.to_territory)]
+        if action.unidades is not None:
+            amount = action.unidades
+        return kind, target, amount
+
+    def decode_action(self, i, kind, target, amount):
+        """Returns the pooled RiskAction of a (kind, target, amount) triple played in game i"""
+        pool = self.board.action_pool
+        kind, target, amount = int(kind), int(target), int(amount)
+        if kind == K_PREASSIGN:
+            return pool.pre_assign[target]
+        if kind == K_PREPLACE:
+            return pool.pre_place[target]
+        if kind == K_PLACE:
+            return pool.place[target]
+        if kind == K_ATTACK:
+            if target < 0:
+                return pool.attack_stop
+            return pool.attack[target] if amount < 0 else pool.get('Attack', int(self.edge_dst[target]), int(self.edge_src[target]), amount)
+        if kind == K_FORTIFY:
+            if target < 0:
+                return pool.fortify_stop
+            return pool.fortify_amounts(target, amount)[amount-1]
+        if kind == K_OCCUPY:
+            return pool.get('Occupy', int(self.last_defender[i]), int(self.last_attacker[i]), amount)
+        if kind in (K_COMERCIO, K_PASAR):
+            return pool.get(KINDS[kind])
+        return pool.get(KINDS[kind], None, None, amount)
+
+    # ------------------------------------------------------------------------------------------
+    # Acciones legales
+    # ------------------------------------------------------------------------------------------
+
+    def done(self):
+        """Boolean array with the games that have finished"""
+        return self.turn_type == T_GAMEOVER
+
+    def owned_mask(self):
+        """[n_games, n_territories] mask of the territories of the current player of each game"""
+        return self.owners == self.current_player[:, None]
+
+    def purchase_amounts(self, kind):
+        """
+        [n_games, 4] amounts offered for an economic action (25%, 50%, 75% and 100% of the maximum),
+        0 where the option does not exist
+        """
+        economy = self.economy[np.arange(self.n_games), self.current_player]
+        max_units = np.floor_divide(economy, KIND_PRICES[kind]).astype(np.int64)
+        quarter = max_units // 4
+        amounts = np.stack([quarter, quarter*2, quarter*3, max_units], axis=1)
+        amounts[quarter == 0, :3] = 0
+        amounts[quarter == 0, 0] = max_units[quarter == 0]
+        amounts[max_units < 1] = 0
+        return amounts
+
+    def territory_mask(self):
+        """[n_games, n_territories] valid targets of PreAssign (unowned) or of PrePlace/Place (owned)"""
+        return np.where((self.turn_type == T_PREASSIGN)[:, None], self.owners == -1, self.owned_mask())
+
+    def attack_mask(self):
+        """[n_games, n_edges] edges that can be attacked (from an own territory with 2 or more troops to a foreign one)"""
+        cp = self.current_player[:, None]
+        return (self.owners[:, self.edge_src] == cp) & (self.armies[:, self.edge_src] >= 2) & (self.owners[:, self.edge_dst] != cp)
+
+    def fortify_mask(self):
+        """[n_games, n_edges] edges that can be fortified (between own territories, the origin with 2 or more troops)"""
+        cp = self.current_player[:, None]
+        return (self.owners[:, self.edge_src] == cp) & (self.armies[:, self.edge_src] >= 2) & (self.owners[:, self.edge_dst] == cp)
+
+    def occupy_range(self):
+        """Minimum and maximum troops that an Occupy can move in each game (arrays lo, hi)"""
+        g = np.arange(self.n_games)
+        armies = self.armies[g, np.maximum(self.last_attacker, 0)]
+        return np.minimum(armies - 1, 3), armies - 1
+
+    def kind_mask(self):
+        """
+        [n_games, len(KINDS)] mask of the action types allowed in each game, as in getAllowedFaseActions
+        (only types with at least one action). Finished games have no allowed actions
+        """
+        n = self.n_games
+        g = np.arange(n)
+        cp = self.current_player
+        tt = self.turn_type
+        mask = np.zeros((n, len(KINDS)), dtype=bool)
+        owns_any = self.owned_mask().any(axis=1)
+        free = self.free_armies[g, cp]
+        economy = self.economy[g, cp]
+
+        forced = np.isin(tt, (T_PLACE, T_OCCUPY, T_PREASSIGN, T_PREPLACE, T_ATTACK, T_GAMEOVER))
+        mask[:, K_PLACE] = (tt == T_PLACE) & owns_any
+        lo, hi = self.occupy_range()
+        mask[:, K_OCCUPY] = (tt == T_OCCUPY) & (self.last_attacker >= 0) & (self.last_defender >= 0) & (lo <= hi)
+        mask[:, K_PREASSIGN] = (tt == T_PREASSIGN) & (self.owners == -1).any(axis=1)
+        mask[:, K_PREPLACE] = (tt == T_PREPLACE) & (free > 0) & owns_any
+        mask[:, K_ATTACK] = tt == T_ATTACK
+
+        f1 = ~forced & (self.fase == 1)
+        mask[:, K_COMPRAR] = f1 & (np.floor_divide(economy, SOLDADOS_PRC) >= 1)
+        mask[:, K_PLACE] |= f1 & (free > 0) & owns_any
+        mask[:, K_INVERTIR] = f1 & (np.floor_divide(economy, INVERTIR_PRC) >= 1)
+        mask[:, K_FESTIN] = f1 & (np.floor_divide(economy, FESTIN_PRC) >= 1)
+
+        f2 = ~forced & (self.fase == 2)
+        mask[:, K_ATTACK] |= f2
+        mask[:, K_COMERCIO] = f2
+        mask[:, K_CASINO] = f2 & (np.floor_divide(economy, CASINO_PRC) >= 1)
+
+        f3 = ~forced & (self.fase == 3)
+        mask[:, K_FORTIFY] = f3
+        mask[:, K_PASAR] = f1 | f2 | f3
+        return mask
+
+    def is_legal(self, kind, target, amount):
+        """Boolean array telling, for each game, whether the (kind, target, amount) action is allowed"""
+        n = self.n_games
+        g = np.arange(n)
+        kind, target, amount = np.asarray(kind), np.asarray(target), np.asarray(amount)
+        legal = np.zeros(n, dtype=bool)
+        kinds = self.kind_mask()
+        ok = (kind >= 0) & kinds[g, np.maximum(kind, 0)]
+        t = np.clip(target, 0, self.n_territories - 1)
+        e = np.clip(target, 0, self.n_edges - 1)
+
+        m = np.isin(kind, (K_PREASSIGN, K_PREPLACE, K_PLACE))
+        legal |= m & (target >= 0) & (target < self.n_territories) & self.territory_mask()[g, t]
+        m = np.isin(kind, (K_COMPRAR, K_INVERTIR, K_FESTIN, K_CASINO))
+        for k in KIND_PRICES:
+            mk = m & (kind == k)
+            if mk.any():
+                legal |= mk & (self.purchase_amounts(k) == amount[:, None]).any(axis=1) & (amount >= 1)
+        attack = self.attack_mask()[g, e]
+        legal |= (kind == K_ATTACK) & ((target < 0) & (amount < 0) | (target >= 0) & (target < self.n_edges) & attack & (amount != 0))
+        lo, hi = self.occupy_range()
+        legal |= (kind == K_OCCUPY) & (amount >= lo) & (amount <= hi)
+        fortify = self.fortify_mask()[g, e] & (amount >= 1) & (amount <= self.armies[g, self.edge_src[e]] - 1)
+        legal |= (kind == K_FORTIFY) & ((target < 0) | (target < self.n_edges) & fortify)
+        legal |= np.isin(kind, (K_COMERCIO, K_PASAR))
+        return ok & legal
+
+    def _choice(self, weights):
+        """Index chosen in each row of weights with probability proportional to its weight (-1 if all are 0)"""
+        cum = np.cumsum(weights, axis=1, dtype=np.float64)
+        r = self.rng.random(len(weights))*cum[:, -1]
+        return np.where(cum[:, -1] > 0, np.argmax(cum > r[:, None], axis=1), -1)
+
+    def sample_actions(self, flat=False):
+        """
+        Random legal action for every game (kind, target, amount arrays). Finished games get K_NONE.
+        By default the type is uniform among the allowed ones and then the target and amount are uniform.
+        With flat=True every action of getAllowedFaseActions (with Fortify and Occupy expanded) is equally likely,
+        like random.choice over the whole list
+        """
+        n = self.n_games
+        rng = self.rng
+        kinds = self.kind_mask()
+        territories = self.territory_mask()
+        attack = self.attack_mask()
+        fortify = self.fortify_mask()
+        moves = np.maximum(self.armies[:, self.edge_src] - 1, 0)*fortify
+        lo, hi = self.occupy_range()
+
+        if flat:
+            # Número de acciones de cada tipo
+            counts = kinds.astype(np.int64)
+            counts[:, K_PREASSIGN] *= territories.sum(axis=1)
+            counts[:, K_PREPLACE] *= territories.sum(axis=1)
+            counts[:, K_PLACE] *= territories.sum(axis=1)
+            for k in KIND_PRICES:
+                counts[:, k] *= (self.purchase_amounts(k) > 0).sum(axis=1)
+            counts[:, K_ATTACK] *= attack.sum(axis=1) + 1
+            counts[:, K_OCCUPY] *= np.maximum(hi - lo + 1, 0)
+            counts[:, K_FORTIFY] *= moves.sum(axis=1) + 1
+            kind = self._choice(counts)
+        else:
+            kind = self._choice(kinds)
+        target = np.full(n, -1, dtype=np.int64)
+        amount = np.full(n, -1, dtype=np.int64)
+
+        # Cada parámetro solo se sortea en las partidas que han elegido ese tipo
+        m = np.flatnonzero(np.isin(kind, (K_PREASSIGN, K_PREPLACE, K_PLACE)))
+        target[m] = self._choice(territories[m])
+
+        for k in KIND_PRICES:
+            m = np.flatnonzero(kind == k)
+            if len(m):
+                amounts = self.purchase_amounts(k)[m]
+                amount[m] = amounts[np.arange(len(m)), self._choice(amounts > 0)]
+
+        # Atacar por una arista o dejar de atacar (una opción más)
+        m = np.flatnonzero(kind == K_ATTACK)
+        e = self._choice(np.concatenate([attack[m], np.ones((len(m), 1), dtype=bool)], axis=1))
+        target[m] = np.where(e < self.n_edges, e, -1)
+
+        m = np.flatnonzero(kind == K_OCCUPY)
+        amount[m] = lo[m] + np.floor(rng.random(len(m))*(hi - lo + 1)[m]).astype(np.int64)
+
+        # Fortificar por una arista (cada cantidad cuenta como una acción si flat) o no fortificar
+        m = np.flatnonzero(kind == K_FORTIFY)
+        weights = (moves if flat else fortify)[m]
+        e = self._choice(np.concatenate([weights, np.ones((len(m), 1), dtype=weights.dtype)], axis=1))
+        moved = e < self.n_edges
+        top = self.armies[m, self.edge_src[np.minimum(e, self.n_edges - 1)]] - 1
+        target[m] = np.where(moved, e, -1)
+        amount[m] = np.where(moved, 1 + np.floor(rng.random(len(m))*np.maximum(top, 1)).astype(np.int64), 0)
+        return kind, target, amount
+
+    # ------------------------------------------------------------------------------------------
+    # Ejecución
+    # ------------------------------------------------------------------------------------------
+
+    def step(self, kind, target, amount, outcome=None):
+        """
+        Applies one action in every game (see the class docstring) and the phase transition.
+        outcome fija opcionalmente el resultado de los elementos aleatorios en cada partida: el outcome_index
+        del ataque (como en applyAction) o, en el casino, 1 si se gana la apuesta y 0 si se pierde
+        """
+        kind = np.asarray(kind, dtype=np.int64)
+        target = np.asarray(target, dtype=np.int64)
+        amount = np.asarray(amount, dtype=np.int64)
+        moving = (kind != K_NONE) & (self.turn_type != T_GAMEOVER)
+
+        for k in range(len(KINDS)):
+            g = np.flatnonzero(moving & (kind == k))
+            if len(g) == 0:
+                continue
+            o = None if outcome is None else np.asarray(outcome)[g]
+            self._execute(k, g, target[g], amount[g], o)
+
+        g = np.flatnonzero(moving)
+        self._next_fase(g, kind[g], target[g])
+
+    def _execute(self, k, g, target, amount, outcome):
+        """Executes the actions of type k in the games g (executeAction / simulateAttackAction)"""
+        cp = self.current_player[g]
+        if k == K_PREASSIGN:
+            self.owners[g, target] = cp
+            self.armies[g, target] = 1
+            self.free_armies[g, cp] -= 1
+        elif k == K_PREPLACE:
+            self.armies[g, target] += 1
+            self.free_armies[g, cp] -= 1
+        elif k == K_PLACE:
+            self.armies[g, target] += 1
+            self.free_armies[g, cp] -= 1
+            self.turn_type[g] = T_OCCUPY
+        elif k == K_COMPRAR:
+            self.economy[g, cp] = _round1(self.economy[g, cp] - _round1(SOLDADOS_PRC*amount))
+            self.free_armies[g, cp] += amount
+        elif k == K_INVERTIR:
+            self.economy[g, cp] = _round1(self.economy[g, cp] - _round1(INVERTIR_PRC*amount))
+            self.development[g, cp] = _round1(np.minimum(self.development[g, cp] + _round1(INVERTIR_DEVP*amount), 10.0))
+        elif k == K_FESTIN:
+            self.economy[g, cp] = _round1(self.economy[g, cp] - _round1(FESTIN_PRC*amount))
+            # Como en simulateFestinAction, la felicidad acaba valiendo int(development)
+            self.happiness[g, cp] = self.development[g, cp].astype(np.int64)
+        elif k == K_COMERCIO:
+            self.economy[g, cp] = _round1(self.economy[g, cp] + _round1(COMERCIO_DEVP*self.development[g, cp]))
+        elif k == K_CASINO:
+            bet = _round1(INVERTIR_PRC*amount)
+            win = self.rng.random(len(g)) > 0.48 if outcome is None else outcome == 1
+            economy = self.economy[g, cp] - bet
+            self.economy[g, cp] = _round1(np.where(win, economy + bet, economy - bet))
+        elif k == K_OCCUPY:
+            src, dst = self.last_attacker[g], self.last_defender[g]
+            self.armies[g, dst] += amount
+            self.armies[g, src] -= amount
+        elif k == K_FORTIFY:
+            m = target >= 0
+            g, e, amount = g[m], target[m], amount[m]
+            self.armies[g, self.edge_dst[e]] += amount
+            self.armies[g, self.edge_src[e]] -= amount
+        elif k == K_ATTACK:
+            m = target >= 0
+            self._attack(g[m], target[m], amount[m], None if outcome is None else outcome[m])
+
+    def _attack(self, g, e, stop, outcome):
+        """simulateAttackAction in the games g along the edges e (stop < 0: a single roll, else a full battle)"""
+        if len(g) == 0:
+            return
+        src, dst = self.edge_src[e], self.edge_dst[e]
+        cp = self.current_player[g]
+        self.last_attacker[g] = src
+        self.last_defender[g] = dst
+        defender = self.owners[g, dst]
+        winter = np.isin(self.mes[g], WINTER_MONTHS)
+        x = self.armies[g, src].copy()
+        y = self.armies[g, dst].copy()
+
+        single = stop < 0
+        s = np.flatnonzero(single)
+        if len(s):
+            x[s], y[s] = self._roll(x[s], y[s], winter[s], None if outcome is None else outcome[s])
+        b = np.flatnonzero(~single)
+        if len(b):
+            if outcome is not None:
+                for j in b:
+                    x[j], y[j], _ = risktools.getBattleOutcomes(int(x[j]), int(y[j]), bool(winter[j]), int(stop[j]))[outcome[j]]
+            else:
+                limit = np.maximum(stop[b], 1)
+                active = np.flatnonzero((y[b] > 0) & (x[b] > limit))
+                while len(active):
+                    j = b[active]
+                    x[j], y[j] = self._roll(x[j], y[j], winter[j], None)
+                    active = active[(y[j] > 0) & (x[j] > limit[active])]
+
+        self.armies[g, dst] = y
+        self.armies[g, src] = x
+
+        # Felicidad: primero el defensor y después el atacante, como en simulateAttackAction
+        conquered = y == 0
+        owned = defender >= 0
+        m = owned
+        self._update_happiness(g[m], defender[m], BONO_HAPP_DEFEND_WIN)
+        m = owned & conquered
+        self._update_happiness(g[m], cp[m], BONO_HAPP_ATTACK_WIN)
+        m = owned & ~conquered
+        self._update_happiness(g[m], cp[m], BONO_HAPP_ATTACK_LOSS)
+        self.owners[g[conquered], dst[conquered]] = cp[conquered]
+
+    def _roll(self, x, y, winter, outcome):
+        """One roll of the dice for attackers x against defenders y; returns the remaining troops"""
+        a_dice = np.minimum(3, x - 1) - 1
+        d_dice = np.minimum(np.where(winter, 3, 2), y) - 1
+        if outcome is None:
+            u = self.rng.random(len(x))
+            outcome = (u[:, None] >= self.dice_cum[a_dice, d_dice]).sum(axis=1)
+        a_loss = self.dice_a_loss[a_dice, d_dice, outcome]
+        d_loss = self.dice_d_loss[a_dice, d_dice, outcome]
+        return x - a_loss, np.maximum(y - d_loss, 0)
+
+    def _update_happiness(self, g, p, delta):
+        """updateHappiness for player p[j] of game g[j]"""
+        if len(g) == 0:
+            return
+        self.happiness[g, p] = np.clip(self.happiness[g, p] + delta, 0, 100)
+        self._check_revolution(g, p)
+
+    def _check_revolution(self, g, p):
+        """checkRevolucion for player p[j] of game g[j] (each game appears once)"""
+        m = (self.happiness[g, p] == 0) & ~self.game_over[g, p]
+        g, p = g[m], p[m]
+        if len(g) == 0:
+            return
+        own = self.owners[g] == p[:, None]
+        troops = (self.armies[g]*own).sum(axis=1)
+        count = own.sum(axis=1)
+
+        # El ejército se impone: pierde un soldado en todo territorio con más de uno
+        a = troops > 4*count
+        ga, pa = g[a], p[a]
+        self.happiness[ga, pa] += BONO_HAPP_AUTRT
+        self.development[ga, pa] = np.maximum(self.development[ga, pa] + PENL_DVP_REVOL, 0)
+        self.armies[ga] -= own[a] & (self.armies[ga] > 1)
+
+        # Derrocado: sus territorios quedan sin dueño
+        gd, pd = g[~a], p[~a]
+        self.owners[gd] = np.where(own[~a], -1, self.owners[gd])
+        self.game_over[gd, pd] = True
+        self.renamed[gd, pd] = True
+
+    def _next_fase(self, g, kind, target):
+        """nextFase + advanceFase for the games g, which have just executed an action of the given kind"""
+        if len(g) == 0:
+            return
+        cp = self.current_player[g]
+        fase = self.fase[g]
+        new_fase = fase.copy()
+        tt = self.turn_type[g].copy()
+        advance = np.zeros(len(g), dtype=bool)
+
+        dead = self.game_over[g, cp]
+        live = ~dead
+
+        # fase_0: organización del tablero
+        m = live & (fase == 0) & (kind == K_PREASSIGN)
+        advance |= m
+        tt[m & ~(self.owners[g] == -1).any(axis=1)] = T_PREPLACE
+        m = live & (fase == 0) & (kind == K_PREPLACE)
+        advance |= m
+        placed = m & (self.free_armies[g] == 0).all(axis=1)
+        new_fase[placed] = 1
+        tt[placed] = T_FASE1
+        advance[placed] = False
+
+        # fase_1
+        f1 = live & (fase == 1)
+        tt[f1 & (kind == K_COMPRAR)] = T_PLACE
+        to_f2 = f1 & np.isin(kind, (K_FESTIN, K_PASAR, K_INVERTIR))
+        m = f1 & (kind == K_PLACE)
+        tt[m] = T_PLACE
+        to_f2 |= m & (self.free_armies[g, cp] <= 0)
+        new_fase[to_f2] = 2
+        tt[to_f2] = T_FASE2
+
+        # fase_2
+        f2 = live & (fase == 2)
+        m = f2 & (kind == K_ATTACK)
+        ld = self.last_defender[g]
+        won = (ld >= 0) & (self.armies[g, np.maximum(ld, 0)] == 0)
+        tt[m & won] = T_OCCUPY
+        to_f3 = m & ~won & (target < 0)
+        m = f2 & (kind == K_OCCUPY)
+        tt[m] = T_ATTACK
+        tt[m & (self.owners[g] == cp[:, None]).all(axis=1)] = T_GAMEOVER
+        to_f3 |= f2 & np.isin(kind, (K_PASAR, K_CASINO, K_COMERCIO))
+        new_fase[to_f3] = 3
+        tt[to_f3] = T_FASE3
+
+        # fase_3: cualquier acción termina el turno
+        f3 = live & (fase == 3)
+        m = f3 & np.isin(kind, (K_FORTIFY, K_PASAR))
+        new_fase[m] = 1
+        tt[m] = T_FASE1
+        advance |= f3
+
+        # El jugador acaba de morir: termina su turno
+        new_fase[dead] = 1
+        tt[dead] = T_FASE1
+        advance |= dead
+
+        self.fase[g] = new_fase
+        self.turn_type[g] = tt
+
+        # advanceFase
+        a = g[advance & (tt != T_GAMEOVER)]
+        if len(a) == 0:
+            return
+        max_owner = self.owners[a].max(axis=1)
+        nobody = max_owner < 0
+        self.turn_type[a[nobody]] = T_GAMEOVER
+        b = a[~nobody]
+        month = (self.fase[b] != 0) & (self.current_player[b] == max_owner[~nobody])
+        self.mes[b[month]] = self.mes[b[month]] % 12 + 1
+        self._next_player(b)
+
+        c = a[self.fase[a] == 1]
+        self._update_happiness_fin_turno(c)
+        self._begin_turn(c)
+
+    def _next_player(self, g):
+        """nextPlayer: the next player in order that is still in the game"""
+        if len(g) == 0:
+            return
+        order = (self.current_player[g, None] + 1 + np.arange(self.n_players)) % self.n_players
+        alive = ~self.game_over[g[:, None], order]
+        self.current_player[g] = order[np.arange(len(g)), alive.argmax(axis=1)]
+        # Sin jugadores vivos el motor escalar no termina nunca; aquí se da la partida por acabada
+        self.turn_type[g[~alive.any(axis=1)]] = T_GAMEOVER
+
+    def _update_happiness_fin_turno(self, g):
+        """updateHappinessFinTurno for the current player of the games g"""
+        if len(g) == 0:
+            return
+        cp = self.current_player[g]
+        rows = np.arange(len(g))
+        owners = self.owners[g]
+        armies = self.armies[g]
+        src_own = owners[:, self.edge_src] == cp[:, None]
+        dst_owner = owners[:, self.edge_dst]
+        frontier = src_own & (dst_owner != cp[:, None])
+        players = np.arange(self.n_players)
+        touches = frontier[:, :, None] & (dst_owner[:, :, None] == players)
+        vecinos = touches.any(axis=1)
+        has_vecinos = vecinos.any(axis=1)
+        delta = np.zeros(len(g), dtype=np.int64)
+
+        # ECONOMIA (mismo bono si es el más rico o si no es el más pobre)
+        economy = self.economy[g]
+        mine = economy[rows, cp]
+        richest = np.where(vecinos, economy, -np.inf).max(axis=1)
+        poorest = np.where(vecinos, economy, np.inf).min(axis=1)
+        delta += np.where(has_vecinos, np.where((mine > richest) | (mine > poorest), BONO_HAPP_ECON_MED, BONO_HAPP_ECON_MAL), 0)
+
+        # FELICIDAD
+        happiness = self.happiness[g, cp]
+        delta += np.trunc((happiness - 50)/50*BONO_HAPP_HAPP).astype(np.int64)
+
+        # DESARROLLO
+        development = self.development[g]
+        mine = development[rows, cp]
+        least = np.where(vecinos, development, np.inf).min(axis=1)
+        delta += np.where(has_vecinos & (mine > least), BONO_HAPP_DEVP_MED, 0)
+
+        # SOLDADOS (ver tropas_enemigas_frontera: los territorios sin dueño cuentan con el último visto)
+        dst_armies = armies[:, self.edge_dst]
+        enemies = (touches*dst_armies[:, :, None]).sum(axis=1).astype(np.float64)
+        enemies = np.where(vecinos, enemies, -np.inf).max(axis=1)
+        free = frontier & (dst_owner == -1)
+        has_free = free.any(axis=1)
+        last_free = self.n_edges - 1 - free[:, ::-1].argmax(axis=1)
+        enemies = np.where(has_free, np.maximum(enemies, dst_armies[rows, last_free]), enemies)
+        allies = (armies*(owners == cp[:, None])*self.other_neighbor[cp]).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            worst = enemies/allies
+        any_enemy = has_vecinos | has_free
+        delta += np.where(any_enemy, np.where(worst < 0.5, BONO_HAPP_SOLD_EXC, np.where(worst < 2, BONO_HAPP_SOLD_MED, BONO_HAPP_SOLD_MAL)), 0)
+
+        self.happiness[g, cp] = np.clip(happiness + delta, 0, 100)
+        self._check_revolution(g, cp)
+
+    def _begin_turn(self, g):
+        """beginTurn: income of the current player of the games g (or game over if there is none)"""
+        if len(g) == 0:
+            return
+        cp = self.current_player[g]
+        owned = self.owners[g] == cp[:, None]
+        posesion = owned.sum(axis=1)*IMPUESTOS
+        for c, territories in enumerate(self.continent_territories):
+            posesion = posesion + np.where(owned[:, territories].all(axis=1), self.continent_rewards[c]*10, 0)
+        money = _round1(posesion + posesion*self.development[g, cp])
+        paid = money > 0
+        self.economy[g[paid], cp[paid]] += money[paid]
+        self.game_over[g[~paid], cp[~paid]] = True
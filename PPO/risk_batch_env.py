@@ -0,0 +1,447 @@
+import os
+import sys
+import numpy as np
+from gymnasium import spaces
+
+# Configuración de rutas
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+import risktools
+from config_atrib import *
+from risk_gym_env import MAX_STEPS, multiplicador, FlatActionTable
+from risk_batch_engine import *
+
+# Tipos de acción del agente (ver RiskTotalControlEnv._decode_action)
+N_ACTION_TYPES = 7
+N_AMOUNTS = 10
+(A_PASAR, A_COMPRAR, A_PLACE, A_ATTACK, A_OCCUPY, A_FORTIFY, A_INVERTIR) = range(N_ACTION_TYPES)
+
+
+class RiskBatchEnv():
+    """
+    Versión vectorizada de RiskTotalControlEnv: n_envs partidas independientes que avanzan a la vez
+    sobre un RiskBatchEngine, con las mismas observaciones, máscaras, decodificación de acciones,
+    recompensas y turnos de los bots (acción aleatoria uniforme entre todas las legales).
+
+    Las observaciones, máscaras y recompensas se escriben en arrays preasignados (ver buffers),
+    que se reutilizan en cada paso. Las partidas que terminan se reinician solas dentro de step;
+    su última observación queda en terminal_obs.
+    """
+    metadata = {'render_modes': []}
+    render_mode = None
+
+    def __init__(self, n_envs, style="standard", max_steps=MAX_STEPS, n_players=4, macro_attack=False, action_mode="multidiscrete",
+                 seed=None, buffers=None):
+        """
+        Args:
+            n_envs (int): Número de partidas simultáneas.
+            action_mode (str): "multidiscrete" o "flat", como en RiskTotalControlEnv.
+            seed (int): Semilla del generador de los repartos, los dados y los bots.
+            buffers (dict): Arrays donde escribir los resultados (obs, masks, rewards, terminated, truncated,
+                valid, terminal_obs), por ejemplo vistas de memoria compartida. Por defecto se crean aquí.
+        """
+        if action_mode not in ("multidiscrete", "flat"):
+            # action_mode="phase" ejecuta planes de una fase entera: solo con RiskTotalControlEnv
+            raise ValueError(f"action_mode no soportado por RiskBatchEnv: {action_mode}")
+        self.n_envs = n_envs
+        self.max_steps = max_steps
+        self.macro_attack = macro_attack
+        self.action_mode = action_mode
+        self.style = style
+        self.n_players = n_players
+        self.player_idx = 0 # La IA siempre es el Jugador 0
+
+        # Un solo tablero para todas las partidas, con los mismos jugadores que RiskTotalControlEnv
+        self.board = risktools.loadBoard(os.path.join(parent_dir, "world.zip"))
+        self.board.add_player(risktools.RiskPlayer(f"Agent_{self.style}", 0, 0, False, ECON_START, HAPP_START, DEVP_START))
+        for i in range(1, self.n_players):
+            self.board.add_player(risktools.RiskPlayer(f"Enemy_Bot_{i}", i, 0, False, ECON_START, HAPP_START, DEVP_START))
+        self.n_territories = len(self.board.territories)
+
+        self.engine = RiskBatchEngine(self.board, n_envs, seed)
+        """ Estado de todas las partidas """
+
+        self.flat_table = None
+        if action_mode == "flat":
+            self.flat_table = FlatActionTable(self.board)
+            self.action_space = spaces.Discrete(self.flat_table.n)
+        else:
+            self.action_space = spaces.MultiDiscrete([N_ACTION_TYPES, self.n_territories, self.n_territories, N_AMOUNTS])
+        self.obs_dim = (self.n_territories * 3) + 20
+        self.observation_space = spaces.Box(low=0, high=1, shape=(self.obs_dim,), dtype=np.float32)
+
+        shapes = self.buffer_specs(n_envs, self.n_territories, self.flat_table)
+        buffers = buffers or dict()
+        for name, (shape, dtype) in shapes.items():
+            setattr(self, name, buffers[name] if name in buffers else np.zeros(shape, dtype=dtype))
+
+        self.step_count = np.zeros(n_envs, dtype=np.int64)
+        """ Pasos del agente en la partida actual de cada entorno """
+
+        # Matrices aristas -> territorios para las máscaras de origen y destino
+        n_edges = self.engine.n_edges
+        self.edge_src_onehot = np.zeros((n_edges, self.n_territories), dtype=np.float32)
+        self.edge_src_onehot[np.arange(n_edges), self.engine.edge_src] = 1
+        self.edge_dst_onehot = np.zeros((n_edges, self.n_territories), dtype=np.float32)
+        self.edge_dst_onehot[np.arange(n_edges), self.engine.edge_dst] = 1
+
+    @staticmethod
+    def buffer_specs(n_envs, n_territories, flat_table=None):
+        """Shape and dtype of each output buffer for n_envs games on a map with n_territories (and the flat_table of the flat mode)"""
+        obs_dim = (n_territories * 3) + 20
+        mask_dim = N_ACTION_TYPES + 2*n_territories + N_AMOUNTS if flat_table is None else flat_table.n
+        return {
+            'obs': ((n_envs, obs_dim), np.float32),
+            'terminal_obs': ((n_envs, obs_dim), np.float32),
+            'masks': ((n_envs, mask_dim), bool),
+            'rewards': ((n_envs,), np.float32),
+            'terminated': ((n_envs,), bool),
+            'truncated': ((n_envs,), bool),
+            'valid': ((n_envs,), bool),
+        }
+
+    def seed(self, seed=None):
+        """Reseeds the generator used for setups, dice and bots"""
+        self.engine.rng = np.random.default_rng(seed)
+
+    def reset(self, games=None):
+        """Starts new games in the given environments (all by default) and returns the observation buffer"""
+        g = np.arange(self.n_envs) if games is None else np.asarray(games)
+        if len(g) == 0:
+            return self.obs
+        engine = self.engine
+        engine.reset(g)
+        self.step_count[g] = 0
+
+        # Setup rápido (como make_opening_state): territorios barajados y repartidos en ciclo, 3 tropas en cada uno
+        order = np.argsort(engine.rng.random((len(g), self.n_territories)), axis=1)
+        engine.owners[g[:, None], order] = np.arange(self.n_territories) % self.n_players
+        engine.armies[g] = 3
+        engine.fase[g] = FASES.index('fase_1')
+        engine.turn_type[g] = T_COMPRAR
+
+        self._encode(g, self.obs)
+        return self.obs
+
+    def step(self, actions):
+        """
+        Applies one agent action ([type, src, dst, amount], or a table position in the flat mode) in every game, plays the bots
+        until it is the agent's turn again and returns (obs, rewards, terminated, truncated).
+        Finished games are reset (see terminal_obs)
+        """
+        engine = self.engine
+        actions = np.asarray(actions, dtype=np.int64)
+        n = self.n_envs
+        self.step_count += 1
+
+        # 1. DECODIFICACIÓN
+        if self.action_mode == "flat":
+            kind, target, amount, valid = self._decode_flat(actions)
+        else:
+            kind, target, amount, valid = self._decode(actions)
+        self.valid[:] = valid
+        self.rewards[:] = -1.0
+        self.terminated[:] = False
+        self.truncated[:] = False
+
+        # 2. EJECUCIÓN
+        engine.step(np.where(valid, kind, K_NONE), target, amount)
+
+        # 3. RECOMPENSA
+        reward = self._calculate_reward()
+        terminated = np.zeros(n, dtype=bool)
+
+        # 4. CONTROL DE FLUJO
+        g = np.arange(n)
+        over = valid & (engine.turn_type == T_GAMEOVER)
+        alive = ~engine.game_over
+        won = alive[:, self.player_idx] & (alive.sum(axis=1) == 1)
+        reward += np.where(over, np.where(won, 10_000 + (MAX_STEPS - self.step_count)*multiplicador[self.style], -10_000), 0)
+        terminated |= over
+
+        # Si NO es mi turno, simular a TODOS los enemigos hasta que me toque
+        enemy = valid & ~over & (engine.current_player != self.player_idx)
+        if enemy.any():
+            self._simulate_enemy_turns(enemy)
+            dead = enemy & engine.game_over[:, self.player_idx]
+            reward -= np.where(dead, 5_000 * multiplicador[self.style], 0)
+            terminated |= dead | (enemy & (engine.turn_type == T_GAMEOVER))
+
+        truncated = valid & (self.step_count >= self.max_steps)
+        my_territories = (engine.owners == self.player_idx).sum(axis=1)
+        reward -= np.where(truncated & ~terminated, 15_000*(self.n_territories - my_territories), 0)
+
+        # Las acciones no válidas solo reciben -1
+        self.rewards[valid] = reward[valid]
+        self.terminated[:] = terminated
+        self.truncated[:] = truncated
+
+        done = np.flatnonzero(terminated | truncated)
+        self._encode(g, self.obs)
+        if len(done):
+            self.terminal_obs[done] = self.obs[done]
+            self.reset(done)
+        return self.obs, self.rewards, self.terminated, self.truncated
+
+    def _simulate_enemy_turns(self, games):
+        """Plays random bot actions in the given games until it is the agent's turn (or the game ends)"""
+        # Se simula sobre una copia compacta de las partidas pendientes, que se va reduciendo a medida
+        # que terminan los turnos de los bots (cada paso solo cuesta lo que las partidas que siguen activas)
+        g = np.flatnonzero(games)
+        sub = self.engine.take(g)
+        max_sim_steps = 50 * (self.n_players - 1)
+        for steps in range(max_sim_steps):
+            kind, target, amount = sub.sample_actions(flat=True)
+            # Si un bot no tiene acciones pero no es GameOver, se deja de simular esa partida
+            active = (sub.current_player != self.player_idx) & (sub.turn_type != T_GAMEOVER) & (kind != K_NONE)
+            if not active.all():
+                self.engine.put(g, sub)
+                keep = np.flatnonzero(active)
+                if len(keep) == 0:
+                    return
+                g, sub = g[keep], sub.take(keep)
+                kind, target, amount = kind[keep], target[keep], amount[keep]
+            sub.step(kind, target, amount)
+        self.engine.put(g, sub)
+
+    def _calculate_reward(self):
+        """Reward of the agent in every game (see RiskTotalControlEnv._calculate_reward)"""
+        engine = self.engine
+        p = self.player_idx
+        my_territories = (engine.owners == p).sum(axis=1)
+        reward = np.minimum(engine.happiness[:, p], 50)*0.01
+        if self.style == "standard":
+            reward = reward + my_territories * 0.05
+        elif self.style == "aggressive":
+            reward = reward + my_territories * 0.1
+            reward = reward + np.where(engine.conquered[:, p], 2.0, 0)
+        elif self.style == "defensive":
+            total_troops = (engine.armies*(engine.owners == p)).sum(axis=1)
+            reward = reward + total_troops * 0.001
+            reward = reward + 0.5
+        elif self.style == "capitalist":
+            reward = reward + engine.development[:, p] * 0.1
+        return reward
+
+    def _encode(self, g, out):
+        """Writes the observation of the games g into out[g] (see RiskObservationEncoder)"""
+        engine = self.engine
+        p = self.player_idx
+        t = self.n_territories
+        owners = engine.owners[g]
+        obs = np.zeros((len(g), self.obs_dim), dtype=np.float64)
+
+        # A. Datos de Territorios
+        obs[:, 0:3*t:3] = owners == p
+        obs[:, 1:3*t:3] = (owners >= 0) & (owners != p)
+        obs[:, 2:3*t:3] = np.minimum(engine.armies[g] / 100.0, 1.0)
+
+        # B. Datos Económicos y Globales (los enemigos muertos cuentan con 0)
+        enemies = np.arange(self.n_players) != p
+        enemy_econs = np.where(engine.game_over[g][:, enemies], 0, engine.economy[g][:, enemies])
+        max_enemy_econ = enemy_econs.max(axis=1) if enemies.any() else np.zeros(len(g))
+        obs[:, 3*t] = np.minimum(engine.economy[g, p] / 200.0, 1.0)
+        obs[:, 3*t+1] = np.minimum(engine.free_armies[g, p] / 50.0, 1.0)
+        obs[:, 3*t+2] = np.minimum(max_enemy_econ / 200.0, 1.0)
+        obs[:, 3*t+3] = np.minimum(engine.armies[g].sum(axis=1) / 500.0, 1.0)
+
+        # C. Fase del Turno
+        obs[np.arange(len(g)), 3*t+4+engine.fase[g]] = 1.0
+        out[g] = obs
+
+    def action_masks(self):
+        """Fills and returns the mask buffer ([type(7), src, dst, amount(10)] per environment, or the flat table mask)"""
+        if self.action_mode == "flat":
+            return self._flat_masks()
+        engine = self.engine
+        n, t = self.n_envs, self.n_territories
+        kinds = engine.kind_mask()
+        masks = self.masks
+        masks[:] = False
+
+        types = masks[:, :N_ACTION_TYPES]
+        types[:, A_PASAR] = kinds[:, K_PASAR]
+        types[:, A_COMPRAR] = kinds[:, K_COMPRAR]
+        types[:, A_PLACE] = kinds[:, K_PLACE] | kinds[:, K_PREPLACE]
+        types[:, A_ATTACK] = kinds[:, K_ATTACK]
+        types[:, A_OCCUPY] = kinds[:, K_OCCUPY]
+        types[:, A_FORTIFY] = kinds[:, K_FORTIFY]
+        types[:, A_INVERTIR] = kinds[:, K_INVERTIR]
+        types[~types.any(axis=1), A_PASAR] = True
+        only_pasar = types[:, A_PASAR] & (types.sum(axis=1) == 1)
+
+        # Origen y destino de todas las acciones permitidas (0 para los que son None)
+        src = masks[:, N_ACTION_TYPES:N_ACTION_TYPES+t]
+        dst = masks[:, N_ACTION_TYPES+t:N_ACTION_TYPES+2*t]
+        without_to = (K_COMPRAR, K_INVERTIR, K_FESTIN, K_COMERCIO, K_CASINO, K_PASAR, K_ATTACK, K_FORTIFY)
+        src[:, 0] = np.delete(kinds, K_OCCUPY, axis=1).any(axis=1)
+        dst[:, 0] = kinds[:, without_to].any(axis=1)
+        territories = engine.territory_mask() & kinds[:, [K_PREASSIGN, K_PREPLACE, K_PLACE]].any(axis=1)[:, None]
+        dst |= territories
+        edges = (engine.attack_mask() & kinds[:, K_ATTACK, None]) | (engine.fortify_mask() & kinds[:, K_FORTIFY, None])
+        edges = edges.astype(np.float32)
+        src |= (edges @ self.edge_src_onehot) > 0
+        dst |= (edges @ self.edge_dst_onehot) > 0
+        g = np.flatnonzero(kinds[:, K_OCCUPY])
+        src[g, engine.last_attacker[g]] = True
+        dst[g, engine.last_defender[g]] = True
+
+        src[only_pasar] = False
+        dst[only_pasar] = False
+        src[only_pasar, 0] = True
+        dst[only_pasar, 0] = True
+        masks[:, N_ACTION_TYPES+2*t:] = True
+        return masks
+
+    def _decode(self, actions):
+        """
+        Vectorized RiskTotalControlEnv._decode_action: returns (kind, target, amount, valid) arrays.
+        The best match is the first legal action (in generator order) with the most coincidences of src/dst
+        """
+        engine = self.engine
+        n = self.n_envs
+        g = np.arange(n)
+        type_idx, src_id, dst_id = actions[:, 0], actions[:, 1], actions[:, 2]
+        kinds = engine.kind_mask()
+        kind = np.full(n, K_NONE, dtype=np.int64)
+        target = np.full(n, -1, dtype=np.int64)
+        amount = np.full(n, -1, dtype=np.int64)
+
+        kind[type_idx == A_PASAR] = K_PASAR
+        for a, k in ((A_COMPRAR, K_COMPRAR), (A_INVERTIR, K_INVERTIR)):
+            m = type_idx == a
+            kind[m] = k
+            amount[m] = engine.purchase_amounts(k)[m, 0]
+
+        # Place (o PrePlace): el territorio pedido si es válido, si no el primero
+        m = type_idx == A_PLACE
+        kind[m] = np.where(engine.turn_type == T_PREPLACE, K_PREPLACE, K_PLACE)[m]
+        territories = engine.territory_mask()
+        wanted = territories[g, np.clip(dst_id, 0, self.n_territories-1)] & (dst_id < self.n_territories)
+        target[m] = np.where(wanted, dst_id, np.argmax(territories, axis=1))[m]
+
+        # Attack / Fortify: la arista con más coincidencias; sin aristas, dejar de atacar / no fortificar
+        score = (engine.edge_src == src_id[:, None]).astype(np.int64) + (engine.edge_dst == dst_id[:, None])
+        for a, k, legal in ((A_ATTACK, K_ATTACK, engine.attack_mask()), (A_FORTIFY, K_FORTIFY, engine.fortify_mask())):
+            m = type_idx == a
+            kind[m] = k
+            best = np.argmax(np.where(legal, score, -1), axis=1)
+            has_edge = legal.any(axis=1)
+            target[m] = np.where(has_edge, best, -1)[m]
+            if k == K_ATTACK:
+                amount[m] = np.where(has_edge & self.macro_attack, 1, -1)[m]
+            else:
+                amount[m] = np.where(has_edge, 1, 0)[m]
+
+        # Occupy: la cantidad mínima
+        m = type_idx == A_OCCUPY
+        kind[m] = K_OCCUPY
+        amount[m] = engine.occupy_range()[0][m]
+
+        valid = (kind != K_NONE) & kinds[g, np.maximum(kind, 0)]
+        return kind, target, amount, valid
+
+    # ------------------------------------------------------------------------------------------
+    # Modo flat (ver FlatActionTable)
+    # ------------------------------------------------------------------------------------------
+
+    def _economic_slots(self, k):
+        """[n_envs, 4] amounts of an economic action in the table slots (25%, 50%, 75%, 100%), 0 if not offered"""
+        amounts = self.engine.purchase_amounts(k)
+        # Una sola opción cuando no llega para el 25%: es la del 100%
+        single = amounts[:, 1] == 0
+        amounts[single, 3] = amounts[single, 0]
+        amounts[single, 0] = 0
+        return amounts
+
+    def _range_slots(self, lo, hi):
+        """[..., 3] amounts (minimum, half, maximum) of range actions and [..., 3] mask of the distinct ones"""
+        amounts = np.stack([lo, lo + (hi - lo)//2, hi], axis=-1)
+        distinct = np.stack([np.ones_like(lo, dtype=bool), hi - lo >= 2, hi > lo], axis=-1)
+        return amounts, distinct
+
+    def _flat_masks(self):
+        """Exact mask of the legal positions of the flat table in each game"""
+        engine = self.engine
+        table = self.flat_table
+        off = table.offsets
+        n, t, e = self.n_envs, self.n_territories, engine.n_edges
+        kinds = engine.kind_mask()
+        masks = self.masks
+        masks[:] = False
+
+        masks[:, off['Pasar']] = kinds[:, K_PASAR]
+        masks[:, off['Comercio']] = kinds[:, K_COMERCIO]
+        for name, k in zip(table.ECONOMIC, (K_COMPRAR, K_INVERTIR, K_FESTIN, K_CASINO)):
+            masks[:, off[name]:off[name]+4] = (self._economic_slots(k) > 0) & kinds[:, k, None]
+        territories = engine.territory_mask()
+        for name, k in (('PreAssign', K_PREASSIGN), ('PrePlace', K_PREPLACE), ('Place', K_PLACE)):
+            masks[:, off[name]:off[name]+t] = territories & kinds[:, k, None]
+        masks[:, off['Attack']:off['Attack']+e] = engine.attack_mask() & kinds[:, K_ATTACK, None]
+        masks[:, off['Attack_stop']] = kinds[:, K_ATTACK]
+
+        lo, hi = engine.occupy_range()
+        masks[:, off['Occupy']:off['Occupy']+3] = self._range_slots(lo, hi)[1] & kinds[:, K_OCCUPY, None]
+        top = engine.armies[:, engine.edge_src] - 1
+        fortify = engine.fortify_mask() & kinds[:, K_FORTIFY, None]
+        distinct = self._range_slots(np.ones_like(top), top)[1] & fortify[:, :, None]
+        masks[:, off['Fortify']:off['Fortify']+3*e] = distinct.reshape(n, 3*e)
+        masks[:, off['Fortify_stop']] = kinds[:, K_FORTIFY]
+
+        # MaskablePPO necesita al menos una acción: sin acciones legales se deja Pasar (y no es válida)
+        masks[~masks.any(axis=1), off['Pasar']] = True
+        return masks
+
+    def _decode_flat(self, actions):
+        """(kind, target, amount, valid) arrays of the flat table positions chosen in each game"""
+        engine = self.engine
+        off = self.flat_table.offsets
+        n = self.n_envs
+        g = np.arange(n)
+        actions = np.asarray(actions, dtype=np.int64).reshape(n)
+        legal = self._flat_masks()[g, np.clip(actions, 0, self.flat_table.n - 1)] & (actions >= 0) & (actions < self.flat_table.n)
+        kind = np.full(n, K_NONE, dtype=np.int64)
+        target = np.full(n, -1, dtype=np.int64)
+        amount = np.full(n, -1, dtype=np.int64)
+
+        def block(name, size=1):
+            m = (actions >= off[name]) & (actions < off[name] + size)
+            return m, actions - off[name]
+
+        kind[block('Pasar')[0]] = K_PASAR
+        kind[block('Comercio')[0]] = K_COMERCIO
+        for name, k in zip(self.flat_table.ECONOMIC, (K_COMPRAR, K_INVERTIR, K_FESTIN, K_CASINO)):
+            m, rel = block(name, 4)
+            kind[m] = k
+            amount[m] = self._economic_slots(k)[g[m], rel[m]]
+        for name, k in (('PreAssign', K_PREASSIGN), ('PrePlace', K_PREPLACE), ('Place', K_PLACE)):
+            m, rel = block(name, self.n_territories)
+            kind[m] = k
+            target[m] = rel[m]
+        m, rel = block('Attack', engine.n_edges)
+        kind[m] = K_ATTACK
+        target[m] = rel[m]
+        amount[m] = 1 if self.macro_attack else -1
+        kind[block('Attack_stop')[0]] = K_ATTACK
+
+        m, rel = block('Occupy', 3)
+        kind[m] = K_OCCUPY
+        lo, hi = engine.occupy_range()
+        amount[m] = self._range_slots(lo, hi)[0][g[m], rel[m]]
+        m, rel = block('Fortify', 3*engine.n_edges)
+        e, slot = rel[m] // 3, rel[m] % 3
+        top = engine.armies[g[m], engine.edge_src[e]] - 1
+        kind[m] = K_FORTIFY
+        target[m] = e
+        amount[m] = self._range_slots(np.ones_like(top), top)[0][np.arange(len(e)), slot]
+        m = block('Fortify_stop')[0]
+        kind[m] = K_FORTIFY
+        amount[m] = 0
+
+        kinds = engine.kind_mask()
+        valid = legal & (kind != K_NONE) & kinds[g, np.maximum(kind, 0)]
+        return kind, target, amount, valid
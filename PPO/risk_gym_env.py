@@ -15,6 +15,8 @@ if parent_dir not in sys.path:
 
 import risktools
 from config_atrib import *
+from risk_obs_encoder import RiskObservationEncoder
+from risk_state_pool import RiskInitialStatePool
 
 multiplicador={
     "standard":3,
@@ -30,13 +32,26 @@ class RiskTotalControlEnv(gym.Env):
     """
     metadata = {'render_modes': ['human']}
 
-    def __init__(self, enemy_ai_class=None, style="standard", max_steps=MAX_STEPS, n_players=4):
+    def __init__(self, enemy_ai_class=None, style="standard", max_steps=MAX_STEPS, n_players=4, macro_attack=False, action_mode="multidiscrete",
+                 state_pool=None):
         """
         Args:
             n_players (int): Número total de jugadores (1 Agente + n-1 Bots).
+            macro_attack (bool): Si es True, cada acción Attack del agente es un ataque completo
+                (hasta conquistar o quedarse sin tropas para atacar) en lugar de una sola tirada.
+            action_mode (str): "multidiscrete" ([tipo, origen, destino, cantidad], decodificado por aproximación),
+                "flat" (Discrete sobre la tabla de acciones del mapa, ver FlatActionTable, con máscara exacta)
+                o "phase" (cada paso es una fase entera del turno, ver PhasePlan).
+            state_pool (RiskInitialStatePool): Reserva de estados iniciales de la que sale cada reset (se puede
+                compartir entre entornos del mismo proceso con el mismo número de jugadores).
+                Por defecto se crea una propia en el primer reset.
         """
         super(RiskTotalControlEnv, self).__init__()
+        if action_mode not in ("multidiscrete", "flat", "phase"):
+            raise ValueError(f"action_mode desconocido: {action_mode}")
         self.max_steps = max_steps
+        self.macro_attack = macro_attack
+        self.action_mode = action_mode
         self.style = style
         self.n_players = n_players # Nueva variable
         
@@ -51,8 +66,25 @@ class RiskTotalControlEnv(gym.Env):
         self.board_base.set_turn_in_values([4, 6, 8, 10, 12, 15])
         self.board_base.set_increment_value(5)
         
-        # --- ESPACIO DE ACCIÓN (Sin cambios) ---
-        self.action_space = spaces.MultiDiscrete([7, 42, 42, 10])
+        # Jugadores del tablero (una sola vez: las partidas copian los jugadores al crear su estado)
+        # El Agente (Jugador 0) y los Bots (Jugadores 1 a N-1)
+        self.board_base.add_player(risktools.RiskPlayer(f"Agent_{self.style}", 0, 0, False, ECON_START, HAPP_START, DEVP_START))
+        for i in range(1, self.n_players):
+            self.board_base.add_player(risktools.RiskPlayer(f"Enemy_Bot_{i}", i, 0, False, ECON_START, HAPP_START, DEVP_START))
+        self.board = self.board_base
+        
+        # --- ESPACIO DE ACCIÓN ---
+        self.flat_table = None
+        if self.action_mode == "flat":
+            self.flat_table = FlatActionTable(self.board_base)
+            self.action_space = spaces.Discrete(self.flat_table.n)
+        elif self.action_mode == "phase":
+            # [decisión de la fase (posición de la tabla), nivel de cada territorio]
+            self.flat_table = FlatActionTable(self.board_base)
+            self.phase_ops = PhasePlan.op_positions(self.flat_table)
+            self.action_space = spaces.MultiDiscrete([self.flat_table.n] + [PhasePlan.LEVELS]*self.n_territories)
+        else:
+            self.action_space = spaces.MultiDiscrete([7, 42, 42, 10])
         
         # --- ESPACIO DE OBSERVACIÓN ---
         # Mantenemos el tamaño fijo para no romper la red neuronal.
@@ -63,56 +95,42 @@ class RiskTotalControlEnv(gym.Env):
         self.state = None
         self.player_idx = 0 # La IA siempre es el Jugador 0
         self.enemy_ai = enemy_ai_class
+        self.encoder = RiskObservationEncoder(self.n_territories, self.player_idx)
+        self.legal_index = None
+        self.state_pool = state_pool
+        self._own_pool = False
 
     def reset(self, seed=None, options=None):
         super().reset(seed=seed)
         self.current_step_count = 0
 
-        # 1. Crear Lista de Jugadores (Soporte Multi-Jugador)
-        players = []
-        
-        # El Agente (Jugador 0)
-        p_agent = risktools.RiskPlayer(f"Agent_{self.style}", 0, 0, False, ECON_START, HAPP_START, DEVP_START)
-        players.append(p_agent)
-
-        # Los Bots (Jugadores 1 a N-1)
-        for i in range(1, self.n_players):
-            p_bot = risktools.RiskPlayer(f"Enemy_Bot_{i}", i, 0, False, ECON_START, HAPP_START, DEVP_START)
-            players.append(p_bot)
-        
-        # --- PARCHE DE COMPATIBILIDAD ---
-        for p in players:
-            p.freeArmies = p.free_armies
-            p.conqueredTerritory = p.conquered_territory
-
-        # 2. Configurar Tablero Limpio
-        self.board = self.board_base 
-        self.board.players = []      
-        self.board.player_to_id = {} 
-        self.board.id_to_player = {}
-        
-        for p in players:
-            self.board.add_player(p)
-
-        # 3. Configurar Variables Globales del Motor
-        risktools.riskengine.playerorder = players
-        risktools.riskengine.currentplayer = players[0]
-        risktools.riskengine.phase = 'Preposition'
-        
-        # 4. Generar Estado Inicial
-        self.state = risktools.getInitialState(self.board)
+        if self.state_pool is None:
+            self.state_pool = RiskInitialStatePool(self.board_base, self.n_players, seed=seed)
+            self._own_pool = True
+        elif seed is not None:
+            self.state_pool.seed(seed)
         
-        # 5. Setup Rápido (Distribuir entre N jugadores)
-        self._fast_random_setup()
+        # Estado inicial ya repartido (territorios en ciclo entre los N jugadores, ver make_opening_state)
+        self.state = self.state_pool.get()
         
         return self._get_obs(), {}
 
+    def close(self):
+        # Una reserva compartida la cierra quien la ha creado
+        if self._own_pool:
+            self.state_pool.close()
+
     def step(self, action):
-        act_type, act_src, act_dst, act_amt = action
+        if self.action_mode == "phase":
+            return self._step_phase(action)
         self.current_step_count += 1
 
         # 1. DECODIFICACIÓN
-        game_action = self._decode_action(act_type, act_src, act_dst, act_amt)
+        if self.action_mode == "flat":
+            game_action = self._decode_flat_action(action)
+        else:
+            act_type, act_src, act_dst, act_amt = action
+            game_action = self._decode_action(act_type, act_src, act_dst, act_amt)
         info = {"valid": game_action is not None}
         
         if game_action is None:
@@ -120,19 +138,43 @@ class RiskTotalControlEnv(gym.Env):
 
         # 2. EJECUCIÓN
         try:
-            next_states, probs = risktools.simulateAction(self.state, game_action)
-            if len(next_states) > 1:
-                probs = np.array(probs, dtype=np.float64)
-                probs /= probs.sum()
-                idx = np.random.choice(len(next_states), p=probs)
-                self.state = next_states[idx]
-            else:
-                self.state = next_states[0]
+            # Solo se construye el sucesor sorteado, directamente sobre el estado del entorno.
+            # La acción sale de getAllowedFaseActions, así que no hace falta volver a validarla
+            self.state = risktools.sampleAction(self.state, game_action, np.random, in_place=True, mode=risktools.EXEC_TRUSTED)
         except Exception as e:
             return self._get_obs(), -10, True, False, {"error": str(e), "valid": True}
 
         # 3. RECOMPENSA
         reward = self._calculate_reward()
+        # Territorios que ha podido tocar la acción (para actualizar la observación solo en ellos)
+        changed = (game_action.to_territory, game_action.from_territory)
+        return self._end_step(reward, changed, info)
+
+    def _step_phase(self, action):
+        """
+        Paso de action_mode="phase": decodifica el plan de la fase (ver PhasePlan) y ejecuta todas sus
+        acciones del motor hasta que acaba la fase. Cada acción ejecutada cuenta para max_steps y suma su
+        recompensa, igual que si el agente la hubiera elegido paso a paso.
+        """
+        plan = self._decode_phase_action(action)
+        info = {"valid": plan is not None}
+
+        if plan is None:
+            return self._get_obs(), -1.0, False, False, info
+
+        reward = 0
+        while not plan.done(self.state) and self.current_step_count < self.max_steps:
+            game_action = plan.next_action(self.state)
+            self.current_step_count += 1
+            try:
+                self.state = risktools.sampleAction(self.state, game_action, np.random, in_place=True, mode=risktools.EXEC_TRUSTED)
+            except Exception as e:
+                return self._get_obs(), -10, True, False, {"error": str(e), "valid": True}
+            reward += self._calculate_reward()
+        return self._end_step(reward, None, info)
+
+    def _end_step(self, reward, changed, info):
+        """Fin de partida, turnos de los rivales y truncamiento después de actuar el agente"""
         terminated = False
         
         # 4. CONTROL DE FLUJO
@@ -150,6 +192,7 @@ class RiskTotalControlEnv(gym.Env):
         # Si NO es mi turno, simular a TODOS los enemigos hasta que me toque
         elif self.state.current_player != self.player_idx:
             self._simulate_enemy_turn()
+            changed = None
             
             # Chequear si morí mientras jugaban los otros
             if self.state.players[self.player_idx].game_over:
@@ -163,65 +206,20 @@ class RiskTotalControlEnv(gym.Env):
         if self.current_step_count >= self.max_steps:
             truncated = True
             if not terminated:
-                my_territories = sum(1 for o in self.state.owners if o == self.player_idx)
+                my_territories = self.state.territory_count[self.player_idx]
                 dif=42-my_territories
                 reward -= 15_000*dif # Penalización por empate eterno
 
-        return self._get_obs(), reward, terminated, truncated, info
+        return self._get_obs(changed), reward, terminated, truncated, info
 
-    def _get_obs(self):
+    def _get_obs(self, changed=None):
         """
-        Vector de entrada adaptado para N jugadores.
+        Vector de entrada adaptado para N jugadores (ver RiskObservationEncoder).
         Estrategia: 'Yo' vs 'El resto del mundo'.
+        changed: territorios que pueden haber cambiado desde la última observación (None si no se sabe)
         """
-        obs = []
-        
-        # A. Datos de Territorios
-        for i in range(self.n_territories):
-            owner = self.state.owners[i]
-            armies = self.state.armies[i]
-            
-            # 1.0 si es mío, 0.0 si es de CUALQUIER enemigo
-            obs.append(1.0 if owner == self.player_idx else 0.0)
-            
-            # 1.0 si es enemigo (antes era owner != idx, sigue siendo válido para N jugadores)
-            obs.append(1.0 if owner is not None and owner != self.player_idx else 0.0)
-            
-            obs.append(min(armies / 100.0, 1.0))
-            
-        # B. Datos Económicos y Globales (AGREGADOS)
-        me = self.state.players[self.player_idx]
-        
-        # Recopilar stats de todos los enemigos vivos
-        enemy_econs = []
-        for p in self.state.players:
-            if p.id != self.player_idx and not p.game_over:
-                enemy_econs.append(p.economy)
-            elif p.id != self.player_idx and p.game_over:
-                 enemy_econs.append(0) # Muertos tienen 0
-
-        # Tomamos la economía del enemigo MÁS FUERTE como referencia para la red
-        max_enemy_econ = max(enemy_econs) if enemy_econs else 0
-        
-        obs.extend([
-            min(me.economy / 200.0, 1.0),      # Mi dinero
-            min(me.free_armies / 50.0, 1.0),   # Mis refuerzos
-            min(max_enemy_econ / 200.0, 1.0),  # Dinero del RIVAL MÁS RICO
-            min(sum(self.state.armies) / 500.0, 1.0) # Total tropas en juego
-        ])
-        
-        # C. Fase del Turno
-        phase_map = {'fase_0':0, 'fase_1':1, 'fase_2':2, 'fase_3':3}
-        phase_vec = [0.0]*4
-        phase_vec[phase_map.get(self.state.fase, 0)] = 1.0
-        obs.extend(phase_vec)
-        
-        # D. Padding
-        current_len = len(obs)
-        if current_len < self.obs_dim:
-            obs.extend([0.0] * (self.obs_dim - current_len))
-            
-        return np.array(obs[:self.obs_dim], dtype=np.float32)
+        # Se devuelve una copia: el buffer del encoder se reutiliza en la siguiente llamada
+        return self.encoder.encode(self.state, self.player_idx, changed).copy()
 
     def _simulate_enemy_turn(self):
         """Simula turnos de TODOS los rivales hasta que vuelva a ser mi turno."""
@@ -243,35 +241,14 @@ class RiskTotalControlEnv(gym.Env):
             # IA Random para los enemigos
             action = random.choice(all_actions)
             
-            next_states, probs = risktools.simulateAction(self.state, action)
-            
-            if len(next_states) > 1:
-                probs = np.array(probs, dtype=np.float64)
-                probs /= probs.sum()
-                idx = np.random.choice(len(next_states), p=probs)
-                self.state = next_states[idx]
-            else:
-                self.state = next_states[0]
+            self.state = risktools.sampleAction(self.state, action, np.random, in_place=True, mode=risktools.EXEC_TRUSTED)
             steps += 1
 
-    def _fast_random_setup(self):
-        """Asignación inicial distribuida entre N jugadores."""
-        ids = list(range(self.n_territories))
-        random.shuffle(ids)
-        for i, tid in enumerate(ids):
-            # Asignar territorios en ciclo: Jugador 0, 1, 2, 3, 0...
-            owner = i % self.n_players
-            self.state.owners[tid] = owner
-            self.state.armies[tid] = 3
-        
-        self.state.fase = 'fase_1'
-        self.state.turn_type = 'Comprar_Soldados'
-
     # --- MÉTODOS AUXILIARES SIN CAMBIOS (Action Masking, Decode, Reward) ---
     def _calculate_reward(self):
         # Mismo cálculo, funciona igual para N jugadores
         me = self.state.players[self.player_idx]
-        my_territories = sum(1 for o in self.state.owners if o == self.player_idx)
+        my_territories = self.state.territory_count[self.player_idx]
         reward = 0
         reward+=min(me.happiness,50)*0.01
         if self.style == "standard":
@@ -281,117 +258,464 @@ class RiskTotalControlEnv(gym.Env):
             if me.conquered_territory:
                 reward += 2.0  
         elif self.style == "defensive":
-            total_troops = sum(self.state.armies[i] for i in range(self.n_territories) if self.state.owners[i] == self.player_idx)
+            total_troops = self.state.troops[self.player_idx]
             reward += total_troops * 0.001
             reward += 0.5
         elif self.style == "capitalist":
             reward += me.development * 0.1
         return reward
 
+    def _legal_actions(self):
+        """Índice de acciones legales del estado actual (se reutiliza mientras el estado no cambie)"""
+        key = LegalActionIndex.state_key(self.state)
+        if self.legal_index is None or self.legal_index.key != key:
+            self.legal_index = LegalActionIndex(self.state, self.n_territories, self.flat_table)
+        return self.legal_index
+
     def action_masks(self):
-        # Mismo código anterior
-        allowed = risktools.getAllowedFaseActions(self.state)
-        type_map = {'Pasar':0,'Comprar_Soldados':1,'Place':2,'Attack':3, 'Occupy':4,'Fortify':5,'Invertir':6,'PrePlace':2}
-        mask_type = [False]*7
+        if self.action_mode == "flat":
+            return self._legal_actions().flat_mask.copy()
+        if self.action_mode == "phase":
+            op_mask = self._legal_actions().flat_mask & self.phase_ops
+            op_mask[self.flat_table.offsets['Pasar']] = True
+            return np.concatenate([op_mask, PhasePlan.level_mask(self.state).ravel()])
+        # Para las máscaras sólo importan origen y destino: Fortify/Occupy como rangos (una acción por par)
+        return self._legal_actions().mask.copy()
+
+    def _decode_flat_action(self, action):
+        """Acción legal de la posición action de la tabla del mapa (None si no es legal en este estado)"""
+        best_match = self._legal_actions().flat_actions.get(int(action))
+        
+        # Ataque completo en lugar de una sola tirada
+        if self.macro_attack and best_match is not None and best_match.type == 'Attack' and best_match.from_territory is not None:
+            best_match = self.state.board.action_pool.get('Attack', best_match.to_territory, best_match.from_territory, 1)
+        return best_match
+
+    def _decode_phase_action(self, action):
+        """PhasePlan de la acción [op, niveles] (None si la decisión de la fase no es legal en este estado)"""
+        op = int(action[0])
+        if op == self.flat_table.offsets['Pasar']:
+            return PhasePlan(self.state, None, action[1:])
+        if not 0 <= op < self.flat_table.n or not self.phase_ops[op]:
+            return None
+        game_action = self._legal_actions().flat_actions.get(op)
+        if game_action is None:
+            return None
+        return PhasePlan(self.state, game_action, action[1:])
+
+    def _decode_action(self, type_idx, src_id, dst_id, amt_idx):
+        """
+        Decodifica índices numéricos a RiskAction.
+        Tipo: 0=Pasar, 1=Comprar_Soldados, 2=Place, 3=Attack, 4=Occupy, 5=Fortify, 6=Invertir
+        Busca la acción legal de ese tipo que más coincide con origen y destino (ver LegalActionIndex.lookup).
+        amt_idx (la cabeza de cantidad) no se usa: las acciones del pool son inmutables, las de rango
+        (Fortify/Occupy) se concretan con su cantidad mínima y las económicas ya llevan su cantidad.
+        """
+        best_match = self._legal_actions().lookup(type_idx, src_id, dst_id)
+        
+        # Las acciones de rango (Fortify/Occupy) se concretan con la cantidad mínima
+        if best_match is not None and best_match.is_range():
+            best_match = self.state.board.action_pool.get(best_match.type, best_match.to_territory, best_match.from_territory, best_match.unidades)
+        
+        # Ataque completo en lugar de una sola tirada
+        if self.macro_attack and best_match is not None and best_match.type == 'Attack' and best_match.from_territory is not None:
+            best_match = self.state.board.action_pool.get('Attack', best_match.to_territory, best_match.from_territory, 1)
+        
+        return best_match
+
+
+class LegalActionIndex():
+    """
+    Acciones legales de un estado indexadas para el espacio [tipo, origen, destino, cantidad] de RiskTotalControlEnv.
+
+    Se construye con una sola llamada a getAllowedFaseActions (expand=False) y sirve a la vez para las máscaras
+    y para decodificar: para cada tipo del agente guarda sus candidatas en el orden del generador y la primera
+    posición de cada par (origen, destino), de cada origen y de cada destino.
+    """
+    TYPE_MAP = {'Pasar':0,'Comprar_Soldados':1,'Place':2,'Attack':3, 'Occupy':4,'Fortify':5,'Invertir':6,'PrePlace':2}
+    """ Tipo de acción del agente de cada tipo de RiskAction """
+
+    N_TYPES = 7
+
+    def __init__(self, state, n_territories, flat_table=None):
+        """Indexes the legal actions of state (and their positions in flat_table, if given)"""
+        allowed = risktools.getAllowedFaseActions(state, expand=False)
+
+        self.key = LegalActionIndex.state_key(state)
+        """ Lo que determina las acciones legales del estado (ver state_key) """
+
+        # --- MÁSCARAS ---
+        mask_type = [False]*self.N_TYPES
         for key, acts in allowed.items():
-            if key in type_map and len(acts)>0:
-                mask_type[type_map[key]] = True
+            if key in self.TYPE_MAP and len(acts)>0:
+                mask_type[self.TYPE_MAP[key]] = True
         if not any(mask_type): mask_type[0] = True 
-        mask_src = [False]*42
-        mask_dst = [False]*42
+        mask_src = [False]*n_territories
+        mask_dst = [False]*n_territories
         if mask_type[0] and sum(mask_type)==1:
             mask_src[0] = True
             mask_dst[0] = True
         else:
             for key, acts in allowed.items():
                 for act in acts:
-                    if hasattr(act,'from_territory') and act.from_territory:
-                        tid = self.board.territory_to_id.get(act.from_territory,None)
-                        if tid is not None: mask_src[tid] = True
+                    # Las acciones llevan ids de territorio
+                    if act.from_territory is not None: mask_src[act.from_territory] = True
                     else: mask_src[0] = True
-                    if hasattr(act,'to_territory') and act.to_territory:
-                        tid = self.board.territory_to_id.get(act.to_territory,None)
-                        if tid is not None: mask_dst[tid] = True
+                    if act.to_territory is not None: mask_dst[act.to_territory] = True
                     else: mask_dst[0] = True
         mask_amt = [True]*10
-        return np.concatenate([mask_type,mask_src,mask_dst,mask_amt])
 
-    def _decode_action(self, type_idx, src_id, dst_id, amt_idx):
+        self.mask = np.concatenate([mask_type,mask_src,mask_dst,mask_amt])
+        """ Máscara de action_masks """
+
+        # --- CANDIDATAS DE CADA TIPO ---
+        self.candidates = [None]*self.N_TYPES
+        """ Acciones entre las que se decodifica cada tipo (None si el tipo no está permitido) """
+
+        self.by_pair = [None]*self.N_TYPES
+        self.by_src = [None]*self.N_TYPES
+        self.by_dst = [None]*self.N_TYPES
+        """ Primera posición en candidates de cada (origen, destino), de cada origen y de cada destino """
+
+        for type_idx, name in enumerate(('Pasar', 'Comprar_Soldados', 'Place', 'Attack', 'Occupy', 'Fortify', 'Invertir')):
+            # Ajustar tipo si es PrePlace
+            if name == 'Place' and 'PrePlace' in allowed:
+                name = 'PrePlace'
+            candidates = allowed.get(name)
+            if not candidates:
+                continue
+            # Preferir acciones con parámetros; si no hay ninguna, usar todas
+            with_params = [act for act in candidates if not (act.from_territory is None and act.to_territory is None)]
+            candidates = with_params or candidates
+            by_pair, by_src, by_dst = dict(), dict(), dict()
+            for i, act in enumerate(candidates):
+                if act.from_territory is not None:
+                    by_src.setdefault(act.from_territory, i)
+                if act.to_territory is not None:
+                    by_dst.setdefault(act.to_territory, i)
+                    if act.from_territory is not None:
+                        by_pair.setdefault((act.from_territory, act.to_territory), i)
+            self.candidates[type_idx] = candidates
+            self.by_pair[type_idx] = by_pair
+            self.by_src[type_idx] = by_src
+            self.by_dst[type_idx] = by_dst
+
+        self.flat_mask = None
+        """ Máscara exacta sobre las posiciones de flat_table """
+
+        self.flat_actions = None
+        """ Diccionario posición de flat_table -> acción legal """
+
+        if flat_table is not None:
+            self.flat_actions = flat_table.legal_actions(state, allowed)
+            self.flat_mask = np.zeros(flat_table.n, dtype=bool)
+            self.flat_mask[list(self.flat_actions)] = True
+            # MaskablePPO necesita al menos una acción: sin acciones legales se deja Pasar (y no es válida)
+            if not self.flat_actions:
+                self.flat_mask[flat_table.offsets['Pasar']] = True
+
+    @staticmethod
+    def state_key(state):
+        """Todo lo que usa getAllowedFaseActions: tablero (zobrist_cells), fase, turno y dinero y refuerzos del jugador"""
+        me = state.players[state.current_player]
+        return (state.zobrist_cells, state.current_player, state.fase, state.turn_type,
+                state.last_attacker, state.last_defender, me.free_armies, me.economy)
+
+    def lookup(self, type_idx, src_id, dst_id):
         """
-        Decodifica índices numéricos a RiskAction.
-        Tipo: 0=Pasar, 1=Comprar_Soldados, 2=Place, 3=Attack, 4=Occupy, 5=Fortify, 6=Invertir
-        Robusto: Busca coincidir por nombre de territorio, con varios niveles de fallback.
+        Devuelve la primera candidata del tipo con más coincidencias de origen y destino
+        (ambos, uno de los dos o, si no coincide ninguno, la primera), o None si el tipo no está permitido
         """
-        allowed_dict = risktools.getAllowedFaseActions(self.state)
-        type_map = {0: 'Pasar', 1: 'Comprar_Soldados', 2: 'Place', 3: 'Attack', 4: 'Occupy', 5: 'Fortify', 6: 'Invertir'}
-        target_type = type_map.get(type_idx)
-        
-        # Ajustar tipo si es PrePlace
-        if target_type == 'Place' and 'PrePlace' in allowed_dict: 
-            target_type = 'PrePlace'
-        
-        if target_type not in allowed_dict: 
-            return None
-        
-        candidates = allowed_dict[target_type]
-        if not candidates: 
+        if not 0 <= type_idx < self.N_TYPES or self.candidates[type_idx] is None:
             return None
-        
-        def norm(s): 
-            return str(s).lower().replace(" ", "").replace("_","") if s else ""
-        
-        # Obtener nombres de territorios desde IDs
-        src_name = norm(self.board.territories[src_id].name) if src_id < self.n_territories else None
-        dst_name = norm(self.board.territories[dst_id].name) if dst_id < self.n_territories else None
-        
-        # NIVEL 1: Buscar acciones con parámetros (no vacías)
-        candidates_with_params = [act for act in candidates 
-                                   if not (act.from_territory is None and act.to_territory is None)]
-        
-        # NIVEL 2: Si no hay acciones con parámetros, usar todas
-        if not candidates_with_params:
-            candidates_with_params = candidates
-        
-        # Buscar mejor coincidencia por nombre
-        best_match = None
-        best_score = -1
-        
-        for act in candidates_with_params:
-            match_score = 0
-            
-            # Verificar coincidencia de from_territory
-            if hasattr(act, "from_territory") and act.from_territory:
-                if norm(act.from_territory) == src_name:
-                    match_score += 1
-            
-            # Verificar coincidencia de to_territory
-            if hasattr(act, "to_territory") and act.to_territory:
-                if norm(act.to_territory) == dst_name:
-                    match_score += 1
-            
-            # Guardar la mejor coincidencia
-            if match_score > best_score:
-                best_score = match_score
-                best_match = act
-        
-        # NIVEL 3: Si no hay coincidencia por nombre, usar la primera acción con parámetros
-        if best_match is None:
-            # Preferir acciones con parámetros
-            for act in candidates:
-                if not (act.from_territory is None and act.to_territory is None):
-                    best_match = act
-                    break
-        
-        # NIVEL 4: Último recurso - usar cualquier candidato
-        if best_match is None and candidates:
-            best_match = candidates[0]
-        
-        # Asignar cantidad si corresponde
-        if best_match:
-            amount = max(1, amt_idx)
-            if hasattr(best_match, "armies"): 
-                best_match.armies = amount
-            if hasattr(best_match, "amount"): 
-                best_match.amount = amount
-        
-        return best_match
\ No newline at end of file
+        candidates = self.candidates[type_idx]
+        i = self.by_pair[type_idx].get((src_id, dst_id))
+        if i is None:
+            i_src = self.by_src[type_idx].get(src_id)
+            i_dst = self.by_dst[type_idx].get(dst_id)
+            if i_src is None or i_dst is None:
+                i = i_dst if i_src is None else i_src
+            else:
+                i = min(i_src, i_dst)
+        return candidates[0 if i is None else i]
+
+
+class FlatActionTable():
+    """
+    Todas las acciones posibles de un mapa en posiciones fijas, para el espacio Discrete de action_mode="flat".
+
+    Orden de la tabla (T territorios, E aristas dirigidas en el orden CSR de board.index):
+        Pasar, Comercio, Comprar_Soldados x4, Invertir x4, Festin x4, Casino x4 (25%, 50%, 75%, 100%),
+        PreAssign xT, PrePlace xT, Place xT, Attack xE, dejar de atacar,
+        Occupy x3, Fortify x3E (mínimo, mitad y máximo de tropas), no fortificar
+    Las cantidades de Occupy/Fortify que coinciden con otra anterior de la misma acción no son legales,
+    así que cada acción legal del generador ocupa una sola posición.
+    """
+    ECONOMIC = ('Comprar_Soldados', 'Invertir', 'Festin', 'Casino')
+    """ Acciones con las 4 opciones de gasto de getComprarSoldadosActions y similares """
+
+    AMOUNT_SLOTS = 3
+    """ Cantidades de las acciones de rango: mínimo, mitad y máximo """
+
+    def __init__(self, board):
+        index = board.index
+        self.n_territories = index.n_territories
+        self.edges = [(t, index.neighbor_ids[e]) for t in range(self.n_territories)
+                      for e in range(index.neighbor_offsets[t], index.neighbor_offsets[t+1])]
+        """ (origen, destino) de cada arista """
+
+        self.edge_of = {edge: e for e, edge in enumerate(self.edges)}
+        
+        sizes = [('Pasar', 1), ('Comercio', 1)] + [(name, 4) for name in self.ECONOMIC]
+        sizes += [('PreAssign', self.n_territories), ('PrePlace', self.n_territories), ('Place', self.n_territories),
+                  ('Attack', len(self.edges)), ('Attack_stop', 1), ('Occupy', self.AMOUNT_SLOTS),
+                  ('Fortify', self.AMOUNT_SLOTS*len(self.edges)), ('Fortify_stop', 1)]
+        self.offsets = dict()
+        """ Primera posición de cada bloque de la tabla """
+
+        self.n = 0
+        """ Tamaño de la tabla (del espacio Discrete) """
+
+        for name, size in sizes:
+            self.offsets[name] = self.n
+            self.n += size
+
+    @staticmethod
+    def range_amounts(lo, hi):
+        """Cantidades distintas (mínimo, mitad, máximo) de una acción de rango, con su hueco en la tabla"""
+        amounts = [(0, lo)]
+        if hi - lo >= 2:
+            amounts.append((1, lo + (hi - lo)//2))
+        if hi > lo:
+            amounts.append((2, hi))
+        return amounts
+
+    def legal_actions(self, state, allowed=None):
+        """Diccionario posición -> RiskAction con las acciones legales de state (allowed de getAllowedFaseActions con expand=False)"""
+        if allowed is None:
+            allowed = risktools.getAllowedFaseActions(state, expand=False)
+        pool = state.board.action_pool
+        off = self.offsets
+        actions = dict()
+        for key, acts in allowed.items():
+            if not acts:
+                continue
+            if key in ('Pasar', 'Comercio'):
+                actions[off[key]] = acts[0]
+            elif key in self.ECONOMIC:
+                # Una sola opción cuando no llega para el 25%: es la del 100%
+                slots = [3] if len(acts) == 1 else range(len(acts))
+                for slot, act in zip(slots, acts):
+                    actions[off[key] + slot] = act
+            elif key in ('PreAssign', 'PrePlace', 'Place'):
+                for act in acts:
+                    actions[off[key] + act.to_territory] = act
+            elif key == 'Attack':
+                for act in acts:
+                    if act.from_territory is None:
+                        actions[off['Attack_stop']] = act
+                    else:
+                        actions[off['Attack'] + self.edge_of[(act.from_territory, act.to_territory)]] = act
+            elif key == 'Occupy':
+                for act in acts:
+                    for slot, k in self.range_amounts(act.unidades, act.amounts()[-1]):
+                        actions[off['Occupy'] + slot] = pool.get('Occupy', act.to_territory, act.from_territory, k)
+            elif key == 'Fortify':
+                for act in acts:
+                    if act.to_territory is None:
+                        actions[off['Fortify_stop']] = act
+                        continue
+                    e = self.edge_of[(act.from_territory, act.to_territory)]
+                    for slot, k in self.range_amounts(act.unidades, act.amounts()[-1]):
+                        actions[off['Fortify'] + self.AMOUNT_SLOTS*e + slot] = pool.fortify_amounts(e, k)[k-1]
+        return actions
+
+
+class PhasePlan():
+    """
+    Una fase entera del turno decidida de una vez, para action_mode="phase" de RiskTotalControlEnv.
+
+    La acción del agente es [op, nivel de cada territorio (0..LEVELS-1)]:
+        op: posición de FlatActionTable con la decisión de la fase: gasto de la fase 1 (Comprar_Soldados,
+            Invertir, Festin), Casino/Comercio en lugar de atacar en la fase 2 o la fortificación de la fase 3.
+            Pasar sigue el plan sin nada de eso.
+        niveles: en la fase 1, reparto de los refuerzos entre los territorios propios de frontera (proporcional
+            al nivel); en la fase 2, prioridad de los territorios enemigos a conquistar con batallas completas
+            (0 = no atacar). Cuanto más alto el nivel, peores probabilidades de victoria se aceptan (MIN_WIN).
+    next_action devuelve la siguiente acción del motor según el plan; el entorno las ejecuta hasta que acaba
+    la fase (done), y un jugador puede hacer lo mismo de una en una. El reparto inicial (fase 0), que el entorno
+    no juega, lo resuelve next_action con reglas fijas.
+    """
+    LEVELS = 4
+
+    MIN_WIN = (None, 0.75, 0.5, 0.0)
+    """ Probabilidad mínima de conquistar (getBattleWinProbability) para atacar un objetivo de cada nivel """
+
+    OP_BLOCKS = ('Pasar', 'Comercio') + FlatActionTable.ECONOMIC + ('Fortify', 'Fortify_stop')
+    """ Bloques de FlatActionTable que pueden ser la decisión de una fase """
+
+    def __init__(self, state, op, levels):
+        self.player = state.current_player
+        self.fase = state.fase
+
+        self.op = None if op is None or op.type == 'Pasar' else op
+        """ Decisión de la fase pendiente de ejecutar (None si ya se ha ejecutado o es Pasar) """
+
+        self.levels = [int(level) for level in levels]
+        self.targets = sorted((t for t, level in enumerate(self.levels) if level > 0), key=lambda t: -self.levels[t])
+        """ Territorios con nivel, de mayor a menor """
+
+        self.quota = None
+        """ Tropas que faltan por colocar en cada territorio (se reparte al empezar a colocar) """
+
+    @staticmethod
+    def op_positions(table):
+        """Máscara de las posiciones de table que pueden ser la decisión de una fase"""
+        mask = np.zeros(table.n, dtype=bool)
+        names = list(table.offsets)
+        for i, name in enumerate(names):
+            if name in PhasePlan.OP_BLOCKS:
+                end = table.offsets[names[i+1]] if i + 1 < len(names) else table.n
+                mask[table.offsets[name]:end] = True
+        return mask
+
+    @staticmethod
+    def level_mask(state):
+        """
+        [territorios, LEVELS] máscara de niveles: refuerzos en la frontera propia (fase 1), objetivos a tiro (fase 2).
+        Los territorios sin dueño (tras una revolución) también son objetivos: hay que conquistarlos para ganar.
+        """
+        index = state.board.index
+        n = index.n_territories
+        mask = np.zeros((n, PhasePlan.LEVELS), dtype=bool)
+        mask[:, 0] = True
+        mine = state.owned_mask[state.current_player]
+        if state.turn_type == 'Place' or state.fase == 'fase_1':
+            allowed = PhasePlan._frontier(state, mine)
+        elif state.fase == 'fase_2':
+            strong = 0
+            for t in range(n):
+                if (mine >> t) & 1 and state.armies[t] >= 2:
+                    strong |= 1 << t
+            enemy = index.all_mask & ~mine
+            allowed = [t for t in range(n) if (enemy >> t) & 1 and index.neighbor_masks[t] & strong]
+        else:
+            allowed = []
+        mask[allowed, 1:] = True
+        return mask
+
+    @staticmethod
+    def _frontier(state, mine):
+        """Territorios de mine con algún vecino que no es suyo"""
+        masks = state.board.index.neighbor_masks
+        return [t for t in range(len(masks)) if (mine >> t) & 1 and masks[t] & ~mine]
+
+    def done(self, state):
+        """True si la fase del plan ya ha terminado"""
+        return state.turn_type == 'GameOver' or state.current_player != self.player or state.fase != self.fase
+
+    def next_action(self, state):
+        """Siguiente acción del motor del plan en state"""
+        pool = state.board.action_pool
+        if state.turn_type == 'PreAssign':
+            return self._pre_assign(state)
+        if state.turn_type == 'PrePlace':
+            return self._pre_place(state)
+        if state.turn_type == 'Occupy':
+            return self._occupy(state)
+        if state.turn_type == 'Place':
+            return self._place(state)
+        if self.op is not None:
+            op, self.op = self.op, None
+            return op
+        if state.fase == 'fase_1' and state.players[self.player].free_armies > 0:
+            return self._place(state)
+        if state.fase == 'fase_2':
+            attack = self._attack(state)
+            if attack is not None:
+                return attack
+            if state.turn_type == 'Attack':
+                return pool.attack_stop
+        return pool.get('Pasar')
+
+    def _pre_assign(self, state):
+        """Reparto inicial: el territorio libre con más vecinos propios (el primero si hay empate)"""
+        index = state.board.index
+        best, best_count = None, -1
+        for t in range(len(state.owners)):
+            if state.owners[t] is not None:
+                continue
+            count = sum(1 for e in range(index.neighbor_offsets[t], index.neighbor_offsets[t+1])
+                        if state.owners[index.neighbor_ids[e]] == self.player)
+            if count > best_count:
+                best, best_count = t, count
+        return state.board.action_pool.pre_assign[best]
+
+    def _pre_place(self, state):
+        """Colocación inicial: una tropa en el territorio de la frontera propia (o de lo propio) con menos tropas"""
+        mine = state.owned_mask[self.player]
+        own = self._frontier(state, mine) or [t for t in range(len(state.owners)) if (mine >> t) & 1]
+        return state.board.action_pool.pre_place[min(own, key=lambda t: state.armies[t])]
+
+    def _place(self, state):
+        """Coloca una tropa según el reparto de los refuerzos (proporcional a los niveles, por restos mayores)"""
+        if not self.quota:
+            self.quota = self._split(state, state.players[self.player].free_armies)
+        t = max(self.quota, key=self.quota.get)
+        self.quota[t] -= 1
+        if self.quota[t] == 0:
+            del self.quota[t]
+        return state.board.action_pool.place[t]
+
+    def _split(self, state, armies):
+        """Diccionario territorio -> tropas con el reparto de armies entre los territorios propios con nivel"""
+        mine = state.owned_mask[self.player]
+        weights = {t: self.levels[t] for t in self.targets if (mine >> t) & 1}
+        if not weights:
+            # Sin reparto: a partes iguales en la frontera (o en todo lo propio)
+            own = self._frontier(state, mine) or [t for t in range(len(state.owners)) if (mine >> t) & 1]
+            weights = {t: 1 for t in own}
+        total = sum(weights.values())
+        quota = {t: armies*w // total for t, w in weights.items()}
+        rest = sorted(weights, key=lambda t: -(armies*weights[t] % total))
+        for t in rest[:armies - sum(quota.values())]:
+            quota[t] += 1
+        return {t: k for t, k in quota.items() if k > 0}
+
+    def _attack(self, state):
+        """Batalla completa contra el primer objetivo del plan que se puede atacar (None si no queda ninguno)"""
+        index = state.board.index
+        winter = risktools.isWinter(state)
+        for t in self.targets:
+            if state.owners[t] == self.player:
+                continue
+            # Desde el territorio propio vecino con más tropas
+            src = None
+            for e in range(index.neighbor_offsets[t], index.neighbor_offsets[t+1]):
+                s = index.neighbor_ids[e]
+                if state.owners[s] == self.player and state.armies[s] >= 2 and (src is None or state.armies[s] > state.armies[src]):
+                    src = s
+            if src is None:
+                continue
+            if risktools.getBattleWinProbability(state.armies[src], state.armies[t], winter) < self.MIN_WIN[self.levels[t]]:
+                continue
+            for e in range(index.neighbor_offsets[src], index.neighbor_offsets[src+1]):
+                if index.neighbor_ids[e] == t:
+                    return state.board.action_pool.attack_macro[e]
+        return None
+
+    def _occupy(self, state):
+        """Ocupa con todo si el territorio conquistado da a más objetivos del plan, con la mitad si los dos dan y con el mínimo si no"""
+        to, src = state.last_defender, state.last_attacker
+        lo = min(state.armies[src] - 1, 3)
+        hi = state.armies[src] - 1
+        pending = [t for t in self.targets if state.owners[t] != self.player]
+        to_needs = any(state.board.index.is_adjacent(to, t) for t in pending)
+        src_needs = any(state.board.index.is_adjacent(src, t) for t in pending)
+        if to_needs and src_needs:
+            k = lo + (hi - lo)//2
+        elif to_needs:
+            k = hi
+        else:
+            k = lo
+        return state.board.action_pool.get('Occupy', to, src, k)
@@ -0,0 +1,134 @@
+import os
+import sys
+import numpy as np
+
+# Configuración de rutas
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from clases.zobrist import owner_key, armies_key
+
+PHASE_INDEX = {'fase_0': 0, 'fase_1': 1, 'fase_2': 2, 'fase_3': 3}
+
+
+def _unpack_masks(masks, n_territories):
+    """[len(masks), n_territories] boolean array with the bits of territory bitmasks (bit t = territory t)"""
+    n_bytes = (n_territories + 7) // 8
+    raw = np.frombuffer(b''.join(m.to_bytes(n_bytes, 'little') for m in masks), dtype=np.uint8)
+    return np.unpackbits(raw.reshape(len(masks), n_bytes), axis=1, count=n_territories, bitorder='little').astype(bool)
+
+
+class RiskObservationEncoder():
+    """
+    Codifica un RiskState en el vector de observación de RiskTotalControlEnv ('Yo' vs 'El resto del mundo'):
+
+        [mío, enemigo, tropas/100] por territorio, mi economía/200, mis refuerzos/50,
+        economía del rival más rico/200, tropas totales/500, fase (one-hot de 4) y ceros de relleno
+
+    La observación se escribe siempre en el mismo buffer (obs). La parte de los territorios se obtiene con
+    operaciones de NumPy a partir de los bitmasks de owned_mask y solo se recalcula si ha cambiado:
+    el encoder recuerda el hash Zobrist de owners/armies (zobrist_cells) que tiene codificado, y con
+    changed se actualizan solo esos territorios (si el hash no cuadra después, se recodifica todo).
+    """
+    def __init__(self, n_territories, player_idx=0):
+        self.n_territories = n_territories
+        self.obs_dim = (n_territories * 3) + 20
+
+        self.player_idx = player_idx
+        """ Jugador desde cuyo punto de vista se codifica ('Yo') """
+
+        self.obs = np.zeros(self.obs_dim, dtype=np.float32)
+        """ Buffer con la última observación (se reutiliza en cada llamada) """
+
+        self.owners = [None]*n_territories
+        self.armies = [0]*n_territories
+        """ owners/armies que hay codificados ahora en obs """
+
+        self.cells = None
+        """ zobrist_cells de owners/armies codificados (None si obs no tiene nada válido) """
+
+    def encode(self, state, player_idx=None, changed=None):
+        """
+        Fills obs with the observation of state and returns it (the same buffer every time, copy it to keep it).
+        changed is an optional list of the territories that may have changed since the last call
+        """
+        if player_idx is not None and player_idx != self.player_idx:
+            self.player_idx = player_idx
+            self.cells = None
+
+        if self.cells != state.zobrist_cells:
+            if changed is not None and self.cells is not None:
+                self._encode_territories(state, changed)
+            if self.cells != state.zobrist_cells:
+                self._encode_board(state)
+
+        self._encode_globals(state, self.player_idx, self.obs)
+        return self.obs
+
+    def _encode_board(self, state):
+        """Encodes every territory of state"""
+        t = self.n_territories
+        p = self.player_idx
+        bits = _unpack_masks((state.owned_mask[p], state.owned_mask[-1]), t)
+        obs = self.obs
+        obs[0:3*t:3] = bits[0]
+        obs[1:3*t:3] = ~(bits[0] | bits[1])
+        obs[2:3*t:3] = np.minimum(np.array(state.armies) / 100.0, 1.0)
+        self.owners = list(state.owners)
+        self.armies = list(state.armies)
+        self.cells = state.zobrist_cells
+
+    def _encode_territories(self, state, changed):
+        """Encodes only the given territories, keeping the hash of the encoded cells up to date"""
+        p = self.player_idx
+        obs = self.obs
+        cells = self.cells
+        for t in set(changed):
+            if t is None:
+                continue
+            owner, armies = state.owners[t], state.armies[t]
+            cells ^= owner_key(t, self.owners[t]) ^ owner_key(t, owner) ^ armies_key(t, self.armies[t]) ^ armies_key(t, armies)
+            self.owners[t] = owner
+            self.armies[t] = armies
+            obs[3*t] = 1.0 if owner == p else 0.0
+            obs[3*t+1] = 1.0 if owner is not None and owner != p else 0.0
+            obs[3*t+2] = min(armies / 100.0, 1.0)
+        self.cells = cells
+
+    def _encode_globals(self, state, p, obs):
+        """Writes the economic data of player p and the phase of state into obs"""
+        t = 3*self.n_territories
+        me = state.players[p]
+        # Tomamos la economía del enemigo MÁS FUERTE como referencia para la red (los muertos tienen 0)
+        enemy_econs = [0 if q.game_over else q.economy for q in state.players if q.id != p]
+        max_enemy_econ = max(enemy_econs) if enemy_econs else 0
+        obs[t] = min(me.economy / 200.0, 1.0)
+        obs[t+1] = min(me.free_armies / 50.0, 1.0)
+        obs[t+2] = min(max_enemy_econ / 200.0, 1.0)
+        obs[t+3] = min(sum(state.troops) / 500.0, 1.0)
+        obs[t+4:t+8] = 0.0
+        obs[t+4+PHASE_INDEX.get(state.fase, 0)] = 1.0
+
+    def encode_batch(self, states, player_idx=None, out=None):
+        """
+        Encodes K states at once into a [K, obs_dim] array (out if given, for batched inference).
+        By default each state is seen from its current player
+        """
+        k, t = len(states), self.n_territories
+        if out is None:
+            out = np.zeros((k, self.obs_dim), dtype=np.float32)
+        players = [s.current_player if player_idx is None else player_idx for s in states]
+        masks = [s.owned_mask[p] for s, p in zip(states, players)] + [s.owned_mask[-1] for s in states]
+        bits = _unpack_masks(masks, t)
+        own, unowned = bits[:k], bits[k:]
+        out[:, 0:3*t:3] = own
+        out[:, 1:3*t:3] = ~(own | unowned)
+        out[:, 2:3*t:3] = np.minimum(np.array([s.armies for s in states]) / 100.0, 1.0)
+        out[:, 3*t+8:] = 0.0
+
+        for i, (s, p) in enumerate(zip(states, players)):
+            self._encode_globals(s, p, out[i])
+        return out
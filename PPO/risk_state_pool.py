@@ -0,0 +1,117 @@
+import os
+import sys
+import time
+import random
+import threading
+from collections import deque
+
+# Configuración de rutas
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+import risktools
+
+POOL_SIZE = 256
+
+
+def make_opening_state(board, n_players, rng=random):
+    """
+    Estado inicial de una partida de entrenamiento sobre board (con sus n_players jugadores ya añadidos):
+    territorios barajados con rng y repartidos en ciclo (jugador 0, 1, 2...), 3 tropas en cada uno,
+    y el jugador 0 empieza la fase 1
+    """
+    state = risktools.getInitialState(board)
+    ids = list(range(len(board.territories)))
+    rng.shuffle(ids)
+    for i, tid in enumerate(ids):
+        state.owners[tid] = i % n_players
+        state.armies[tid] = 3
+    state.recount()
+
+    state.fase = 'fase_1'
+    state.turn_type = 'Comprar_Soldados'
+    return state
+
+
+class RiskInitialStatePool():
+    """
+    Reserva de estados iniciales pregenerados (ver make_opening_state) para que reset solo tenga que sacar uno.
+
+    Los estados salen de un único random.Random(seed), en el orden en que se generan, y cada uno se entrega
+    una sola vez (quien lo recibe puede modificarlo). Un hilo en segundo plano rellena la reserva hasta size
+    cuando baja de la mitad; si se vacía, el estado se genera en el momento con el mismo generador, así que la
+    secuencia de partidas de una semilla no depende de cuándo rellene el hilo.
+    Solo lee el tablero, que debe tener ya los jugadores añadidos y no cambiar mientras se use.
+    """
+    def __init__(self, board, n_players, size=POOL_SIZE, seed=None, background=True):
+        self.board = board
+        self.n_players = n_players
+        self.size = size
+
+        self.rng = random.Random(seed)
+        """ Generador de los repartos (solo se usa con lock) """
+
+        self.states = deque()
+        """ Estados generados que aún no se han entregado, en orden """
+
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.closed = False
+
+        self.thread = None
+        if background:
+            self.thread = threading.Thread(target=self._refill_loop, name="RiskInitialStatePool", daemon=True)
+            self.thread.start()
+        else:
+            self.refill()
+
+    def _generate(self):
+        """Genera el siguiente estado de la secuencia (con lock)"""
+        return make_opening_state(self.board, self.n_players, self.rng)
+
+    def refill(self):
+        """Genera estados hasta tener size"""
+        with self.lock:
+            while len(self.states) < self.size and not self.closed:
+                self.states.append(self._generate())
+
+    def _refill_loop(self):
+        while True:
+            with self.wakeup:
+                while not self.closed and len(self.states) >= self.size // 2:
+                    self.wakeup.wait()
+            # Hasta size, de uno en uno y soltando el lock entre medias para no bloquear a get
+            while True:
+                with self.lock:
+                    if self.closed:
+                        return
+                    if len(self.states) >= self.size:
+                        break
+                    self.states.append(self._generate())
+                time.sleep(0)
+
+    def get(self):
+        """Siguiente estado inicial (ya no está en la reserva: se puede modificar)"""
+        with self.wakeup:
+            state = self.states.popleft() if self.states else self._generate()
+            if len(self.states) < self.size // 2:
+                self.wakeup.notify()
+        return state
+
+    def seed(self, seed=None):
+        """Reinicia la secuencia de estados con la semilla dada (descarta los ya generados)"""
+        with self.lock:
+            self.rng.seed(seed)
+            self.states.clear()
+            self.wakeup.notify()
+
+    def close(self):
+        """Para el hilo de relleno"""
+        with self.wakeup:
+            self.closed = True
+            self.wakeup.notify()
+        if self.thread is not None:
+            self.thread.join()
@@ -0,0 +1,302 @@
+import os
+import sys
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+from stable_baselines3.common.vec_env import VecEnv
+
+# Configuración de rutas
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+import risktools
+from risk_gym_env import FlatActionTable
+from risk_batch_env import RiskBatchEnv
+
+
+def _make_infos(valid, terminated, truncated, terminal_obs):
+    """Per environment info dicts of the last step (SB3 conventions for finished episodes)"""
+    infos = [{"valid": bool(v)} for v in valid]
+    for i in np.flatnonzero(terminated | truncated):
+        infos[i]["terminal_observation"] = terminal_obs[i].copy()
+        infos[i]["TimeLimit.truncated"] = bool(truncated[i] and not terminated[i])
+    return infos
+
+
+class RiskVecEnv(VecEnv):
+    """
+    VecEnv de Stable-Baselines3 con n_envs partidas de RiskTotalControlEnv en un solo proceso,
+    avanzadas a la vez por un RiskBatchEnv (sin pipes ni copias de entornos).
+
+    Compatible con MaskablePPO: env_method("action_masks") devuelve la máscara de cada partida.
+    Las partidas terminadas se reinician solas; la última observación va en info["terminal_observation"].
+    """
+    def __init__(self, n_envs, style="standard", n_players=4, seed=None, **env_kwargs):
+        self.env = RiskBatchEnv(n_envs, style=style, n_players=n_players, seed=seed, **env_kwargs)
+        """ Partidas y buffers preasignados """
+
+        self._actions = None
+        super().__init__(n_envs, self.env.observation_space, self.env.action_space)
+
+    def reset(self):
+        return self.env.reset().copy()
+
+    def step_async(self, actions):
+        self._actions = actions
+
+    def step_wait(self):
+        obs, rewards, terminated, truncated = self.env.step(self._actions)
+        infos = _make_infos(self.env.valid, terminated, truncated, self.env.terminal_obs)
+        return obs.copy(), rewards.copy(), terminated | truncated, infos
+
+    def action_masks(self):
+        """[n_envs, mask_dim] masks of the current states"""
+        return self.env.action_masks().copy()
+
+    def seed(self, seed=None):
+        self.env.seed(seed)
+        return [seed] * self.num_envs
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name, indices=None):
+        target = self if attr_name == "action_masks" else self.env
+        return [getattr(target, attr_name)] * len(self._get_indices(indices))
+
+    def set_attr(self, attr_name, value, indices=None):
+        # Todas las partidas comparten la configuración del RiskBatchEnv
+        setattr(self.env, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        indices = self._get_indices(indices)
+        if method_name == "action_masks":
+            masks = self.action_masks()
+            return [masks[i] for i in indices]
+        result = getattr(self.env, method_name)(*method_args, **method_kwargs)
+        return [result] * len(indices)
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False] * len(self._get_indices(indices))
+
+
+def _shard_worker(remote, parent_remote, buffers, lo, hi, env_kwargs, seed):
+    """
+    Runs a RiskBatchEnv over games lo:hi, writing its results into the shared buffers.
+
+    Answers every command with (error, result): if a command raises, the exception goes back to the
+    parent (which re-raises it) and the worker keeps serving. If the RiskBatchEnv cannot be built,
+    every command is answered with that error.
+    """
+    parent_remote.close()
+    blocks = []
+    views = dict()
+    env = actions = None
+    init_error = None
+    try:
+        for name, (shm_name, shape, dtype) in buffers.items():
+            shm = shared_memory.SharedMemory(name=shm_name)
+            blocks.append(shm)
+            views[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)[lo:hi]
+        actions = views.pop("actions")
+        env = RiskBatchEnv(hi - lo, seed=seed, buffers=views, **env_kwargs)
+    except Exception as e:
+        init_error = e
+    try:
+        while True:
+            try:
+                cmd, data = remote.recv()
+            except EOFError:
+                break
+            if cmd == "close":
+                break
+            error, result = init_error, None
+            if error is None:
+                try:
+                    result = _shard_command(env, actions, cmd, data)
+                except Exception as e:
+                    error = e
+            try:
+                remote.send((error, result))
+            except Exception as e:
+                # Excepciones o resultados que no se pueden serializar
+                remote.send((RuntimeError(f"{cmd}: {error or e!r}"), None))
+    except KeyboardInterrupt:
+        print("[SHARD] Worker interrumpido")
+    finally:
+        del env, actions, views
+        for shm in blocks:
+            shm.close()
+        remote.close()
+
+
+def _shard_command(env, actions, cmd, data):
+    """Executes one ShardedRiskVecEnv command on the worker's RiskBatchEnv"""
+    if cmd == "step":
+        env.step(actions)
+        env.action_masks()
+    elif cmd == "reset":
+        env.reset()
+        env.action_masks()
+    elif cmd == "seed":
+        env.seed(data)
+    elif cmd == "get_attr":
+        return getattr(env, data)
+    elif cmd == "set_attr":
+        setattr(env, data[0], data[1])
+    else:
+        raise NotImplementedError(f"Orden desconocida para el worker: {cmd}")
+    return None
+
+
+class ShardedRiskVecEnv(VecEnv):
+    """
+    RiskVecEnv repartido entre n_workers procesos, cada uno con un RiskBatchEnv de n_envs / n_workers partidas.
+
+    Las acciones, observaciones, máscaras, recompensas y finales de partida viven en memoria compartida:
+    cada worker escribe directamente en su trozo y por los pipes solo viajan las órdenes. Las máscaras se
+    calculan en los workers al final de cada paso, en paralelo, así que action_masks no espera a nadie.
+    """
+    def __init__(self, n_envs, n_workers, style="standard", n_players=4, seed=None, start_method=None, **env_kwargs):
+        n_workers = max(1, min(n_workers, n_envs))
+        board = risktools.loadBoard(os.path.join(parent_dir, "world.zip"))
+        flat = env_kwargs.get("action_mode") == "flat"
+        env_kwargs = dict(env_kwargs, style=style, n_players=n_players)
+
+        # Un bloque de memoria compartida por buffer (incluidas las acciones)
+        specs = RiskBatchEnv.buffer_specs(n_envs, len(board.territories), FlatActionTable(board) if flat else None)
+        specs["actions"] = ((n_envs,) if flat else (n_envs, 4), np.int64)
+        self._blocks = []
+        self._buffers = dict()
+        self.remotes, self.processes = [], []
+        self.waiting = False
+        self.closed = False
+        try:
+            shared = dict()
+            for name, (shape, dtype) in specs.items():
+                dtype = np.dtype(dtype)
+                shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+                self._blocks.append(shm)
+                self._buffers[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+                shared[name] = (shm.name, shape, dtype.str)
+
+            if start_method is None:
+                # forkserver y spawn no heredan nada del proceso padre
+                start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            ctx = multiprocessing.get_context(start_method)
+            bounds = np.linspace(0, n_envs, n_workers + 1).astype(int)
+            for w in range(n_workers):
+                remote, work_remote = ctx.Pipe()
+                worker_seed = None if seed is None else seed + w
+                args = (work_remote, remote, shared, int(bounds[w]), int(bounds[w+1]), env_kwargs, worker_seed)
+                process = ctx.Process(target=_shard_worker, args=args, daemon=True)
+                process.start()
+                work_remote.close()
+                self.remotes.append(remote)
+                self.processes.append(process)
+
+            self.bounds = bounds
+            """ Partidas de cada worker: bounds[w]:bounds[w+1] """
+
+            observation_space, action_space = self._call("get_attr", "observation_space")[0], self._call("get_attr", "action_space")[0]
+            super().__init__(n_envs, observation_space, action_space)
+        except BaseException:
+            # Sin esto los workers y los bloques de memoria compartida quedarían huérfanos
+            self._release(terminate=True)
+            raise
+
+    def _call(self, cmd, data=None, workers=None):
+        """Sends a command to the given workers (all by default) and returns their answers"""
+        workers = range(len(self.remotes)) if workers is None else workers
+        for w in workers:
+            self.remotes[w].send((cmd, data))
+        return self._recv(workers)
+
+    def _recv(self, workers=None):
+        """Answers of the given workers (all by default); re-raises the first error sent by a worker"""
+        workers = range(len(self.remotes)) if workers is None else workers
+        answers = [self.remotes[w].recv() for w in workers]
+        for error, _ in answers:
+            if error is not None:
+                raise error
+        return [result for _, result in answers]
+
+    def _workers_of(self, indices):
+        return sorted({int(np.searchsorted(self.bounds, i, side="right")) - 1 for i in indices})
+
+    def reset(self):
+        self._call("reset")
+        return self._buffers["obs"].copy()
+
+    def step_async(self, actions):
+        self._buffers["actions"][:] = actions
+        for remote in self.remotes:
+            remote.send(("step", None))
+        self.waiting = True
+
+    def step_wait(self):
+        self.waiting = False
+        self._recv()
+        b = self._buffers
+        infos = _make_infos(b["valid"], b["terminated"], b["truncated"], b["terminal_obs"])
+        return b["obs"].copy(), b["rewards"].copy(), b["terminated"] | b["truncated"], infos
+
+    def action_masks(self):
+        """[n_envs, mask_dim] masks of the current states (computed by the workers after each step)"""
+        return self._buffers["masks"].copy()
+
+    def seed(self, seed=None):
+        for w, remote in enumerate(self.remotes):
+            remote.send(("seed", None if seed is None else seed + w))
+        self._recv()
+        return [seed] * self.num_envs
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            for remote in self.remotes:
+                remote.recv()
+        self._release()
+
+    def _release(self, terminate=False):
+        """Stops the workers (killing them if terminate) and frees the shared memory blocks"""
+        for remote in self.remotes:
+            try:
+                remote.send(("close", None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            if terminate:
+                process.terminate()
+            process.join()
+        for remote in self.remotes:
+            remote.close()
+        self._buffers = dict()
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self.closed = True
+
+    def get_attr(self, attr_name, indices=None):
+        indices = self._get_indices(indices)
+        if attr_name == "action_masks":
+            return [self.action_masks] * len(indices)
+        values = dict(zip(self._workers_of(indices), self._call("get_attr", attr_name, self._workers_of(indices))))
+        return [values[int(np.searchsorted(self.bounds, i, side="right")) - 1] for i in indices]
+
+    def set_attr(self, attr_name, value, indices=None):
+        self._call("set_attr", (attr_name, value), self._workers_of(self._get_indices(indices)))
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        indices = self._get_indices(indices)
+        if method_name != "action_masks":
+            raise NotImplementedError(f"ShardedRiskVecEnv no admite env_method('{method_name}')")
+        masks = self.action_masks()
+        return [masks[i] for i in indices]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False] * len(self._get_indices(indices))
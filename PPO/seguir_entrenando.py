@@ -2,20 +2,19 @@ import os
 import time
 import multiprocessing
 from sb3_contrib import MaskablePPO
-from sb3_contrib.common.wrappers import ActionMasker
-from stable_baselines3.common.monitor import Monitor
-from stable_baselines3.common.vec_env import SubprocVecEnv
+from stable_baselines3.common.vec_env import VecMonitor
 from stable_baselines3.common.callbacks import CheckpointCallback
 
-# Importamos nuestro entorno personalizado
-# Asegúrate de que risk_gym_env.py esté en la misma carpeta
-from risk_gym_env import RiskTotalControlEnv
+# Importamos nuestro entorno personalizado (versión vectorizada de RiskTotalControlEnv)
+from risk_vec_env import RiskVecEnv, ShardedRiskVecEnv
 
 # --- CONFIGURACIÓN DE LA REANUDACIÓN ---
 TIMESTEPS_EXTRA = 100_000  # Cuántos pasos MÁS quieres entrenar
 TIMESTEPS_PREVIAS=917784
 LOG_DIR = "./logs_ppo/"
 SAVE_FREQ = 5_000
+# Una partida por proceso: el mismo número de entornos (y de pasos por rollout) que el entrenamiento original
+GAMES_PER_WORKER = 1
 STYLE = "aggressive"
 NOMBRE_MODELO_ORIGEN = f"risk_ppo_aggressive_{TIMESTEPS_PREVIAS}_steps" 
 RUTA_MODELO_CARGA = os.path.join(LOG_DIR, f"{NOMBRE_MODELO_ORIGEN}.zip")
@@ -23,24 +22,30 @@ RUTA_MODELO_CARGA = os.path.join(LOG_DIR, f"{NOMBRE_MODELO_ORIGEN}.zip")
 # Nombre para el nuevo modelo (para no sobrescribir el viejo inmediatamente)
 MODEL_NAME_NUEVO = f"risk_ppo_{STYLE}"
 
-def make_env():
-    """Crea y envuelve el entorno para RL (Debe ser IDÉNTICO al original)."""
-    env = RiskTotalControlEnv(style=STYLE)
-    env = Monitor(env, LOG_DIR)
-    env = ActionMasker(env, lambda e: e.get_wrapper_attr("action_masks")())
+def make_env(num_workers):
+    """
+    Crea el entorno vectorizado para RL (Debe ser IDÉNTICO al original).
+    RiskVecEnv reproduce RiskTotalControlEnv (observaciones, máscaras y recompensas), con VecMonitor en lugar de Monitor.
+    """
+    n_envs = GAMES_PER_WORKER * num_workers
+    if num_workers == 1:
+        env = RiskVecEnv(n_envs, style=STYLE)
+    else:
+        env = ShardedRiskVecEnv(n_envs, num_workers, style=STYLE)
+    env = VecMonitor(env, LOG_DIR)
     return env
 
 def main():
     # 1. Configuración inicial
     os.makedirs(LOG_DIR, exist_ok=True)
-    num_cpu = multiprocessing.cpu_count() - 1
+    num_cpu = max(1, multiprocessing.cpu_count() - 1)
     
     print(f"[INIT] Preparando para continuar entrenamiento: {STYLE.upper()}")
     print(f"[CPU] Usando {num_cpu} núcleos.")
 
     # 2. Crear entorno vectorizado
     # Es vital recrear el entorno para que el modelo tenga dónde interactuar
-    env = SubprocVecEnv([make_env for _ in range(num_cpu)])
+    env = make_env(num_cpu)
 
     # 3. CARGAR EL MODELO EXISTENTE
     print(f"[LOAD] Cargando modelo desde: {RUTA_MODELO_CARGA}")
@@ -47,7 +47,7 @@ try:
     
     if action:
         print(f"ÉXITO! La IA devolvió una acción válida.")
-        print(f"Detalle: {action.to_string()}")
+        print(f"Detalle: {action.to_string(state.board)}")
     else:
         print("La IA devolvió None (¿Quizás el modelo no cargó?).")
         
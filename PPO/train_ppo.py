@@ -1,14 +1,12 @@
 import os
 import time
 from sb3_contrib import MaskablePPO
-from sb3_contrib.common.wrappers import ActionMasker
-from stable_baselines3.common.monitor import Monitor
-from stable_baselines3.common.vec_env import SubprocVecEnv
+from stable_baselines3.common.vec_env import VecMonitor, SubprocVecEnv
 import multiprocessing
 from stable_baselines3.common.callbacks import CheckpointCallback
 
-# Importamos nuestro entorno personalizado
-# Asegúrate de que el archivo del entorno se llame 'risk_gym_env.py'
+# Importamos nuestro entorno personalizado (versión vectorizada de RiskTotalControlEnv)
+from risk_vec_env import RiskVecEnv, ShardedRiskVecEnv
 from risk_gym_env import RiskTotalControlEnv
 
 # --- CONFIGURACIÓN DEL ENTRENAMIENTO ---
@@ -16,6 +14,13 @@ TIMESTEPS = 1_000_000
 LOG_DIR = "./logs_ppo/"
 SAVE_FREQ = 5_000
 
+# Partidas simultáneas en cada proceso (todas avanzan a la vez sobre arrays de NumPy)
+# N_STEPS y SAVE_FREQ se dividen entre ellas: cada rollout y cada checkpoint siguen teniendo los mismos pasos en total
+GAMES_PER_WORKER = 16
+
+# Pasos de cada rollout por proceso (con una partida por proceso, el n_steps de PPO)
+N_STEPS = 256
+
 # 1. ELIGE TU PERSONALIDAD
 STYLE = "aggressive"  # "standard", "aggressive", "defensive", "capitalist"
 
@@ -25,19 +30,34 @@ STYLE = "aggressive"  # "standard", "aggressive", "defensive", "capitalist"
 # 6 = 1 Agente vs 5 Bots 
 N_PLAYERS = 6
 
+# 3. ELIGE EL ESPACIO DE ACCIONES
+# "multidiscrete" = [tipo, origen, destino, cantidad] (el de siempre)
+# "flat" = Discrete sobre la tabla de todas las acciones del mapa, con máscara exacta (sin acciones inválidas)
+# "phase" = cada paso es una fase entera del turno (reparto de refuerzos, plan de ataque, fortificación)
+ACTION_MODE = "multidiscrete"
+
 # Actualizamos el nombre para distinguir modelos de duelo vs modelos de 4 jugadores
-MODEL_NAME = f"risk_ppo_{STYLE}_{N_PLAYERS}p" 
+MODEL_NAME = f"risk_ppo_{STYLE}_{N_PLAYERS}p" + ("" if ACTION_MODE == "multidiscrete" else f"_{ACTION_MODE}")
 
-def make_env():
-    """Crea y envuelve el entorno para RL."""
-    # 1. Instanciamos el entorno pasando el estilo Y el número de jugadores
-    env = RiskTotalControlEnv(style=STYLE, n_players=N_PLAYERS)
+def make_phase_env():
+    """Partida de RiskTotalControlEnv con action_mode="phase" (el modo por fases no tiene versión por lotes)"""
+    return RiskTotalControlEnv(style=STYLE, n_players=N_PLAYERS, action_mode="phase")
+
+def make_env(num_workers):
+    """Crea el entorno vectorizado para RL: GAMES_PER_WORKER partidas en cada proceso."""
+    # 1. Instanciamos las partidas pasando el estilo Y el número de jugadores
+    n_envs = GAMES_PER_WORKER * num_workers
+    if ACTION_MODE == "phase":
+        # Un proceso por partida: cada paso ya ejecuta decenas de acciones del motor
+        env = SubprocVecEnv([make_phase_env for _ in range(num_workers)])
+    elif num_workers == 1:
+        env = RiskVecEnv(n_envs, style=STYLE, n_players=N_PLAYERS, action_mode=ACTION_MODE)
+    else:
+        env = ShardedRiskVecEnv(n_envs, num_workers, style=STYLE, n_players=N_PLAYERS, action_mode=ACTION_MODE)
     
     # 2. Monitor para registrar logs
-    env = Monitor(env, LOG_DIR)
-    
-    # 3. ActionMasker para prohibir acciones ilegales
-    env = ActionMasker(env, lambda e: e.get_wrapper_attr("action_masks")())
+    # (las máscaras de acciones ilegales las da el propio VecEnv con action_masks, sin ActionMasker)
+    env = VecMonitor(env, LOG_DIR)
     
     return env
 
@@ -55,10 +75,12 @@ def main():
     # aunque aquí son entornos paralelos independientes, así que usa todos los que puedas.
     if num_cpu < 1: num_cpu = 1
     
-    print(f"[PARALELISMO] Usando {num_cpu} entornos simultáneos.")
+    print(f"[PARALELISMO] Usando {num_cpu} procesos con {GAMES_PER_WORKER} partidas cada uno.")
 
     # Crear entornos paralelos
-    env = SubprocVecEnv([make_env for _ in range(num_cpu)])
+    env = make_env(num_cpu)
+    # Partidas de cada proceso (en el modo por fases, una)
+    games_per_worker = env.num_envs // num_cpu
 
     # Definición del Modelo PPO
     model = MaskablePPO(
@@ -71,12 +93,13 @@ def main():
         # batch_size: Cuantas experiencias recoge antes de actualizar.
         # Al haber más jugadores, los turnos son más largos y complejos.
         batch_size=256,  
-        n_steps=256,    
+        n_steps=max(1, N_STEPS // games_per_worker),    
         ent_coef=0.01
     )   
 
     checkpoint_callback = CheckpointCallback(
-        save_freq=SAVE_FREQ,
+        # save_freq cuenta llamadas al VecEnv (un paso de cada partida)
+        save_freq=max(1, SAVE_FREQ // games_per_worker),
         save_path=LOG_DIR,
         name_prefix=MODEL_NAME
     )
@@ -1,49 +1,97 @@
+import itertools
+import functools
 from config_atrib import *
 from clases.action import *
+from clases.execution import *
 from atributos.happiness import *
 
-def getAttackActions(state):
+def getAttackActions(state, macro=False):
     """
      Returns a list of all the Attack actions possible in this state
      An action is to attack another territory from a territory owned by the current_player where 2 or more troops are
+     If macro is True, the macro variant of each attack (continue until conquest, see getBattleOutcomes) is also included,
+     after the single roll attacks
     """
-    actions = []
+    edges = []
+    index = state.board.index
+    pool = state.board.action_pool
+    offsets = index.neighbor_offsets
     
     for i in range(len(state.owners)):
         if state.owners[i] == state.current_player and state.armies[i] >= 2:
-            from_territory = state.board.territories[i].name
-            for n in state.board.territories[i].neighbors:
-                if state.owners[n] != state.current_player:
-                    to_territory = state.board.territories[n].name
-                    a = RiskAction('Attack', to_territory, from_territory, None)
-                    actions.append(a)
+            for e in range(offsets[i], offsets[i+1]):
+                if state.owners[index.neighbor_ids[e]] != state.current_player:
+                    edges.append(e)
     
-    no_action = RiskAction('Attack', None, None, None)
-    actions.append(no_action)
+    actions = [pool.attack[e] for e in edges]
+    if macro:
+        actions.extend([pool.attack_macro[e] for e in edges])
+    
+    actions.append(pool.attack_stop)
     
     return actions
 
-def getNumAttackSuccessors(state, action):
+def isAttackLegal(state, action, macro=False):
     """
-    Determines how many possible states could result from this attack action
+     Returns True if action is one of getAttackActions(state, macro), checking the rules directly
+     (O(1), with the adjacency matrix of the board index)
+    """
+    a = action.from_territory
+    d = action.to_territory
+    if a is None and d is None:
+        return action.unidades is None
+    if not (is_territory(a, state.board) and is_territory(d, state.board)):
+        return False
+    if action.unidades is not None and not (macro and is_int(action.unidades) and action.unidades == 1):
+        return False
+    return (state.owners[a] == state.current_player and state.armies[a] >= 2
+            and state.owners[d] != state.current_player and state.board.index.is_adjacent(a, d))
+
+def isWinter(state):
+    """Devuelve True si es un mes de invierno (el defensor puede tirar hasta 3 dados)"""
+    return state.mes in [11, 12, 1, 2]
+
+def getAttackDice(state, a_idx, d_idx):
+    """
+    Devuelve el número de dados del atacante y del defensor (a_num_dice, d_num_dice)
+    para un ataque desde a_idx hacia d_idx (el atacante siempre ataca con todos sus dados)
     """
-    # Get indices of involved territories
-    a_idx = state.board.territory_to_id[action.from_territory]
-    d_idx = state.board.territory_to_id[action.to_territory]
-  
     # --- LOGICA DE INVIERNO ---
     # Si es mes de invierno, el defensor defiende con hasta 3
-    max_d_dice = 3 if state.mes in [11, 12, 1, 2] else 2
+    max_d_dice = 3 if isWinter(state) else 2
     
     a_num_dice = min(3, state.armies[a_idx]-1)
     d_num_dice = min(max_d_dice, state.armies[d_idx])
+    return a_num_dice, d_num_dice
+
+def getNumAttackSuccessors(state, action):
+    """
+    Determines how many possible states could result from this attack action
+    """
+    # Get indices of involved territories
+    a_idx = action.from_territory
+    d_idx = action.to_territory
+
+    if action.unidades is not None:
+        return len(getBattleOutcomes(state.armies[a_idx], state.armies[d_idx], isWinter(state), action.unidades))
+  
+    a_num_dice, d_num_dice = getAttackDice(state, a_idx, d_idx)
     
-    num_outcomes = min(a_num_dice, d_num_dice) + 1
-    
-    if num_outcomes > 3:
-        num_outcomes = 3
-        
-    return num_outcomes
+    return len(ATTACK_OUTCOMES[a_num_dice-1][d_num_dice-1])
+
+def getAttackProbabilities(state, action):
+    """
+    Devuelve la lista de probabilidades de cada outcome_index de este ataque,
+    en el mismo orden que los sucesores de simulateAttack
+    """
+    if action.from_territory is None:
+        return [1]
+    a_idx = action.from_territory
+    d_idx = action.to_territory
+    if action.unidades is not None:
+        return [outcome[2] for outcome in getBattleOutcomes(state.armies[a_idx], state.armies[d_idx], isWinter(state), action.unidades)]
+    a_num_dice, d_num_dice = getAttackDice(state, a_idx, d_idx)
+    return [outcome[2] for outcome in ATTACK_OUTCOMES[a_num_dice-1][d_num_dice-1]]
     
 def getAttackOutcome(a_num_dice, d_num_dice, outcome_index):
     """
@@ -51,61 +99,68 @@ def getAttackOutcome(a_num_dice, d_num_dice, outcome_index):
     result of a battle between the given number of dice.
     It will return the attacker_loss, defender_loss, outcome_probability
     """
-    
-    #Index by attacker dice, defender dice, outcome number
-    outcome_probabilities = [
-        # 1 Dado Atacante vs [1, 2, 3] Dados Defensor
-        [
-            [0.4167, 0.5833],           # 1v1
-            [0.2546, 0.7454],           # 1v2
-            [0.1500, 0.8500]            # 1v3 (Estimado: muy difícil para el atacante)
-        ],
-        # 2 Dados Atacante vs [1, 2, 3] Dados Defensor
-        [
-            [0.5787, 0.4213],           # 2v1
-            [0.2276, 0.3241, 0.4483],   # 2v2
-            [0.1000, 0.3000, 0.6000]    # 2v3 (Estimado: el defensor gana más a menudo)
-        ],
-        # 3 Dados Atacante vs [1, 2, 3] Dados Defensor
-        [
-            [0.6597, 0.3404],           # 3v1
-            [0.3717, 0.3358, 0.2926],   # 3v2
-            [0.2500, 0.4000, 0.3500]    # 3v3 (Estimado: batalla muy reñida con ventaja defensiva)
-        ]
-    ]
-    attacker_loss = 0
-    defender_loss = 0
-    # Accedemos a la probabilidad
-    outcome_probability = outcome_probabilities[a_num_dice-1][d_num_dice-1][outcome_index]
-    
-    total_loss = min(a_num_dice, d_num_dice)
-    if d_num_dice == 3 and a_num_dice >= 2:
-        total_loss = 2 # Capamos la pérdida a 2 aunque haya 3 dados defensivos
-    elif d_num_dice == 3 and a_num_dice == 1:
-        total_loss = 1
-
-    if total_loss == 1:
-        if outcome_index == 0:
-            defender_loss = 1
-        elif outcome_index == 1:
-            attacker_loss = 1
-        else:
-            print('Attack Outcome Index invalid')
-        
-    elif total_loss == 2:
-        if outcome_index == 0:
-            defender_loss = 2
-        elif outcome_index == 1:
-            defender_loss = 1
-            attacker_loss = 1
-        elif outcome_index == 2:
-            attacker_loss = 2
-        else:
-            print('Attack Outcome index invalid')
-    else:
-        print('Total Loss is invalid or 3v3 logic not implemented fully. Total Loss:', total_loss)
-   
-    return attacker_loss, defender_loss, outcome_probability
+    return ATTACK_OUTCOMES[a_num_dice-1][d_num_dice-1][outcome_index]
+
+def computeAttackOutcomes(a_num_dice, d_num_dice):
+    """
+    Calcula de forma exacta, enumerando todas las tiradas, los resultados posibles de una tirada
+    con a_num_dice dados atacantes contra d_num_dice defensores.
+    Se comparan los dados más altos por parejas y el defensor gana los empates. Con 3 dados
+    defensores (invierno) sólo se comparan 2 parejas (1 si el atacante tira un único dado).
+    Devuelve una tupla de (attacker_loss, defender_loss, probability), ordenada de mejor a peor para el atacante
+    """
+    total_loss = min(a_num_dice, d_num_dice, 2)
+    counts = [0]*(total_loss+1)
+    for a_roll in itertools.product(range(1, 7), repeat=a_num_dice):
+        a_sorted = sorted(a_roll, reverse=True)
+        for d_roll in itertools.product(range(1, 7), repeat=d_num_dice):
+            d_sorted = sorted(d_roll, reverse=True)
+            attacker_loss = sum(1 for k in range(total_loss) if a_sorted[k] <= d_sorted[k])
+            counts[attacker_loss] += 1
+    total = 6**(a_num_dice + d_num_dice)
+    return tuple((attacker_loss, total_loss - attacker_loss, counts[attacker_loss] / total) for attacker_loss in range(total_loss+1))
+
+# Tabla de resultados de una tirada, indexada por [dados atacante - 1][dados defensor - 1][outcome_index]
+# Cada resultado es (attacker_loss, defender_loss, probability). Se calcula una sola vez al importar el módulo
+ATTACK_OUTCOMES = tuple(tuple(computeAttackOutcomes(a, d) for d in range(1, 4)) for a in range(1, 4))
+
+# Batallas distintas que guarda el memo de getBattleOutcomes (se descartan las usadas hace más tiempo)
+BATTLE_CACHE_SIZE = 4096
+
+def getBattleOutcomes(a, d, winter, stop=1):
+    """
+    Distribución exacta del resultado de una batalla completa: el atacante, con a tropas en su territorio,
+    tira contra las d tropas del defensor hasta conquistarlo o hasta quedarse con stop tropas (como mínimo 1).
+    Se calcula por programación dinámica sobre ATTACK_OUTCOMES, propagando la probabilidad de cada
+    (tropas atacante, tropas defensor) intermedio por orden decreciente de tropas totales.
+    Devuelve una tupla de (attacker_remaining, defender_remaining, probability): primero las conquistas
+    (defender_remaining == 0) de más a menos tropas restantes, después el resto
+    Los resultados se guardan en un memo persistente acotado a BATTLE_CACHE_SIZE batallas (LRU)
+    """
+    return computeBattleOutcomes(a, d, bool(winter), max(stop, 1))
+
+@functools.lru_cache(maxsize=BATTLE_CACHE_SIZE)
+def computeBattleOutcomes(a, d, winter, stop):
+    """Cálculo de getBattleOutcomes (memo de las últimas BATTLE_CACHE_SIZE batallas)"""
+    max_d_dice = 3 if winter else 2
+    final = dict()
+    # pending[total] guarda la probabilidad de cada estado intermedio con a + d == total
+    pending = {a + d: {(a, d): 1.0}}
+    for total in range(a + d, -1, -1):
+        for (x, y), p in pending.pop(total, {}).items():
+            if y == 0 or x <= stop:
+                final[(x, y)] = final.get((x, y), 0) + p
+                continue
+            for a_loss, d_loss, q in ATTACK_OUTCOMES[min(3, x-1)-1][min(max_d_dice, y)-1]:
+                nx, ny = x - a_loss, y - d_loss
+                bucket = pending.setdefault(nx + ny, dict())
+                bucket[(nx, ny)] = bucket.get((nx, ny), 0) + p*q
+
+    return tuple((x, y, p) for (x, y), p in sorted(final.items(), key=lambda item: (item[0][1], -item[0][0])))
+
+def getBattleWinProbability(a, d, winter, stop=1):
+    """Probabilidad exacta de conquistar el territorio con una batalla completa (ver getBattleOutcomes)"""
+    return sum(p for x, y, p in getBattleOutcomes(a, d, winter, stop) if y == 0)
    
 def simulateAttack(input_state, action):
     """
@@ -146,11 +201,15 @@ def simulateAttackAction(state, action, outcome_index):
     #a is attacker and d is defender
     
     #Get indices of involved territories
-    a_idx = state.board.territory_to_id[action.from_territory]
-    d_idx = state.board.territory_to_id[action.to_territory]
+    a_idx = action.from_territory
+    d_idx = action.to_territory
   
-    #MAKE SURE THIS IS VALID
-    if state.owners[a_idx] != state.current_player or state.owners[d_idx] == state.current_player or state.armies[a_idx] <= 1: 
+    #MAKE SURE THIS IS VALID (not in trusted mode)
+    checked = state.execution_mode != EXEC_TRUSTED
+    if checked and (state.owners[a_idx] != state.current_player or state.owners[d_idx] == state.current_player or state.armies[a_idx] <= 1):
+        if state.execution_mode == EXEC_STRICT:
+            raise RiskActionError(action, 'must attack an enemy territory from a territory of the current player with more than 1 troop', state.board,
+                                  from_owner=state.owners[a_idx], to_owner=state.owners[d_idx], from_armies=state.armies[a_idx], current_player=state.current_player)
         print('INVALID ATTACK ACTION: ')
         action.print_action()
         print('NO ATTACK ACTION WILL BE TAKEN')
@@ -163,23 +222,29 @@ def simulateAttackAction(state, action, outcome_index):
     #Player id of defender
     defender = state.owners[d_idx]
 
-    # Si es invierno el defensor puede tener hasta 3 dados para defenderse
-    max_dice_d = 3 if state.mes in [11, 12, 1, 2] else 2
-
-    #Get number of dice that will be involved (This assumes attacker always attacks with all dice)
-    a_num_dice = min(3, state.armies[a_idx]-1)
-    d_num_dice = min(max_dice_d, state.armies[d_idx])
-
-    if state.armies[d_idx] == 0:
+    if checked and state.armies[d_idx] == 0:
+        if state.execution_mode == EXEC_STRICT:
+            raise RiskActionError(action, 'the defending territory has no armies', state.board)
         print('THERE ARE NO ARMIES IN TERRITORY: ', state.board.territories[d_idx].name)
         print('ACTION: ', action.print_action())
         print('State: ', state.print_state())
+
+    if action.unidades is not None:
+        # Ataque completo (macro): el resultado es el estado final de la batalla.
+        # Los efectos en la felicidad se aplican una sola vez, como en un único ataque
+        a_left, d_left, outcome_probability = getBattleOutcomes(state.armies[a_idx], state.armies[d_idx], isWinter(state), action.unidades)[outcome_index]
+        state.set_armies(d_idx, d_left)
+        state.set_armies(a_idx, a_left)
+    else:
+        #Get number of dice that will be involved (This assumes attacker always attacks with all dice)
+        # Si es invierno el defensor puede tener hasta 3 dados para defenderse
+        a_num_dice, d_num_dice = getAttackDice(state, a_idx, d_idx)
         
-    #Get the outcome and probability for the input outcome index
-    a_loss, d_loss, outcome_probability = getAttackOutcome(a_num_dice, d_num_dice, outcome_index)
-    
-    state.armies[d_idx] = max(state.armies[d_idx] - d_loss, 0)
-    state.armies[a_idx] = state.armies[a_idx] - a_loss
+        #Get the outcome and probability for the input outcome index
+        a_loss, d_loss, outcome_probability = ATTACK_OUTCOMES[a_num_dice-1][d_num_dice-1][outcome_index]
+        
+        state.set_armies(d_idx, max(state.armies[d_idx] - d_loss, 0))
+        state.set_armies(a_idx, state.armies[a_idx] - a_loss)
     
     #Check if the defender is at zero, then change owner (armies will be moved in with the next action (Occupy)
     if state.armies[d_idx] == 0:
@@ -188,7 +253,7 @@ def simulateAttackAction(state, action, outcome_index):
             #Si el territorio enemigo no era independiente pierde felicidad
             updateHappiness(state,state.owners[d_idx],BONO_HAPP_DEFEND_WIN)
             updateHappiness(state,state.current_player,BONO_HAPP_ATTACK_WIN)
-        state.owners[d_idx] = state.current_player
+        state.set_owner(d_idx, state.current_player)
     else:
         # Significa que el ataque ha sido un fracaso, por lo que el defensor gana felicidad y el atacante la pierde
         if state.owners[d_idx]!=None:
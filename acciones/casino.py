@@ -16,9 +16,10 @@ def getCasinoActions(state):
         return None
 
     quarter = max_inversion // 4
+    pool = state.board.action_pool
     
     if quarter == 0:
-        actions.append(RiskAction('Casino', None, None, max_inversion))
+        actions.append(pool.get('Casino', None, None, max_inversion))
         
     else:
         amounts = [quarter, quarter * 2, quarter * 3, max_inversion]
@@ -26,10 +27,20 @@ def getCasinoActions(state):
         prev_val = 0
         for amount in amounts:
             if amount > prev_val: 
-                actions.append(RiskAction('Casino', None, None, amount))
+                actions.append(pool.get('Casino', None, None, amount))
                 prev_val = amount
 
     return actions
+def isCasinoLegal(state, action):
+    """
+     Devuelve True si action es una de las opciones de getCasinoActions(state), sin generarlas
+    """
+    max_inversion = int(state.players[state.current_player].economy // CASINO_PRC)
+    if max_inversion < 1 or action.to_territory is not None or action.from_territory is not None or not is_int(action.unidades):
+        return False
+    quarter = max_inversion // 4
+    return action.unidades == max_inversion or (quarter > 0 and action.unidades in (quarter, quarter * 2, quarter * 3))
+
 def simulateCasinoAction(state, action):
     """Realiza las apuestas"""
     prev=state.players[state.current_player].economy
@@ -5,7 +5,13 @@ def getComercioActions(state):
     """
      Devuelve la acción de impulsar el comercio
     """
-    return [RiskAction('Comercio', None, None,None)]
+    return [state.board.action_pool.get('Comercio')]
+
+def isComercioLegal(state, action):
+    """
+     Devuelve True si action es la acción de getComercioActions(state)
+    """
+    return action.to_territory is None and action.from_territory is None and action.unidades is None
 
 def simulateComercioAction(state, action):
     """Execute the given action in the given state.  This will modify the state to 
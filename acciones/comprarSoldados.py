@@ -15,9 +15,10 @@ def getComprarSoldadosActions(state):
         return None
 
     quarter = max_soldados // 4
+    pool = state.board.action_pool
     
     if quarter == 0:
-        actions.append(RiskAction('Comprar_Soldados', None, None, max_soldados))
+        actions.append(pool.get('Comprar_Soldados', None, None, max_soldados))
     
     else:
         amounts = [quarter, quarter * 2, quarter * 3, max_soldados]
@@ -25,11 +26,21 @@ def getComprarSoldadosActions(state):
         prev_val = 0
         for amount in amounts:
             if amount > prev_val:
-                actions.append(RiskAction('Comprar_Soldados', None, None, amount))
+                actions.append(pool.get('Comprar_Soldados', None, None, amount))
                 prev_val = amount
 
     return actions
 
+def isComprarSoldadosLegal(state, action):
+    """
+     Devuelve True si action es una de las opciones de getComprarSoldadosActions(state), sin generarlas
+    """
+    max_soldados = int(state.players[state.current_player].economy // SOLDADOS_PRC)
+    if max_soldados < 1 or action.to_territory is not None or action.from_territory is not None or not is_int(action.unidades):
+        return False
+    quarter = max_soldados // 4
+    return action.unidades == max_soldados or (quarter > 0 and action.unidades in (quarter, quarter * 2, quarter * 3))
+
 def simulateComprarSoldadosAction(state, action):
     """Compra los soldados"""
     prev=state.players[state.current_player].economy
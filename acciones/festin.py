@@ -13,9 +13,10 @@ def getFestinActions(state):
         return None
 
     quarter = max_inversion // 4
+    pool = state.board.action_pool
     
     if quarter == 0:
-        actions.append(RiskAction('Festin', None, None, max_inversion))
+        actions.append(pool.get('Festin', None, None, max_inversion))
     
     else:
         amounts = [quarter, quarter * 2, quarter * 3, max_inversion]
@@ -23,11 +24,21 @@ def getFestinActions(state):
         prev_val = 0
         for amount in amounts:
             if amount > prev_val:
-                actions.append(RiskAction('Festin', None, None, amount))
+                actions.append(pool.get('Festin', None, None, amount))
                 prev_val = amount
 
     return actions
 
+def isFestinLegal(state, action):
+    """
+     Devuelve True si action es una de las opciones de getFestinActions(state), sin generarlas
+    """
+    max_inversion = int(state.players[state.current_player].economy // FESTIN_PRC)
+    if max_inversion < 1 or action.to_territory is not None or action.from_territory is not None or not is_int(action.unidades):
+        return False
+    quarter = max_inversion // 4
+    return action.unidades == max_inversion or (quarter > 0 and action.unidades in (quarter, quarter * 2, quarter * 3))
+
 def simulateFestinAction(state, action):
     """Ejecuta la acción de realizar festines"""
     prev=state.players[state.current_player].economy
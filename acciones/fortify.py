@@ -1,28 +1,47 @@
 from atributos.happiness import *
 from clases.action import *
+from clases.execution import *
 
-def getFortifyActions(state):
+def getFortifyActions(state, expand=True):
     """
      Returns a list of all the Fortify actions possible in this state
      An action is to move troops from one territory to a neighboring territory (both owned by current_player), leaving at least 1 troop in the from_territory
+     If expand is False, a single range action (amount in [1, armies-1]) is returned for each pair of territories
     """
     actions = []
+    index = state.board.index
+    pool = state.board.action_pool
+    offsets = index.neighbor_offsets
     
     for i in range(len(state.owners)):
         if state.owners[i] == state.current_player and state.armies[i] >= 2:
-            from_territory = state.board.territories[i].name
-            for n in state.board.territories[i].neighbors:
+            for e in range(offsets[i], offsets[i+1]):
+                n = index.neighbor_ids[e]
                 if state.owners[n] == state.current_player:
-                    to_territory = state.board.territories[n].name
-                    for k in range(1, state.armies[i]):
-                        a = RiskAction('Fortify', to_territory, from_territory, k)
-                        actions.append(a)
+                    if expand:
+                        actions.extend(pool.fortify_amounts(e, state.armies[i] - 1))
+                    else:
+                        actions.append(pool.get_range('Fortify', n, i, 1, state.armies[i] - 1))
                         
-    no_action = RiskAction('Fortify', None, None, 0)
-    actions.append(no_action)
+    actions.append(pool.fortify_stop)
     
     return actions    
     
+def isFortifyLegal(state, action):
+    """
+     Returns True if action is the 'do not fortify' action or a move accepted by getFortifyActions(state, expand=False),
+     checking the rules directly (O(1), with the adjacency matrix of the board index)
+    """
+    a = action.from_territory
+    d = action.to_territory
+    if a is None and d is None:
+        return is_int(action.unidades) and action.unidades == 0 and action.unidades_max is None
+    if not (is_territory(a, state.board) and is_territory(d, state.board)):
+        return False
+    return (state.owners[a] == state.current_player and state.owners[d] == state.current_player
+            and state.board.index.is_adjacent(a, d)
+            and is_int(action.unidades) and 1 <= action.unidades <= state.armies[a] - 1)
+    
 def simulateFortifyAction(state, action):
     """
     Execute the given action in the given state.  This will modify the state to 
@@ -31,16 +50,19 @@ def simulateFortifyAction(state, action):
     if action.to_territory is None:
         return
         
-    to_idx = state.board.territory_to_id[action.to_territory]
-    from_idx = state.board.territory_to_id[action.from_territory]
+    to_idx = action.to_territory
+    from_idx = action.from_territory
     
-    #Make sure that the fortify action is correctly constructed
-    if state.armies[from_idx] - action.unidades < 1 or state.owners[from_idx] != state.current_player or state.owners[to_idx] != state.current_player or to_idx not in state.board.territories[from_idx].neighbors:
+    #Make sure that the fortify action is correctly constructed (not in trusted mode)
+    if state.execution_mode != EXEC_TRUSTED and (state.armies[from_idx] - action.unidades < 1 or state.owners[from_idx] != state.current_player or state.owners[to_idx] != state.current_player or not state.board.index.is_adjacent(from_idx, to_idx)):
         #This move is invalid
+        if state.execution_mode == EXEC_STRICT:
+            raise RiskActionError(action, 'must move between two adjacent territories of the current player, leaving at least 1 troop', state.board,
+                                  from_owner=state.owners[from_idx], to_owner=state.owners[to_idx], from_armies=state.armies[from_idx], current_player=state.current_player)
         print('INVALID FORTIFY ACTION: ')
         action.print_action()
         print('NO FORTIFY ACTION WILL BE TAKEN')
         return 
         
-    state.armies[to_idx] = state.armies[to_idx] + action.unidades
-    state.armies[from_idx] = state.armies[from_idx] - action.unidades
\ No newline at end of file
+    state.set_armies(to_idx, state.armies[to_idx] + action.unidades)
+    state.set_armies(from_idx, state.armies[from_idx] - action.unidades)
\ No newline at end of file
@@ -14,9 +14,10 @@ def getInvertirActions(state):
         return None
 
     quarter = max_inversion // 4
+    pool = state.board.action_pool
     
     if quarter == 0:
-        actions.append(RiskAction('Invertir', None, None, max_inversion))
+        actions.append(pool.get('Invertir', None, None, max_inversion))
         
     else:
         amounts = [quarter, quarter * 2, quarter * 3, max_inversion]
@@ -24,11 +25,21 @@ def getInvertirActions(state):
         prev_val = 0
         for amount in amounts:
             if amount > prev_val:
-                actions.append(RiskAction('Invertir', None, None, amount))
+                actions.append(pool.get('Invertir', None, None, amount))
                 prev_val = amount
 
     return actions
 
+def isInvertirLegal(state, action):
+    """
+     Devuelve True si action es una de las opciones de getInvertirActions(state), sin generarlas
+    """
+    max_inversion = int(state.players[state.current_player].economy // INVERTIR_PRC)
+    if max_inversion < 1 or action.to_territory is not None or action.from_territory is not None or not is_int(action.unidades):
+        return False
+    quarter = max_inversion // 4
+    return action.unidades == max_inversion or (quarter > 0 and action.unidades in (quarter, quarter * 2, quarter * 3))
+
 def simulateInvertirAction(state, action):
     """Ejecuta la acción de invertir"""
     prev=state.players[state.current_player].economy
@@ -1,35 +1,59 @@
 from atributos.happiness import *
 from clases.action import *
+from clases.execution import *
 
-def getOccupyActions(state):
+def getOccupyActions(state, expand=True):
     """
      Returns a list of all the Occupy actions possible in this state
      An action is to move an amount of troops into the newly conquered country (must leave at least 1 behind, and must move at least min(3,number_there -1))
+     If expand is False, a single range action with all the valid amounts is returned
     """
     actions = []
     
     if state.last_defender is None or state.last_attacker is None:
         return actions
     
-    to_territory = state.board.territories[state.last_defender].name
-    from_territory = state.board.territories[state.last_attacker].name
+    to_territory = state.last_defender
+    from_territory = state.last_attacker
+    pool = state.board.action_pool
+    lo = min(state.armies[state.last_attacker]-1,3)
+    hi = state.armies[state.last_attacker]-1
+
+    if not expand:
+        if lo <= hi:
+            actions.append(pool.get_range('Occupy', to_territory, from_territory, lo, hi))
+        return actions
         
-    for k in range(min(state.armies[state.last_attacker]-1,3), state.armies[state.last_attacker]):
-        a = RiskAction('Occupy', to_territory, from_territory, k)
-        actions.append(a)
+    for k in range(lo, hi+1):
+        actions.append(pool.get('Occupy', to_territory, from_territory, k))
         
     return actions
     
+def isOccupyLegal(state, action):
+    """
+     Returns True if action moves into the conquered territory an amount of troops accepted by
+     getOccupyActions(state, expand=False), checking the rule directly
+    """
+    if state.last_defender is None or state.last_attacker is None:
+        return False
+    if action.to_territory != state.last_defender or action.from_territory != state.last_attacker:
+        return False
+    hi = state.armies[state.last_attacker]-1
+    return is_int(action.unidades) and min(hi, 3) <= action.unidades <= hi
+    
 def simulateOccupyAction(state, action):    
     """
     Execute the given action in the given state.  This will modify the state to 
     reflect the outcome of the state.
     """
-    to_idx = state.board.territory_to_id[action.to_territory]
-    from_idx = state.board.territory_to_id[action.from_territory]
-    #Make sure that the occupy action is correctly constructed
-    if to_idx != state.last_defender or from_idx != state.last_attacker or state.armies[from_idx] - action.unidades < 1 or state.owners[from_idx] != state.current_player or state.owners[to_idx] != state.current_player:
+    to_idx = action.to_territory
+    from_idx = action.from_territory
+    #Make sure that the occupy action is correctly constructed (not in trusted mode)
+    if state.execution_mode != EXEC_TRUSTED and (to_idx != state.last_defender or from_idx != state.last_attacker or state.armies[from_idx] - action.unidades < 1 or state.owners[from_idx] != state.current_player or state.owners[to_idx] != state.current_player):
         #This move is invalid
+        if state.execution_mode == EXEC_STRICT:
+            raise RiskActionError(action, 'must move from the last attacker into the conquered territory, leaving at least 1 troop', state.board,
+                                  last_attacker=state.last_attacker, last_defender=state.last_defender, from_armies=state.armies[from_idx])
         print('INVALID OCCUPY ACTION: ')
         action.print_action()
         print('To index = ', to_idx)
@@ -40,5 +64,5 @@ def simulateOccupyAction(state, action):
         print('NO OCCUPY ACTION WILL BE TAKEN')
         return 
 
-    state.armies[to_idx] = state.armies[to_idx] + action.unidades
-    state.armies[from_idx] = state.armies[from_idx] - action.unidades
+    state.set_armies(to_idx, state.armies[to_idx] + action.unidades)
+    state.set_armies(from_idx, state.armies[from_idx] - action.unidades)
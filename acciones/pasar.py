@@ -1,6 +1,13 @@
 from clases.action import RiskAction
 
-def getPasarActions(): # no necesita un simulate
-    """Pasamos el turno"""
-    return [RiskAction('Pasar', None, None, None)]
+def getPasarActions(state=None): # no necesita un simulate
+    """Pasamos el turno (con el estado, la acción sale del pool del tablero)"""
+    if state is None:
+        return [RiskAction('Pasar', None, None, None)]
+    return [state.board.action_pool.get('Pasar')]
+
+def isPasarLegal(state, action):
+    """Pasar no lleva territorios ni cantidad"""
+    return action.to_territory is None and action.from_territory is None and action.unidades is None
+
   
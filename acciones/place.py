@@ -1,5 +1,6 @@
 from atributos.happiness import *
 from clases.action import *
+from clases.execution import *
 
 def getPlaceActions(state):
     """
@@ -7,27 +8,35 @@ def getPlaceActions(state):
      An action is to place a troop in a territory occupied by the current player
     """
     actions = []
+    pool = state.board.action_pool
     
     for i in range(len(state.owners)):
         if state.owners[i] == state.current_player:
-            to_territory = state.board.territories[i].name
-            a = RiskAction('Place', to_territory, None, None)
-            actions.append(a)
+            actions.append(pool.place[i])
             
     return actions
 
+def isPlaceLegal(state, action):
+    """Returns True if action is one of getPlaceActions(state), checking the rule directly"""
+    t = action.to_territory
+    return (is_territory(t, state.board) and action.from_territory is None and action.unidades is None
+            and state.owners[t] == state.current_player)
+
 def simulatePlaceAction(state, action):
     """
     Execute the given action in the given state.  This will modify the state to 
     reflect the outcome of the state.
     """
-    idx = state.board.territory_to_id[action.to_territory]
-    if state.owners[idx] == state.current_player and state.players[state.current_player].free_armies >= 1:
-        state.armies[idx] = state.armies[idx] + 1
-        state.players[state.current_player].free_armies -= 1
-        state.turn_type = "Occupy"
-    else:
+    idx = action.to_territory
+    if state.execution_mode != EXEC_TRUSTED and (state.owners[idx] != state.current_player or state.players[state.current_player].free_armies < 1):
+        if state.execution_mode == EXEC_STRICT:
+            raise RiskActionError(action, 'must place a free army in a territory of the current player', state.board,
+                                  owner=state.owners[idx], free_armies=state.players[state.current_player].free_armies)
         print('INVALID PLACE ACTION: ')
         action.print_action()
         print('NO PLACE ACTION WILL OCCUR')
+        return
+    state.set_armies(idx, state.armies[idx] + 1)
+    state.players[state.current_player].free_armies -= 1
+    state.turn_type = "Occupy"
 
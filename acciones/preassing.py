@@ -1,29 +1,38 @@
 from atributos.happiness import *
 from clases.action import *
+from clases.execution import *
 
 def getPreAssignActions(state):
     """Returns a list of all the PreAssign actions possible in this state"""
     
     #An Action is to select an unoccupied territory
     actions = []
+    pool = state.board.action_pool
     
     for i in range(len(state.owners)):
         if state.owners[i] is None:
-            to_territory = state.board.territories[i].name
-            a = RiskAction('PreAssign', to_territory, None, None)
-            actions.append(a)
+            actions.append(pool.pre_assign[i])
             
     return actions
 
+def isPreAssignLegal(state, action):
+    """Returns True if action is one of getPreAssignActions(state), checking the rule directly"""
+    t = action.to_territory
+    return (is_territory(t, state.board) and action.from_territory is None and action.unidades is None
+            and state.owners[t] is None)
+
 def simulatePreAssignAction(state, action):
     """Execute the given action in the given state.  This will modify the state to 
     reflect the outcome of the state."""
 
-    idx = state.board.territory_to_id[action.to_territory]
+    idx = action.to_territory
     
-    if state.owners[idx] != None or state.armies[idx] != 0 or state.players[state.current_player].free_armies < 1:
+    if state.execution_mode != EXEC_TRUSTED and (state.owners[idx] != None or state.armies[idx] != 0 or state.players[state.current_player].free_armies < 1):
+        if state.execution_mode == EXEC_STRICT:
+            raise RiskActionError(action, 'must claim an empty territory with a free army', state.board,
+                                  owner=state.owners[idx], armies=state.armies[idx], free_armies=state.players[state.current_player].free_armies)
         print('INVALID PREASSIGN ACTION!')
         
-    state.owners[idx] = state.current_player
-    state.armies[idx] = 1
+    state.set_owner(idx, state.current_player)
+    state.set_armies(idx, 1)
     state.players[state.current_player].free_armies -= 1
@@ -1,5 +1,6 @@
 from atributos.happiness import *
 from clases.action import *
+from clases.execution import *
 
 def getPrePlaceActions(state):
     """Returns a list of all the PrePlace actions possible in this state"""
@@ -8,23 +9,32 @@ def getPrePlaceActions(state):
 
     if state.players[state.current_player].free_armies <= 0:
         return actions # Devuelve una lista vacía
+    
+    pool = state.board.action_pool
   
     for i in range(len(state.owners)):
         if state.owners[i] == state.current_player:
-            to_territory = state.board.territories[i].name
-            a = RiskAction('PrePlace', to_territory, None, None)
-            actions.append(a)
+            actions.append(pool.pre_place[i])
             
     return actions
 
+def isPrePlaceLegal(state, action):
+    """Returns True if action is one of getPrePlaceActions(state), checking the rule directly"""
+    t = action.to_territory
+    return (is_territory(t, state.board) and action.from_territory is None and action.unidades is None
+            and state.players[state.current_player].free_armies > 0 and state.owners[t] == state.current_player)
+
 def simulatePrePlaceAction(state, action):
     """Execute the given action in the given state.  This will modify the state to 
     reflect the outcome of the state."""
     
-    idx = state.board.territory_to_id[action.to_territory]
-    if state.owners[idx] == state.current_player and state.players[state.current_player].free_armies > 0:
-        state.armies[idx] = state.armies[idx] + 1
-        state.players[state.current_player].free_armies -= 1
-    else:
+    idx = action.to_territory
+    if state.execution_mode != EXEC_TRUSTED and (state.owners[idx] != state.current_player or state.players[state.current_player].free_armies < 1):
+        if state.execution_mode == EXEC_STRICT:
+            raise RiskActionError(action, 'must place a free army in a territory of the current player', state.board,
+                                  owner=state.owners[idx], free_armies=state.players[state.current_player].free_armies)
         print('INVALID PREPLACE ACTION:')
         print('NO PREPLACE ACTION WILL OCCUR')
+        return
+    state.set_armies(idx, state.armies[idx] + 1)
+    state.players[state.current_player].free_armies -= 1
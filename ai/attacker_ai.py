@@ -38,19 +38,19 @@ def getAction(state, time_left=None):
         if 'PreAssing' in actions:
             for a in actions["PreAssign"]:
                 if a.to_territory is not None:
-                    for n in state.board.territories[state.board.territory_to_id[a.to_territory]].neighbors:
+                    for n in state.board.territories[a.to_territory].neighbors:
                         if state.owners[n] != state.current_player:
                             possible_actions.append(a)
         if 'Preplace' in actions:
             for a in actions["Preplace"]:
                 if a.to_territory is not None:
-                    for n in state.board.territories[state.board.territory_to_id[a.to_territory]].neighbors:
+                    for n in state.board.territories[a.to_territory].neighbors:
                         if state.owners[n] != state.current_player:
                             possible_actions.append(a)
         else:
             for a in list(itertools.chain.from_iterable(actions.values())):
                 if a.to_territory is not None:
-                    for n in state.board.territories[state.board.territory_to_id[a.to_territory]].neighbors:
+                    for n in state.board.territories[a.to_territory].neighbors:
                         if state.owners[n] != state.current_player:
                             possible_actions.append(a)
                     
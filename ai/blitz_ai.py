@@ -39,7 +39,7 @@ def getAction(state, time_left=None):
 
         for a in actions:
             if a.to_territory is not None:
-                for n in state.board.territories[state.board.territory_to_id[a.to_territory]].neighbors:
+                for n in state.board.territories[a.to_territory].neighbors:
                     if state.owners[n] != state.current_player:
                         if max_front_action is None or a.troops > max_front:
                             max_front_action = a
@@ -67,7 +67,7 @@ def getAction(state, time_left=None):
 
             for a in actions:
                 if a.to_territory is not None:
-                    for n in state.board.territories[state.board.territory_to_id[a.to_territory]].neighbors:
+                    for n in state.board.territories[a.to_territory].neighbors:
                         if state.owners[n] != state.current_player:
                             possible_actions.append(a)
                         
@@ -1,4 +1,6 @@
+import time
 import random
+import itertools
 from risktools import *
 #For interacting with interactive GUI
 from gui.aihelper import *
@@ -11,39 +13,103 @@ from gui.turbohelper import *
 #  
 #  To complete this AI, simply implement the "heuristic" function below, returning a real number for a given state
 
+# Deepest search (number of consecutive own actions) tried by iterative deepening
+MAX_SEARCH_DEPTH = 3
+
+# Part of the remaining game time that is spent on one action (time_left / MOVES_LEFT)
+MOVES_LEFT = 1000
+
+# Seconds spent on one action when no time_left is given (GUI)
+DEFAULT_MOVE_TIME = 1.0
+
+# Values already computed, indexed by the Zobrist hash of the state (shared between the calls of one game)
+# States reached by different orders of actions are only evaluated once
+# It is cleared in the initial deal (fase_0), so that a new game never sees the entries of the previous one
+transpositions = RiskTranspositionTable()
+
+class SearchTimeout(Exception):
+    """Raised when the time for the current action runs out in the middle of a search"""
+    pass
+
 def getAction(state, time_left=None):
-    """Main AI function.  It should return a valid AI action for this state."""
+    """
+    Main AI function.  It should return a valid AI action for this state.
+    Searches 1, 2, ... MAX_SEARCH_DEPTH own actions ahead while there is time for this action
+    and returns the best action of the deepest search that was completed
+    (if not even the first one was, the best of the actions evaluated so far).
+    """
+    if state.fase == 'fase_0':
+        transpositions.clear()
+    
+    move_time = DEFAULT_MOVE_TIME if time_left is None else max(time_left, 0) / MOVES_LEFT
+    deadline = time.perf_counter() + move_time
    
     #Get the possible actions in this state
-    actions = getAllowedActions(state)
+    actions = list(itertools.chain.from_iterable(getAllowedFaseActions(state).values()))
  
-    # Execute each action and get expected heuristic value of resulting state 
-    
     # To keep track of the best action we find
-    best_action = None
-    best_action_value = None
+    best_action = actions[0] if actions else None
     
-    #Evaluate each action
-    for a in actions:
-               
-        #Simulate the action, get all possible successor states
-        successors, probabilities = simulateAction(state, a)
-              
-        #Compute the expected heuristic value of the successors
-        current_action_value = 0.0
-        
-        for i in range(len(successors)):
-            #Each successor contributes its heuristic value * its probability to this action's value
-            current_action_value += (heuristic(successors[i]) * probabilities[i])
+    for depth in range(1, MAX_SEARCH_DEPTH + 1):
+        # Execute each action and get expected heuristic value of resulting state 
+        # The actions are applied in place and undone afterwards, so no state is copied
+        values = []
+        try:
+            for a in actions:
+                values.append(expectedValue(state, a, depth - 1, state.current_player, deadline))
+        except SearchTimeout:
+            if depth > 1:
+                break
+        if not values:
+            break
         
-        #Store this as the best action if it is the first or better than what we have found
-        if best_action_value is None or current_action_value > best_action_value:
-            best_action = a
-            best_action_value = current_action_value
+        # Search the best actions first in the next iteration (ties keep their order)
+        order = sorted(range(len(values)), key=lambda i: -values[i])
+        complete = len(values) == len(actions)
+        actions = [actions[i] for i in order] + actions[len(values):]
+        best_action = actions[0]
+        if not complete or time.perf_counter() >= deadline:
+            break
         
     #Return the best action
     return best_action
 
+def expectedValue(state, action, depth, player, deadline=None):
+    """Returns the expected value of executing action in state, searching depth more actions of player"""
+    value = 0.0
+    for i, probability in enumerate(getActionProbabilities(state, action)):
+        #Apply the i-th outcome, evaluate it and undo it
+        #Each successor contributes its value * its probability to this action's value
+        record = applyAction(state, action, i)
+        try:
+            value += evaluate(state, depth, player, deadline) * probability
+        finally:
+            undoAction(state, record)
+    return value
+
+def evaluate(state, depth, player, deadline=None):
+    """
+    Returns the value of state for player: the heuristic value if the search ends here,
+    otherwise the value of the best of the next depth actions (while it is still player's turn)
+    Raises SearchTimeout if deadline (a time.perf_counter() value) has passed
+    """
+    key = (state.zobrist(), player)
+    value = transpositions.get(key, depth)
+    if value is not None:
+        return value
+    if deadline is not None and time.perf_counter() > deadline:
+        raise SearchTimeout()
+    actions = []
+    if depth > 0 and state.current_player == player and state.turn_type != 'GameOver':
+        actions = list(itertools.chain.from_iterable(getAllowedFaseActions(state).values()))
+    if actions:
+        value = max(expectedValue(state, a, depth - 1, player, deadline) for a in actions)
+    else:
+        # End of the search (or no action left to search)
+        value = heuristic(state)
+    transpositions.put(key, depth, value)
+    return value
+
 def heuristic(state):
     """Returns a number telling how good this state is. 
        Implement this function to have a heuristic ai. """
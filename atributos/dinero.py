@@ -6,19 +6,16 @@ def getMoney(state, player_id):
     This is calculated from the number of territories and continents they occupy
     """
     #Count territories owned by the current player
-    num_territorios = state.owners.count(player_id)
+    num_territorios = state.territory_count[player_id]
     #Calcular los valores en base a los territorios y los impuestos
     ingreso_por_territorio = round(num_territorios*IMPUESTOS,1)
     #See if they own all of any continents
     ingreso_por_continente = 0
-    for c in iter(state.board.continents.values()):
-        owned = True
-        for t in c.territories:
-            if state.owners[t] != player_id:
-                owned = False
-                break
-        if owned:
-            ingreso_por_continente = ingreso_por_continente + c.reward*10
+    index = state.board.index
+    owned = state.owned_mask[player_id]
+    for c, mask in enumerate(index.continent_masks):
+        if owned & mask == mask:
+            ingreso_por_continente = ingreso_por_continente + index.continent_rewards[c]*10
     # Calculamos el ingreso por posesión como el dinero obtenido por los territorios individuales + el dinero obtenido por continente
     ingreso_por_posesion=ingreso_por_territorio+ingreso_por_continente
     # Calculamos el ingreso por desarrollo como un multiplicador del ingreso por posesión
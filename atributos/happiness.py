@@ -77,8 +77,11 @@ def checkRevolucion(state,player):
         return
     felicidad_jugador=state.players[player].happiness
     if felicidad_jugador==0:
+        if state.undo_log is not None:
+            # Las revoluciones son raras: guardamos el tablero entero para poder deshacerla
+            state.undo_log.append((state.owners[:], state.armies[:]))
         tropas_player=tropas_jugador(state,player)
-        territorios_player=state.owners.count(player)
+        territorios_player=state.territory_count[player]
         
         if tropas_player>4*territorios_player:
             #print(f"El jugador {state.players[player].name} ha sufrido una revuelta pero se ha impuesto el ejercito.")
@@ -90,11 +93,13 @@ def checkRevolucion(state,player):
             for i in range(len(state.owners)):
                 if state.owners[i] == player:
                     if state.armies[i]>1:
-                        state.armies[i]=state.armies[i]-1
+                        state.set_armies(i, state.armies[i]-1)
         else:
             if random.random() < 1:
                 #print(f"El jugador {state.players[player].name} ha sido derrocado y sucumbe al caos")
-                state.owners=[ None if x == player else x for x in state.owners]
+                for i in range(len(state.owners)):
+                    if state.owners[i] == player:
+                        state.set_owner(i, None)
                 state.players[player].game_over=True
                 state.players[player].name="Muerto"
             else:
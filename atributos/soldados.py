@@ -1,13 +1,9 @@
   
 def getVecinos(state):
     """ Devuelve una lista con los id de los jugadores vecinos al jugador actual"""
-    vecinos=[]
-    for i in range(len(state.owners)):
-        if state.owners[i] == state.current_player:
-            for n in state.board.territories[i].neighbors:
-                if state.owners[n] != state.current_player and state.owners[n] not in vecinos and state.owners[n] != None:
-                    vecinos.append(state.owners[n])
-    return vecinos
+    n = len(state.territory_count)
+    base = state.current_player*n
+    return [q for q in range(n-1) if q != state.current_player and state.contacts[base + q] > 0]
 
 def tropas_enemigas_frontera(state):
     """ Devuelve un dicionario con los números de tropas que tiene cada jugador en la frontera que comparte con el jugador"""
@@ -26,20 +22,22 @@ def tropas_enemigas_frontera(state):
 def tropas_aliadas_frontera(state):
     """ Devuelve el número de tropas que tiene el jugador en la frontera"""
     tropas_aliadas=0
-    for i in range(len(state.owners)):
-        if state.owners[i] == state.current_player:
-            if not all(x == state.current_player for x in state.board.territories[i].neighbors):
-                tropas_aliadas+=state.armies[i]
+    neighbor_masks = state.board.index.neighbor_masks
+    # Se compara cada vecino con el id del jugador (no con su dueño), como siempre se ha hecho
+    player_bit = 1 << state.current_player
+    owned = state.owned_mask[state.current_player]
+    while owned:
+        low = owned & -owned
+        i = low.bit_length() - 1
+        if neighbor_masks[i] & ~player_bit:
+            tropas_aliadas+=state.armies[i]
+        owned ^= low
     return tropas_aliadas
 
 
 def tropas_jugador(state,player):
     """ Devuelve el número de tropas total que tiene un jugador """
-    tropas_totales=0
-    for i in range(len(state.owners)):
-        if state.owners[i] == player:
-            tropas_totales+=state.armies[i]
-    return tropas_totales
+    return state.troops[player]
 
 
                     
\ No newline at end of file
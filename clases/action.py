@@ -1,9 +1,30 @@
 import json
+import numbers
+
+def territory_name(territory, board):
+    """Returns the name of a territory id (or the id itself if there is no board)"""
+    if territory is None or board is None:
+        return territory
+    return board.territories[territory].name
+
+def territory_id(territory, board):
+    """Returns the id of a territory given by name (ids and None are returned as they are)"""
+    if board is None or not isinstance(territory, str):
+        return territory
+    return board.territory_to_id[territory]
+
+def is_int(value):
+    """Returns True if value is an integer (python or numpy) that is not a bool"""
+    return isinstance(value, numbers.Integral) and not isinstance(value, bool)
+
+def is_territory(value, board):
+    """Returns True if value is a valid territory id of the board"""
+    return is_int(value) and 0 <= value < len(board.territories)
 
 class RiskAction():
     """Stores the information about an action in a risk game"""
     
-    def __init__(self, type, to_territory, from_territory, unidades ,to_player=None, from_player=None):
+    def __init__(self, type, to_territory, from_territory, unidades ,to_player=None, from_player=None, unidades_max=None):
         """Initializes a RiskAction"""
         
         self.type = type
@@ -71,7 +92,8 @@ class RiskAction():
                
                 Place: None
                
-                Attack: None
+                Attack: None (una sola tirada) o, en el ataque completo (macro), el número de tropas
+                        con las que el atacante deja de atacar si no ha conquistado antes (ver getBattleOutcomes)
                
                 Occupy: Number of troops moving into conquered territory
                
@@ -99,26 +121,70 @@ class RiskAction():
              
         """
 
+        self.unidades_max = unidades_max
+        """
+        Sólo en las acciones de rango (Fortify/Occupy compactas): la acción representa todos los movimientos
+        con unidades en [unidades, unidades_max]. None en las acciones normales.
+        Una acción de rango se ejecuta con unidades (el mínimo); para elegir otra cantidad usar with_amount
+        """
+
+    def is_range(self):
+        """Returns True if this action stands for a range of amounts (see unidades_max)"""
+        return self.unidades_max is not None
+
+    def amounts(self):
+        """Returns the amounts covered by this action (a single one if it isn't a range)"""
+        if self.unidades_max is None:
+            return [self.unidades]
+        return range(self.unidades, self.unidades_max + 1)
+
+    def with_amount(self, unidades):
+        """Returns the concrete (non range) version of this action moving the given amount"""
+        return RiskAction(self.type, self.to_territory, self.from_territory, unidades, self.to_player, self.from_player)
+
+    def expand(self):
+        """Returns the list of concrete actions covered by this action"""
+        if self.unidades_max is None:
+            return [self]
+        return [self.with_amount(k) for k in self.amounts()]
 
-    def print_action(self):
+    def accepts(self, action):
+        """
+        Returns True if the concrete action is this one or, for range actions,
+        if it is the same move with an amount in [unidades, unidades_max]
+        """
+        if self.unidades_max is None:
+            return self.to_string() == action.to_string()
+        return (action.type == self.type and action.to_territory == self.to_territory and action.from_territory == self.from_territory
+                and action.to_player == self.to_player and action.from_player == self.from_player
+                and isinstance(action.unidades, numbers.Integral) and self.unidades <= action.unidades <= self.unidades_max)
+
+
+    def print_action(self, board=None):
         """Displays information about this action to the output"""
-        print(self.description())
+        print(self.description(board=board))
         
-    def description(self, newline=False):
-        """returns string description of this action, useful for display"""
+    def description(self, newline=False, board=None):
+        """returns string description of this action, useful for display (with territory names if the board is given)"""
         
         parts = [str(self.type)]
         
         if self.type in ['Attack', 'Occupy', 'Fortify']:
-            parts.append(f'FROM: {self.from_territory}')
+            parts.append(f'FROM: {territory_name(self.from_territory, board)}')
         
         if self.type in ['Place', 'PrePlace']:
-            parts.append(f'IN: {self.to_territory}')
+            parts.append(f'IN: {territory_name(self.to_territory, board)}')
         elif self.type in ['PreAssign', 'Attack', 'Occupy', 'Fortify']:
-            parts.append(f'TO: {self.to_territory}')
+            parts.append(f'TO: {territory_name(self.to_territory, board)}')
         
+        if self.type == 'Attack' and self.unidades is not None:
+            parts.append(f'UNTIL: {self.unidades}')
+
         if self.type in ['Occupy', 'Fortify', 'Comprar_Soldados','Invertir']:
-            parts.append(f'NUM: {self.unidades}')
+            if self.unidades_max is None:
+                parts.append(f'NUM: {self.unidades}')
+            else:
+                parts.append(f'NUM: {self.unidades}-{self.unidades_max}')
             
         if self.type == 'Invest':
             parts.append(f'ON_PLAYER: {self.to_player}')
@@ -126,19 +192,29 @@ class RiskAction():
         separator = "\n" if newline else " "
         return separator.join(parts)
     
-    def to_string(self):
-        """Saves this action to a string"""
-        s = 'RISKACTION|' + json.dumps(self.type) + '|' + json.dumps(self.to_territory) + '|' + json.dumps(self.from_territory) + '|' + json.dumps(self.unidades)+ '|' + json.dumps(self.to_player)+ '|' + json.dumps(self.from_player)
+    def to_string(self, board=None):
+        """
+        Saves this action to a string.
+        If the board is given the territories are written by name (the format used in the logs), otherwise by id
+        Range actions get an extra field with unidades_max
+        """
+        s = 'RISKACTION|' + json.dumps(self.type) + '|' + json.dumps(territory_name(self.to_territory, board)) + '|' + json.dumps(territory_name(self.from_territory, board)) + '|' + json.dumps(self.unidades)+ '|' + json.dumps(self.to_player)+ '|' + json.dumps(self.from_player)
+        if self.unidades_max is not None:
+            s = s + '|' + json.dumps(self.unidades_max)
         return s
         
-    def from_string(self, s):
-        """Loads this action from a string"""
+    def from_string(self, s, board=None):
+        """
+        Loads this action from a string.
+        If the board is given, territory names are translated back to ids
+        """
         ss = s.split('|')
         if ss[0] != 'RISKACTION':
             print('THIS IS NOT A RISK ACTION STRING!')
         self.type = json.loads(ss[1])
-        self.to_territory = json.loads(ss[2])
-        self.from_territory = json.loads(ss[3])
+        self.to_territory = territory_id(json.loads(ss[2]), board)
+        self.from_territory = territory_id(json.loads(ss[3]), board)
         self.unidades = json.loads(ss[4])
         self.to_player = json.loads(ss[5])
-        self.from_player = json.loads(ss[6])
\ No newline at end of file
+        self.from_player = json.loads(ss[6])
+        self.unidades_max = json.loads(ss[7]) if len(ss) > 7 else None
\ No newline at end of file
@@ -0,0 +1,90 @@
+from .action import RiskAction
+
+
+class RiskPooledAction(RiskAction):
+    """
+    RiskAction inmutable que pertenece al RiskActionPool de un tablero.
+    Las mismas instancias se devuelven en todas las llamadas a los generadores de acciones,
+    por lo que no se pueden modificar.
+    """
+    def __setattr__(self, name, value):
+        raise AttributeError('Pooled RiskActions are immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('Pooled RiskActions are immutable')
+
+
+def pooled_action(type, to_territory, from_territory, unidades, unidades_max=None):
+    """Creates a RiskPooledAction with the given fields"""
+    a = RiskAction.__new__(RiskPooledAction)
+    a.__dict__.update(RiskAction(type, to_territory, from_territory, unidades, unidades_max=unidades_max).__dict__)
+    return a
+
+
+class RiskActionPool():
+    """
+    Conjunto de acciones internadas de un tablero, indexadas por (type, to, from, amount).
+
+    Las acciones que sólo dependen del mapa (colocar en un territorio, atacar por una arista...) se crean
+    una vez al construir el pool; las que dependen de una cantidad se crean la primera vez que se piden
+    y se reutilizan a partir de entonces. Los generadores de acciones devuelven referencias a estas instancias.
+    """
+    def __init__(self, board):
+        """Creates the map dependent actions of the given board"""
+        index = board.index
+        n = index.n_territories
+
+        self.pre_assign = tuple(pooled_action('PreAssign', t, None, None) for t in range(n))
+        """ PreAssign action of each territory """
+
+        self.pre_place = tuple(pooled_action('PrePlace', t, None, None) for t in range(n))
+        """ PrePlace action of each territory """
+
+        self.place = tuple(pooled_action('Place', t, None, None) for t in range(n))
+        """ Place action of each territory """
+
+        self.attack = tuple(pooled_action('Attack', index.neighbor_ids[e], t, None)
+                            for t in range(n) for e in range(index.neighbor_offsets[t], index.neighbor_offsets[t+1]))
+        """ Attack action of each directed edge, aligned with board.index.neighbor_ids """
+
+        self.attack_macro = tuple(pooled_action('Attack', a.to_territory, a.from_territory, 1) for a in self.attack)
+        """ Macro Attack action of each directed edge (attack until conquest or until 1 troop is left) """
+
+        self.attack_stop = pooled_action('Attack', None, None, None)
+        """ The 'stop attacking' action """
+
+        self.fortify_stop = pooled_action('Fortify', None, None, 0)
+        """ The 'do not fortify' action """
+
+        self.fortify = [[None] for e in range(len(index.neighbor_ids))]
+        """ Fortify actions of each directed edge, indexed by amount (created on demand, position 0 is unused) """
+
+        self._edges = tuple((a.from_territory, a.to_territory) for a in self.attack)
+
+        self._interned = dict()
+        """ Any other action, indexed by (type, to, from, amount) """
+
+    def get(self, type, to_territory=None, from_territory=None, unidades=None):
+        """Returns the pooled action with the given fields, creating it the first time"""
+        key = (type, to_territory, from_territory, unidades)
+        a = self._interned.get(key)
+        if a is None:
+            a = self._interned[key] = pooled_action(type, to_territory, from_territory, unidades)
+        return a
+
+    def get_range(self, type, to_territory, from_territory, lo, hi):
+        """Returns the pooled range action moving between lo and hi troops, creating it the first time"""
+        key = (type, to_territory, from_territory, lo, hi)
+        a = self._interned.get(key)
+        if a is None:
+            a = self._interned[key] = pooled_action(type, to_territory, from_territory, lo, hi)
+        return a
+
+    def fortify_amounts(self, edge, hi):
+        """Returns the list of Fortify actions along the given edge (CSR position) moving 1..hi troops"""
+        actions = self.fortify[edge]
+        if len(actions) <= hi:
+            from_territory, to_territory = self._edges[edge]
+            for k in range(len(actions), hi + 1):
+                actions.append(pooled_action('Fortify', to_territory, from_territory, k))
+        return actions[1:hi + 1]
@@ -2,6 +2,8 @@ import json
 from .player import RiskPlayer
 from .continent import RiskContinent
 from .territory import RiskTerritory
+from .board_index import RiskBoardIndex
+from .action_pool import RiskActionPool
 class RiskBoard():
     """
     Stores all of the information about the current Risk game that doesn't change
@@ -51,6 +53,12 @@ class RiskBoard():
 
         self.increment_value = 0
         """ A number specifying the incremental gain in received troops for card turn-ins beyond the length of turn-in-values array """
+
+        self._index = None
+        """ The compiled RiskBoardIndex of the map (see the index property) """
+
+        self._action_pool = None
+        """ The RiskActionPool of the map (see the action_pool property) """
         
         
     def from_string(self, s):
@@ -119,12 +127,40 @@ class RiskBoard():
         """
         self.territories.append(territory)
         self.territory_to_id[territory.name] = territory.id
+        self._index = None
+        self._action_pool = None
         
     def add_continent(self, continent):
         """Add a continent object to the list of continents"""
         if continent.name not in self.continents:
             self.continents[continent.name] = continent
+            self._index = None
+            self._action_pool = None
             
+    @property
+    def index(self):
+        """The compiled RiskBoardIndex of the map, built on first access"""
+        if self._index is None:
+            self._index = RiskBoardIndex(self)
+        return self._index
+
+    def compile_index(self, index=None):
+        """
+        (Re)builds the compiled RiskBoardIndex.
+        Must be called again if neighbors or continent territories are modified after the first access to index
+        If index is given (a RiskBoardIndex compiled from an identical map) it is used instead of building a new one
+        """
+        self._index = RiskBoardIndex(self) if index is None else index
+        self._action_pool = None
+        return self._index
+
+    @property
+    def action_pool(self):
+        """The RiskActionPool with the interned actions of the map, built on first access"""
+        if self._action_pool is None:
+            self._action_pool = RiskActionPool(self)
+        return self._action_pool
+
     def set_turn_in_values(self, tiv):
         """Set the array of turn-in values (for card turn-ins)"""
         self.turn_in_values = tiv
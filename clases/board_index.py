@@ -0,0 +1,69 @@
+
+
+class RiskBoardIndex():
+    """
+    Índice compilado (de solo lectura) de la topología de un RiskBoard.
+
+    Se construye una vez por mapa a partir de los territorios y continentes del tablero
+    y guarda la misma información en estructuras planas, pensadas para los bucles calientes
+    del motor (tuplas y bitmasks) y para operaciones vectorizadas (CSR y matriz densa).
+    No debe modificarse: si cambia el tablero hay que volver a compilarlo.
+    """
+    def __init__(self, board):
+        """Compiles the index from the territories and continents of the given board"""
+        n = len(board.territories)
+
+        self.n_territories = n
+        """ Number of territories in the map """
+
+        self.neighbors = tuple(tuple(t.neighbors) for t in board.territories)
+        """ Tuple indexed by territory id with the tuple of ids of its neighbors """
+
+        offsets = [0]
+        ids = []
+        for nbrs in self.neighbors:
+            ids.extend(nbrs)
+            offsets.append(len(ids))
+        self.neighbor_offsets = tuple(offsets)
+        """ CSR offsets: the neighbors of territory t are neighbor_ids[neighbor_offsets[t]:neighbor_offsets[t+1]] """
+
+        self.neighbor_ids = tuple(ids)
+        """ CSR column indices (all neighbor lists concatenated) """
+
+        adjacent = bytearray(n*n)
+        for t, nbrs in enumerate(self.neighbors):
+            for m in nbrs:
+                adjacent[t*n + m] = 1
+        self.adjacent = bytes(adjacent)
+        """ Dense boolean adjacency matrix, row major: adjacent[a*n_territories + b] is 1 if b is a neighbor of a """
+
+        self.all_mask = (1 << n) - 1
+        """ Bitmask with the bits of every territory set """
+
+        self.neighbor_masks = tuple(sum(1 << m for m in set(nbrs)) for nbrs in self.neighbors)
+        """ Tuple indexed by territory id with the bitmask of its neighbors (bit m set if m is a neighbor) """
+
+        continents = list(board.continents.values())
+
+        self.continent_names = tuple(c.name for c in continents)
+        """ Names of the continents, in the order used by every other continent field """
+
+        self.continent_rewards = tuple(c.reward for c in continents)
+        """ Reward of each continent """
+
+        self.continent_territories = tuple(tuple(c.territories) for c in continents)
+        """ Tuple with the territory ids of each continent """
+
+        self.continent_masks = tuple(sum(1 << t for t in set(c.territories)) for c in continents)
+        """ Bitmask of the territories of each continent (bit t set if territory t belongs to it) """
+
+        territory_continent = [-1]*n
+        for ci, c in enumerate(continents):
+            for t in c.territories:
+                territory_continent[t] = ci
+        self.territory_continent = tuple(territory_continent)
+        """ Tuple indexed by territory id with the index of its continent (-1 if it has none) """
+
+    def is_adjacent(self, a, b):
+        """Returns True if territory b is a neighbor of territory a"""
+        return self.adjacent[a*self.n_territories + b] == 1
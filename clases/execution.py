@@ -0,0 +1,32 @@
+# Modos de ejecución de las acciones (RiskState.execution_mode).
+# Los simulate*Action de acciones/ consultan el modo del estado antes de validar la acción.
+
+EXEC_NORMAL = 'normal'
+""" Valida cada acción e imprime un diagnóstico si no es válida (comportamiento por defecto) """
+
+EXEC_TRUSTED = 'trusted'
+""" No valida nada: solo para acciones que salen de getAllowedFaseActions en ese mismo estado """
+
+EXEC_STRICT = 'strict'
+""" Valida cada acción y lanza RiskActionError si no es válida, sin imprimir nada """
+
+EXECUTION_MODES = (EXEC_NORMAL, EXEC_TRUSTED, EXEC_STRICT)
+
+
+class RiskActionError(Exception):
+    """Acción no válida ejecutada en modo EXEC_STRICT"""
+
+    def __init__(self, action, reason, board=None, **details):
+        self.action = action
+        """ The RiskAction that could not be executed """
+
+        self.reason = reason
+        """ Short description of the rule that the action breaks """
+
+        self.details = details
+        """ Relevant values of the state (territory ids, armies, last attacker...) """
+
+        text = 'INVALID ' + str(action.type).upper() + ' ACTION ' + action.to_string(board) + ': ' + reason
+        if details:
+            text += ' (' + ', '.join(k + '=' + repr(v) for k, v in details.items()) + ')'
+        super().__init__(text)
@@ -0,0 +1,164 @@
+from array import array
+from .player import RiskPlayer
+from .state import RiskState
+
+# Disposición de los buffers de jugadores (struct-of-arrays)
+# Enteros: id, free_armies, happiness, conquered_territory, game_over
+INT_FIELDS = 5
+ID, FREE_ARMIES, HAPPINESS, CONQUERED, GAME_OVER = range(INT_FIELDS)
+# Reales: economy, development
+FLOAT_FIELDS = 2
+ECONOMY, DEVELOPMENT = range(FLOAT_FIELDS)
+
+
+class RiskPlayerView():
+    """
+    Vista de un jugador dentro de un RiskPackedState.
+    Expone los mismos atributos que RiskPlayer, pero lee y escribe directamente
+    en los buffers del estado al que pertenece.
+    """
+    __slots__ = ('_state', '_idx')
+
+    def __init__(self, state, idx):
+        self._state = state
+        """ El RiskPackedState que contiene los datos del jugador """
+
+        self._idx = idx
+        """ La posición del jugador dentro de los buffers """
+
+    @property
+    def name(self):
+        return self._state._names[self._idx]
+
+    @name.setter
+    def name(self, value):
+        self._state._names[self._idx] = value
+
+    @property
+    def id(self):
+        return self._state._ints[self._idx*INT_FIELDS + ID]
+
+    @id.setter
+    def id(self, value):
+        self._state._ints[self._idx*INT_FIELDS + ID] = value
+
+    @property
+    def free_armies(self):
+        return self._state._ints[self._idx*INT_FIELDS + FREE_ARMIES]
+
+    @free_armies.setter
+    def free_armies(self, value):
+        self._state._ints[self._idx*INT_FIELDS + FREE_ARMIES] = value
+
+    @property
+    def happiness(self):
+        return self._state._ints[self._idx*INT_FIELDS + HAPPINESS]
+
+    @happiness.setter
+    def happiness(self, value):
+        self._state._ints[self._idx*INT_FIELDS + HAPPINESS] = value
+
+    @property
+    def conquered_territory(self):
+        return bool(self._state._ints[self._idx*INT_FIELDS + CONQUERED])
+
+    @conquered_territory.setter
+    def conquered_territory(self, value):
+        self._state._ints[self._idx*INT_FIELDS + CONQUERED] = int(bool(value))
+
+    @property
+    def game_over(self):
+        return bool(self._state._ints[self._idx*INT_FIELDS + GAME_OVER])
+
+    @game_over.setter
+    def game_over(self, value):
+        self._state._ints[self._idx*INT_FIELDS + GAME_OVER] = int(bool(value))
+
+    @property
+    def economy(self):
+        return self._state._floats[self._idx*FLOAT_FIELDS + ECONOMY]
+
+    @economy.setter
+    def economy(self, value):
+        self._state._floats[self._idx*FLOAT_FIELDS + ECONOMY] = value
+
+    @property
+    def development(self):
+        return self._state._floats[self._idx*FLOAT_FIELDS + DEVELOPMENT]
+
+    @development.setter
+    def development(self, value):
+        self._state._floats[self._idx*FLOAT_FIELDS + DEVELOPMENT] = value
+
+    # Los métodos de RiskPlayer funcionan igual sobre la vista
+    add_armies = RiskPlayer.add_armies
+    print_player = RiskPlayer.print_player
+    copy_player = RiskPlayer.copy_player
+    to_string = RiskPlayer.to_string
+
+
+class RiskPackedState(RiskState):
+    """
+    RiskState con una disposición compacta en memoria.
+
+    Las tropas se guardan en un array.array de int16 y los atributos de los jugadores
+    en dos buffers (enteros y reales), de forma que copy_state se reduce a copiar unos
+    pocos buffers en lugar de reconstruir cada RiskPlayer.
+    El API de atributos (state.armies[i], state.players[p].economy, ...) es el mismo que el de RiskState,
+    por lo que acciones/* y ai/* funcionan sin cambios.
+
+    owners se mantiene como lista: None (territorio sin dueño) forma parte de su semántica
+    y una lista de enteros pequeños ya se copia con un único memcpy.
+    """
+
+    def __init__(self, fase, players, armies, owners, current_player, turn_type, turn_in_number, last_attacker, last_defender, board, mes=6):
+        """Initializes a RiskPackedState object, packing the given players and armies"""
+        RiskState.__init__(self, fase, players, array('h', armies), list(owners), current_player, turn_type, turn_in_number, last_attacker, last_defender, board, mes)
+
+    @property
+    def players(self):
+        """A list of RiskPlayerView objects (the players in the game), created on first access"""
+        if self._views is None:
+            self._views = [RiskPlayerView(self, i) for i in range(len(self._names))]
+        return self._views
+
+    @players.setter
+    def players(self, players):
+        self._names = [p.name for p in players]
+        self._ints = array('q')
+        self._floats = array('d')
+        for p in players:
+            self._ints.extend((p.id, p.free_armies, p.happiness, int(bool(p.conquered_territory)), int(bool(p.game_over))))
+            self._floats.extend((p.economy, p.development))
+        self._views = None
+
+    def from_string(self, s, board):
+        """Loads this state from a string"""
+        RiskState.from_string(self, s, board)
+        self.armies = array('h', self.armies)
+
+    def save_players(self):
+        """Returns a snapshot of the player buffers (see restore_players)"""
+        return self._names[:], self._ints[:], self._floats[:]
+
+    def restore_players(self, saved):
+        """Restores the player buffers saved by save_players (existing views stay valid)"""
+        self._names[:], self._ints[:], self._floats[:] = saved
+
+    def copy_state(self):
+        """
+        Creates a copy of this state and returns it. Only the buffers are copied,
+        the board is shared (it shouldn't be modified!)
+        """
+        d = self.__dict__.copy()
+        d['armies'] = self.armies[:]
+        d['owners'] = self.owners[:]
+        d['_names'] = self._names[:]
+        d['_ints'] = self._ints[:]
+        d['_floats'] = self._floats[:]
+        d['_views'] = None
+        d['undo_log'] = None
+        self.copy_aggregates(d)
+        s = RiskPackedState.__new__(RiskPackedState)
+        s.__dict__ = d
+        return s
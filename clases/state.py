@@ -1,5 +1,7 @@
 import json
 from .player import RiskPlayer
+from .zobrist import owner_key, armies_key, player_key, zobrist_key, value_code, KIND_SCALAR
+from .execution import EXEC_NORMAL
 class RiskState():
     """Stores all the information about a state of a Risk game"""
     
@@ -54,6 +56,145 @@ class RiskState():
         self.mes = mes
         """Indica en que més del año estamos"""
 
+        self.undo_log = None
+        """
+         Lista donde se apuntan los cambios masivos (revoluciones) mientras se ejecuta
+         risktools.applyAction, para poder deshacerlos. None fuera de applyAction
+        """
+
+        self.execution_mode = EXEC_NORMAL
+        """
+         Cómo se validan las acciones ejecutadas sobre este estado (ver clases.execution).
+         Las copias heredan el modo, así que se puede fijar una vez por partida
+        """
+
+        # Agregados por jugador, mantenidos por set_owner/set_armies.
+        # Se indexan por id de jugador; la última posición (len(players)) corresponde a los territorios sin dueño (None)
+        self.territory_count = []
+        """ Número de territorios de cada jugador """
+
+        self.troops = []
+        """ Número total de tropas de cada jugador """
+
+        self.border_troops = []
+        """ Tropas de cada jugador en territorios con algún vecino de otro dueño """
+
+        self.contacts = []
+        """
+         Matriz aplanada (len(players)+1)^2: contacts[p*(len(players)+1)+q] es el número de
+         pares de territorios vecinos entre p y q (p != q)
+        """
+
+        self.foreign_neighbors = []
+        """ Indexado por territorio: número de vecinos con un dueño distinto """
+
+        self.owned_mask = []
+        """ Bitmask de los territorios de cada jugador (bit t activo si el territorio t es suyo) """
+
+        self.zobrist_cells = 0
+        """ Parte del hash Zobrist que corresponde a owners y armies (ver zobrist) """
+
+        self.recount()
+
+    def owner_slot(self, owner):
+        """Devuelve la posición de un dueño en los agregados (None va en la última)"""
+        return len(self.territory_count) - 1 if owner is None else owner
+
+    def recount(self):
+        """
+        Recalcula todos los agregados recorriendo el tablero.
+        Hay que llamarlo si se modifican owners/armies directamente, sin set_owner/set_armies.
+        """
+        n = len(self.players) + 1
+        self.territory_count = [0]*n
+        self.troops = [0]*n
+        self.border_troops = [0]*n
+        self.contacts = [0]*(n*n)
+        self.foreign_neighbors = [0]*len(self.owners)
+        self.owned_mask = [0]*n
+        self.zobrist_cells = 0
+        
+        for t in range(len(self.owners)):
+            self.zobrist_cells ^= owner_key(t, self.owners[t]) ^ armies_key(t, self.armies[t])
+            p = self.owner_slot(self.owners[t])
+            self.territory_count[p] += 1
+            self.owned_mask[p] |= 1 << t
+            self.troops[p] += self.armies[t]
+            for m in self.board.index.neighbors[t]:
+                q = self.owner_slot(self.owners[m])
+                if q != p:
+                    self.foreign_neighbors[t] += 1
+                    self.contacts[p*n + q] += 1
+            if self.foreign_neighbors[t] > 0:
+                self.border_troops[p] += self.armies[t]
+
+    def set_armies(self, t, value):
+        """Sets the number of armies on territory t, keeping the aggregates up to date"""
+        delta = value - self.armies[t]
+        self.zobrist_cells ^= armies_key(t, self.armies[t]) ^ armies_key(t, value)
+        self.armies[t] = value
+        p = self.owners[t]
+        if p is None:
+            p = len(self.troops) - 1
+        self.troops[p] += delta
+        if self.foreign_neighbors[t] > 0:
+            self.border_troops[p] += delta
+
+    def set_owner(self, t, owner):
+        """Sets the owner (player id or None) of territory t, keeping the aggregates up to date"""
+        n = len(self.territory_count)
+        p = self.owner_slot(self.owners[t])
+        q = self.owner_slot(owner)
+        if p == q:
+            return
+        self.zobrist_cells ^= owner_key(t, self.owners[t]) ^ owner_key(t, owner)
+        self.owners[t] = owner
+        a = self.armies[t]
+        self.territory_count[p] -= 1
+        self.territory_count[q] += 1
+        self.owned_mask[p] ^= 1 << t
+        self.owned_mask[q] |= 1 << t
+        self.troops[p] -= a
+        self.troops[q] += a
+        if self.foreign_neighbors[t] > 0:
+            self.border_troops[p] -= a
+        
+        foreign = 0
+        for m in self.board.index.neighbors[t]:
+            r = self.owner_slot(self.owners[m])
+            before = r != p
+            after = r != q
+            if before:
+                self.contacts[p*n + r] -= 1
+                self.contacts[r*n + p] -= 1
+            if after:
+                foreign += 1
+                self.contacts[q*n + r] += 1
+                self.contacts[r*n + q] += 1
+            if before != after:
+                # El vecino m puede pasar a ser (o dejar de ser) frontera
+                was_border = self.foreign_neighbors[m] > 0
+                self.foreign_neighbors[m] += 1 if after else -1
+                if was_border != (self.foreign_neighbors[m] > 0):
+                    self.border_troops[r] += self.armies[m] if after else -self.armies[m]
+        
+        self.foreign_neighbors[t] = foreign
+        if foreign > 0:
+            self.border_troops[q] += a
+
+    def zobrist(self):
+        """
+        Devuelve el hash Zobrist (64 bits) del estado.
+        La parte de owners/armies se mantiene de forma incremental (zobrist_cells); aquí sólo se añaden
+        los campos escalares y los atributos de los jugadores
+        """
+        h = self.zobrist_cells
+        for i, v in enumerate((self.current_player, self.fase, self.turn_type, self.mes, self.last_attacker, self.last_defender)):
+            h ^= zobrist_key(KIND_SCALAR, i, value_code(v))
+        for i, p in enumerate(self.players):
+            h ^= player_key(p, i)
+        return h
+
     def to_string(self):
         """Saves this state to a string"""
         s = 'RISKSTATE|'
@@ -61,7 +202,7 @@ class RiskState():
         for p in self.players:
             s = s + p.to_string()
             s = s + ';'
-        s = s + '|' + json.dumps(self.fase)+'|' + json.dumps(self.armies) + '|' + json.dumps(self.owners) + '|'
+        s = s + '|' + json.dumps(self.fase)+'|' + json.dumps(list(self.armies)) + '|' + json.dumps(self.owners) + '|'
         s = s + json.dumps(self.current_player) + '|' + json.dumps(self.turn_type) + '|'+json.dumps(self.turn_in_number)+"|"
         s = s + json.dumps(self.last_attacker) + '|' + json.dumps(self.last_defender)+ '|' + json.dumps(self.mes) 
         return s
@@ -72,12 +213,13 @@ class RiskState():
         if ss[0] != 'RISKSTATE':
             print('THIS IS AN INVALID RISKSTATE')
         ps = ss[1].split(';')
-        self.players = []
+        players = []
         for p in ps:
             if p:#len(p) > 0:
                 np = RiskPlayer(None, None, None, None,None,None,None)
                 np.from_string(p)
-                self.players.append(np)
+                players.append(np)
+        self.players = players
         
         self.fase= json.loads(ss[2])
         self.armies = json.loads(ss[3])
@@ -89,6 +231,7 @@ class RiskState():
         self.last_defender = json.loads(ss[9])
         self.mes=json.loads(ss[10])
         self.board = board
+        self.recount()
         
     def print_state(self):
         """Displays information about this state to the output"""
@@ -108,6 +251,21 @@ class RiskState():
         else:
             print('CURRENT PLAYER: ??? [', self.current_player, ']')
         
+    def save_players(self):
+        """Returns a snapshot of the mutable attributes of every player (see restore_players)"""
+        return [(p.name, p.free_armies, p.conquered_territory, p.economy, p.happiness, p.development, p.game_over) for p in self.players]
+
+    def restore_players(self, saved):
+        """Restores the player attributes saved by save_players"""
+        for p, s in zip(self.players, saved):
+            p.name = s[0]
+            p.free_armies = s[1]
+            p.conquered_territory = s[2]
+            p.economy = s[3]
+            p.happiness = s[4]
+            p.development = s[5]
+            p.game_over = s[6]
+
     def copy_state(self):
         """
         Creates a (deep) copy of this state and return it. Modifications to new state won't change original, except for the risk board, of which there is only one (it shouldn't be modified!)
@@ -115,5 +273,23 @@ class RiskState():
         copy_players = []
         for p in self.players:
             copy_players.append(p.copy_player())
-        return RiskState(self.fase,copy_players,self.armies[:],self.owners[:],self.current_player,self.turn_type,self.turn_in_number, self.last_attacker, self.last_defender,self.board,self.mes)
+        # Copiamos los agregados en lugar de recalcularlos con el constructor
+        d = self.__dict__.copy()
+        d['players'] = copy_players
+        d['armies'] = self.armies[:]
+        d['owners'] = self.owners[:]
+        d['undo_log'] = None
+        self.copy_aggregates(d)
+        s = RiskState.__new__(RiskState)
+        s.__dict__ = d
+        return s
+
+    def copy_aggregates(self, d):
+        """Stores copies of the per-player aggregates in the attribute dictionary d of a new state"""
+        d['territory_count'] = self.territory_count[:]
+        d['troops'] = self.troops[:]
+        d['border_troops'] = self.border_troops[:]
+        d['contacts'] = self.contacts[:]
+        d['foreign_neighbors'] = self.foreign_neighbors[:]
+        d['owned_mask'] = self.owned_mask[:]
 
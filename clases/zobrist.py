@@ -0,0 +1,120 @@
+import zlib
+from collections import OrderedDict
+
+# Claves Zobrist de 64 bits.
+# Se generan de forma determinista (splitmix64) y bajo demanda, de modo que un mismo estado
+# tiene el mismo hash en cualquier proceso y para cualquier tamaño de mapa o número de tropas.
+
+MASK64 = (1 << 64) - 1
+
+# Espacios de claves (se mezclan en los bits altos del código)
+KIND_OWNER, KIND_ARMIES, KIND_SCALAR, KIND_PLAYER = range(4)
+
+def splitmix64(x):
+    """Mezcla un entero en una clave pseudoaleatoria de 64 bits"""
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+def zobrist_key(kind, a, b=0):
+    """Devuelve la clave del elemento (a, b) dentro del espacio de claves kind"""
+    return splitmix64((kind << 56) ^ ((a & 0xFFFFFFF) << 28) ^ (b & 0xFFFFFFF))
+
+def value_code(value):
+    """Código entero estable de un valor escalar del estado (None, enteros o cadenas)"""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return zlib.crc32(value.encode()) + 1
+    return int(value) + 2
+
+_OWNER_KEYS = []
+_ARMIES_KEYS = []
+
+def _table(tables, kind, t, v):
+    while len(tables) <= t:
+        tables.append([])
+    keys = tables[t]
+    while len(keys) <= v:
+        keys.append(zobrist_key(kind, t, len(keys)))
+    return keys
+
+def owner_key(t, owner):
+    """Clave de 'el territorio t pertenece a owner' (owner es un id de jugador o None)"""
+    v = 0 if owner is None else owner + 1
+    try:
+        return _OWNER_KEYS[t][v]
+    except IndexError:
+        return _table(_OWNER_KEYS, KIND_OWNER, t, v)[v]
+
+def armies_key(t, armies):
+    """Clave de 'el territorio t tiene armies tropas'"""
+    try:
+        return _ARMIES_KEYS[t][armies]
+    except IndexError:
+        return _table(_ARMIES_KEYS, KIND_ARMIES, t, armies)[armies]
+
+def player_key(player, slot):
+    """
+    Clave de los atributos de un jugador, que se agrupan en cubos
+    (economía a décimas, desarrollo a centésimas) para que los errores de redondeo no separen estados iguales
+    """
+    attrs = (player.free_armies, player.happiness, round(player.economy*10), round(player.development*100),
+             int(bool(player.conquered_territory)), int(bool(player.game_over)))
+    key = 0
+    for f, v in enumerate(attrs):
+        key ^= zobrist_key(KIND_PLAYER, slot*len(attrs) + f, v)
+    return key
+
+
+class RiskTranspositionTable():
+    """
+    Tabla de transposiciones acotada, indexada por el hash Zobrist de un estado (RiskState.zobrist).
+
+    Cada entrada guarda el valor calculado y la profundidad de búsqueda con la que se obtuvo.
+    Un valor sólo se reutiliza si se calculó con al menos la profundidad pedida, nunca se sustituye
+    una entrada por otra menos profunda, y cuando se llena se descarta la entrada usada hace más tiempo (LRU).
+    """
+    def __init__(self, capacity=2**16):
+        self.capacity = capacity
+        """ Número máximo de entradas """
+
+        self.entries = OrderedDict()
+        """ Diccionario hash -> (profundidad, valor), ordenado del uso más antiguo al más reciente """
+
+        self.hits = 0
+        """ Número de consultas resueltas por la tabla """
+
+        self.misses = 0
+        """ Número de consultas no resueltas """
+
+    def get(self, key, depth=0):
+        """Returns the stored value for key if it was computed with at least the given depth, else None"""
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < depth:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, depth, value):
+        """Stores the value computed for key at the given depth"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[0] > depth:
+                return
+            self.entries.move_to_end(key)
+        elif len(self.entries) >= self.capacity:
+            self.entries.popitem(last=False)
+        self.entries[key] = (depth, value)
+
+    def clear(self):
+        """Removes every entry"""
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
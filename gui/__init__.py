@@ -1,3 +1,21 @@
 """
 GUI folder for code related to interactive RISK GUI
-"""
\ No newline at end of file
+"""
+import sys
+import importlib.util
+
+
+def lazy_import(name):
+    """
+    Returns the module name without running it: it is loaded the first time one of its attributes is used.
+    Lets the engine and AI helpers refer to riskgui (tkinter, PIL) without loading it in headless processes
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -27,7 +27,9 @@ import sys
 import os.path
 
 from config_atrib import *
-import gui.riskgui as riskgui
+from gui import lazy_import
+# La GUI (tkinter, PIL) solo se carga cuando se dibuja algo
+riskgui = lazy_import('gui.riskgui')
 
 
 debugging = 0
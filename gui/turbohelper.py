@@ -4,7 +4,8 @@ TurboRisk ai's to work in this game
 
 
 import gui.riskengine as riskengine
-import gui.riskgui as riskgui
+from gui import lazy_import
+riskgui = lazy_import('gui.riskgui')
 
 def run_preplace(player):
     """Runs when the player is supposed to select 
@@ -0,0 +1,594 @@
+"""
+Motor de partidas compartido por play_risk_ai.py, PPO/play_rl_vs_rl.py y PPO/play_rl_vs_heuristics.py
+
+Los scripts solo leen sus argumentos, eligen nombres y el orden de las partidas, y le pasan el torneo a run_match.
+Aquí están:
+  - play_game: el bucle de una partida (límite de acciones y de tiempo, validación con risktools.isLegal,
+    sustitución de acciones inválidas)
+  - AIFactory: adaptadores de jugadores según la extensión del archivo (.py heurística, .zip modelo PPO,
+    RemotePolicy para un modelo servido por lotes desde un PPO/policy_server.PolicyServer)
+  - Sinks que reciben los eventos de la partida: TextLogSink (log de texto para la GUI), BinaryLogSink (log binario
+    compacto, que read_binary_log lee y binary_log_to_text pasa a texto), VerboseSink y Statistics
+
+Un jugador es cualquier objeto con getAction(state, time_left) que devuelva un RiskAction (time_left: segundos que
+le quedan en la partida): los módulos de IA heurística y PPOPlayer ya lo cumplen.
+"""
+import os
+import sys
+import time
+import types
+import struct
+import random
+import itertools
+import traceback
+
+import risktools
+from config_atrib import ECON_START, HAPP_START, DEVP_START
+from tournament import run_tournament
+
+ACTION_LIMIT = 5000
+""" Acciones tras las que la partida acaba en empate """
+
+TIME_LIMIT = 600.0
+""" Segundos de que dispone cada jugador en toda la partida """
+
+WORLD_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "world.zip")
+
+
+class AIFactory:
+    """
+    Crea los jugadores a partir de su archivo, con el adaptador de su extensión:
+    - .py: IA heurística (el módulo, con su getAction)
+    - .zip: modelo PPO (PPOPlayer)
+
+    Se pueden añadir otros tipos con register. En los torneos en paralelo cada proceso vuelve a importar
+    este módulo, así que register debe llamarse al importar un módulo, no desde main.
+    Un ai_spec que no es una ruta (como RemotePolicy) indica su tipo con su atributo extension.
+    """
+    loaders = dict()
+    """ Extensión -> (tipo de IA, función de carga(ai_spec, nombre)) """
+
+    @classmethod
+    def register(cls, extension, ai_type, loader):
+        cls.loaders[extension] = (ai_type, loader)
+
+    @staticmethod
+    def extension(ai_spec):
+        return getattr(ai_spec, 'extension', None) or os.path.splitext(str(ai_spec))[1]
+
+    @classmethod
+    def ai_type(cls, ai_spec):
+        """Tipo de IA ("PPO", "Heuristic"...) según la extensión del archivo, sin cargarla."""
+        extension = cls.extension(ai_spec)
+        if extension not in cls.loaders:
+            raise ValueError(
+                f"Formato desconocido: {ai_spec}\n"
+                f"Debe ser {' o '.join(cls.loaders)}"
+            )
+        return cls.loaders[extension][0]
+
+    @classmethod
+    def create_ai(cls, ai_spec, player_name):
+        """Carga la IA de ai_spec. Devuelve (jugador, tipo de IA)"""
+        ai_type = cls.ai_type(ai_spec)
+        loader = cls.loaders[cls.extension(ai_spec)][1]
+        return loader(ai_spec, player_name), ai_type
+
+
+class RemotePolicy():
+    """Modelo PPO servido por un PolicyServer (ver PPO/policy_server.py): dirección y clave para conectarse"""
+    extension = '.policy'
+
+    def __init__(self, model_path, address, authkey):
+        self.model_path = model_path
+        self.address = address
+        self.authkey = authkey
+
+    def __str__(self):
+        return str(self.model_path)
+
+
+def load_heuristic(py_path, player_name):
+    """Carga una IA heurística desde su archivo .py (un módulo nuevo en cada llamada)"""
+    gai = types.ModuleType(os.path.basename(py_path)[:-3])
+    with open(py_path, 'r', encoding='utf-8') as f:
+        exec(f.read(), gai.__dict__)
+    return gai
+
+
+def _add_ppo_path():
+    """Permite importar los módulos de PPO/ (solo cuando hacen falta: cargan stable-baselines3)"""
+    ppo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "PPO")
+    if ppo_dir not in sys.path:
+        sys.path.append(ppo_dir)
+
+
+def load_ppo(model_path, player_name):
+    """Carga un modelo PPO (solo entonces se importan PPO/ y stable-baselines3)"""
+    _add_ppo_path()
+    from ppo_loader import PPOPlayer
+    return PPOPlayer(str(model_path), player_name=player_name)
+
+
+def load_remote_ppo(remote, player_name):
+    """Jugador PPO que pide sus acciones al PolicyServer de remote (RemotePolicy)"""
+    _add_ppo_path()
+    from policy_server import RemotePPOPlayer
+    return RemotePPOPlayer(remote.address, remote.authkey, str(remote.model_path), player_name=player_name)
+
+
+AIFactory.register('.py', "Heuristic", load_heuristic)
+AIFactory.register('.zip', "PPO", load_ppo)
+AIFactory.register(RemotePolicy.extension, "PPO", load_remote_ppo)
+
+
+class GameResult():
+    """Resultado de una partida (se manda de los procesos del torneo al principal)"""
+    def __init__(self, kind, player, scores, turn_count, final_string):
+        self.kind = kind
+        """ 'Game End', 'Action Limit Reached' o 'Time Out' """
+
+        self.player = player
+        """ Puesto del ganador (Game End) o del que se quedó sin tiempo (Time Out) """
+
+        self.scores = scores
+        """ Puntos de cada puesto """
+
+        self.turn_count = turn_count
+        self.final_string = final_string
+        """ RISKRESULT|nombre,puntos|...|tipo|Turn Count = n """
+
+
+class MatchSink():
+    """Recibe los eventos de una partida. Las subclases redefinen los que necesitan"""
+    def start_game(self, state, game_id):
+        pass
+
+    def action(self, state, action, seconds, time_left):
+        """action se va a ejecutar sobre state; el jugador tardó seconds en elegirla y le quedan time_left"""
+        pass
+
+    def end_game(self, state, result):
+        pass
+
+
+class TextLogSink(MatchSink):
+    """Log de texto de cada partida en directory (el formato que lee risk_game_viewer.py)"""
+    def __init__(self, prefix='RISKGAME', directory='logs'):
+        self.prefix = prefix
+        self.directory = directory
+        self.logname = None
+        self.logfile = None
+
+    def start_game(self, state, game_id):
+        timestr = time.strftime("%Y%m%d-%H%M%S")
+        if game_id is not None:
+            # Las partidas jugadas a la vez en un torneo no comparten log
+            timestr = timestr + '_' + str(game_id)
+        os.makedirs(self.directory, exist_ok=True)
+        self.logname = os.path.join(self.directory, self.prefix + '_' + timestr + '.log')
+        self.logfile = open(self.logname, 'w', encoding='utf-8')
+        self.logfile.write(state.board.to_string())
+        self.logfile.write('\n')
+
+    def action(self, state, action, seconds, time_left):
+        self.logfile.write(state.to_string())
+        self.logfile.write('\n')
+        self.logfile.write(action.to_string(state.board))
+        self.logfile.write('\n')
+
+    def end_game(self, state, result):
+        self.logfile.write(state.to_string())
+        self.logfile.write('\n')
+        self.logfile.write(result.final_string)
+        self.logfile.write('\n')
+        self.logfile.close()
+        self.logfile = None
+        print('Game log saved to: ', self.logname)
+
+
+BINARY_LOG_MAGIC = b'RISKBLOG\x01'
+""" Cabecera de los logs binarios (con la versión del formato) """
+
+_STATE_HEADER = struct.Struct('<bHHBihhBH')
+""" Jugador actual, fase, tipo de turno, mes, turn_in_number, last_attacker, last_defender, jugadores, territorios """
+
+_PLAYER = struct.Struct('<Hhiiddbb')
+""" Nombre, id, free_armies, happiness, economy, development, conquered_territory, game_over """
+
+_ACTION = struct.Struct('<Hhhiibb')
+""" Tipo, to_territory, from_territory, unidades, unidades_max, to_player, from_player """
+
+_LENGTH = struct.Struct('<I')
+
+
+def _int_or_none(value):
+    """-1 representa None en los campos enteros del log binario"""
+    return -1 if value is None else value
+
+
+def _none_if_negative(value):
+    return None if value < 0 else value
+
+
+class BinaryLogSink(MatchSink):
+    """
+    Log binario de cada partida en directory: el mismo contenido que TextLogSink (tablero, estado antes de cada
+    acción, acción, estado final y resultado) en registros de tamaño fijo: ocupa unos dos tercios del log de texto
+    y se escribe unas diez veces más rápido. Se lee con read_binary_log y binary_log_to_text lo pasa al formato de texto de risk_game_viewer.py.
+
+    Registros (un byte de etiqueta y sus datos, little-endian):
+      S: cadena nueva de la tabla de cadenas (tipos de acción, fases, tipos de turno y nombres se guardan como
+         su posición en la tabla)
+      B: tablero (board.to_string())
+      A: estado y acción que se va a ejecutar sobre él
+      E: estado final y RISKRESULT
+    """
+    def __init__(self, prefix='RISKGAME', directory='logs'):
+        self.prefix = prefix
+        self.directory = directory
+        self.logname = None
+        self.logfile = None
+        self.strings = dict()
+        """ Cadena -> posición en la tabla de cadenas del log """
+
+    def start_game(self, state, game_id):
+        timestr = time.strftime("%Y%m%d-%H%M%S")
+        if game_id is not None:
+            timestr = timestr + '_' + str(game_id)
+        os.makedirs(self.directory, exist_ok=True)
+        self.logname = os.path.join(self.directory, self.prefix + '_' + timestr + '.rlog')
+        self.logfile = open(self.logname, 'wb')
+        self.strings = dict()
+        self.logfile.write(BINARY_LOG_MAGIC)
+        self._write_text(b'B', state.board.to_string())
+
+    def action(self, state, action, seconds, time_left):
+        # Las cadenas nuevas se escriben antes del registro que las usa
+        state_bytes = self._state_bytes(state)
+        action_bytes = _ACTION.pack(self._string(action.type), _int_or_none(action.to_territory),
+                                    _int_or_none(action.from_territory), _int_or_none(action.unidades),
+                                    _int_or_none(action.unidades_max), _int_or_none(action.to_player),
+                                    _int_or_none(action.from_player))
+        self.logfile.write(b'A' + state_bytes + action_bytes)
+
+    def end_game(self, state, result):
+        self.logfile.write(b'E' + self._state_bytes(state))
+        data = result.final_string.encode('utf-8')
+        self.logfile.write(_LENGTH.pack(len(data)) + data)
+        self.logfile.close()
+        self.logfile = None
+        print('Game log saved to: ', self.logname)
+
+    def _write_text(self, tag, text):
+        data = text.encode('utf-8')
+        self.logfile.write(tag + _LENGTH.pack(len(data)) + data)
+
+    def _string(self, text):
+        """Posición de text en la tabla de cadenas (la añade al log si es nueva)"""
+        code = self.strings.get(text)
+        if code is None:
+            code = self.strings[text] = len(self.strings)
+            self._write_text(b'S', text)
+        return code
+
+    def _state_bytes(self, state):
+        n = len(state.owners)
+        parts = [_STATE_HEADER.pack(state.current_player, self._string(state.fase), self._string(state.turn_type),
+                                    state.mes, state.turn_in_number, _int_or_none(state.last_attacker),
+                                    _int_or_none(state.last_defender), len(state.players), n)]
+        for p in state.players:
+            parts.append(_PLAYER.pack(self._string(p.name), p.id, p.free_armies, p.happiness, p.economy,
+                                      p.development, bool(p.conquered_territory), bool(p.game_over)))
+        parts.append(struct.pack(f'<{n}b{n}i', *(_int_or_none(o) for o in state.owners), *state.armies))
+        return b''.join(parts)
+
+
+def read_binary_log(path, board_file=None):
+    """
+    Lee un log de BinaryLogSink. board_file es el mapa de la partida (por defecto world.zip).
+    Devuelve (texto del tablero, pasos, RISKRESULT): cada paso es (RiskState, RiskAction que se ejecutó sobre él),
+    y el último, el estado final, lleva None como acción
+    """
+    board = risktools.loadBoard(board_file if board_file is not None else WORLD_FILE)
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(BINARY_LOG_MAGIC):
+        raise ValueError(f"{path} no es un log binario de RISK")
+
+    pos = len(BINARY_LOG_MAGIC)
+    strings = []
+    board_string = None
+    steps = []
+    final_string = None
+
+    def unpack(layout):
+        nonlocal pos
+        values = layout.unpack_from(data, pos)
+        pos += layout.size
+        return values
+
+    def read_text():
+        nonlocal pos
+        (length,) = unpack(_LENGTH)
+        pos += length
+        return data[pos-length:pos].decode('utf-8')
+
+    def read_state():
+        nonlocal pos
+        player, fase, turn_type, mes, turn_in_number, attacker, defender, n_players, n = unpack(_STATE_HEADER)
+        players = []
+        for _ in range(n_players):
+            name, pid, free_armies, happiness, economy, development, conquered, game_over = unpack(_PLAYER)
+            players.append(risktools.RiskPlayer(strings[name], pid, free_armies, bool(conquered), economy, happiness,
+                                                development, bool(game_over)))
+        cells = struct.Struct(f'<{n}b{n}i')
+        values = unpack(cells)
+        owners = [_none_if_negative(o) for o in values[:n]]
+        return risktools.RiskState(strings[fase], players, list(values[n:]), owners, player, strings[turn_type],
+                                   turn_in_number, _none_if_negative(attacker), _none_if_negative(defender), board, mes)
+
+    while pos < len(data):
+        tag = data[pos:pos+1]
+        pos += 1
+        if tag == b'S':
+            strings.append(read_text())
+        elif tag == b'B':
+            board_string = read_text()
+        elif tag == b'A':
+            state = read_state()
+            kind, to_t, from_t, unidades, unidades_max, to_player, from_player = unpack(_ACTION)
+            action = risktools.RiskAction(strings[kind], _none_if_negative(to_t), _none_if_negative(from_t),
+                                          _none_if_negative(unidades), _none_if_negative(to_player),
+                                          _none_if_negative(from_player), _none_if_negative(unidades_max))
+            steps.append((state, action))
+        elif tag == b'E':
+            steps.append((read_state(), None))
+            final_string = read_text()
+        else:
+            raise ValueError(f"Registro desconocido {tag!r} en {path} (posición {pos-1})")
+    return board_string, steps, final_string
+
+
+def binary_log_to_text(path, text_path=None, board_file=None):
+    """Pasa un log de BinaryLogSink al formato de TextLogSink (por defecto, al mismo nombre con .log). Devuelve su ruta"""
+    board_string, steps, final_string = read_binary_log(path, board_file)
+    if text_path is None:
+        text_path = os.path.splitext(path)[0] + '.log'
+    with open(text_path, 'w', encoding='utf-8') as f:
+        f.write(board_string)
+        f.write('\n')
+        for state, action in steps:
+            f.write(state.to_string())
+            f.write('\n')
+            if action is not None:
+                f.write(action.to_string(state.board))
+                f.write('\n')
+        f.write(final_string)
+        f.write('\n')
+    return text_path
+
+
+class VerboseSink(MatchSink):
+    """Muestra cada acción de la partida"""
+    def start_game(self, state, game_id):
+        self.action_count = 0
+        print('Players order for game: ', [p.name for p in state.players])
+
+    def action(self, state, action, seconds, time_left):
+        print('--*TURN', self.action_count, 'BEGIN*--')
+        print('CURRENT PLAYER: ', state.players[state.current_player].name)
+        print('TURN-TYPE: ', state.turn_type)
+        print('TIME-LEFT: ', time_left)
+        print('IN ', seconds, ' SECONDS CHOSE ACTION: ', action.description(board=state.board))
+        print('--*TURN END*--')
+        self.action_count += 1
+
+    def end_game(self, state, result):
+        print(' Final State at end of game:')
+        state.print_state()
+
+
+class Statistics(MatchSink):
+    """Resultados acumulados de un torneo (también sirve de sink de una partida)"""
+    def __init__(self, player_names):
+        self.games_played = 0
+        self.winners = {i: 0 for i in range(len(player_names))}
+        """ Puntos de cada jugador (por su posición en player_names) """
+
+        self.total_turns = 0
+        self.wins = 0
+        self.ties = 0
+        self.time_outs = 0
+        self.player_names = player_names
+
+    def record(self, result, order=None):
+        """Suma result; order[puesto] es el jugador de cada puesto (por defecto, el del mismo índice)"""
+        self.games_played += 1
+        self.total_turns += result.turn_count
+        if result.kind == 'Game End':
+            self.wins += 1
+        elif result.kind == 'Action Limit Reached':
+            self.ties += 1
+        else:
+            self.time_outs += 1
+        for seat, score in enumerate(result.scores):
+            self.winners[seat if order is None else order[seat]] += score
+
+    def end_game(self, state, result):
+        self.record(result)
+
+    def average_turns(self):
+        return float(self.total_turns) / float(self.games_played) if self.games_played > 0 else 0.0
+
+    def print_stats(self):
+        print('MATCH STATISTICS:')
+        print('  GAMES PLAYED : ', self.games_played)
+        print('  NORMAL WINS  : ', self.wins)
+        print('  TIES         : ', self.ties)
+        print('  TIME OUTS    : ', self.time_outs)
+        print('  WINNERS      : ', self.winners)
+        print('  AVERAGE TURNS: ', self.average_turns())
+
+    def print_report(self, title, labels=None, width=60):
+        """Resumen con los puntos de cada jugador, etiquetado con labels (por defecto, sus nombres)"""
+        labels = self.player_names if labels is None else labels
+        print('\n' + '='*width)
+        print(title)
+        print('='*width)
+        print(f'  PARTIDAS JUGADAS  : {self.games_played}')
+        print(f'  VICTORIAS NORMALES: {self.wins}')
+        print(f'  EMPATES           : {self.ties}')
+        print(f'  TIMEOUTS          : {self.time_outs}')
+        print(f'  TURNOS PROMEDIO   : {self.average_turns():.2f}')
+        print('\n  VICTORIAS POR JUGADOR:')
+        for i, label in enumerate(labels):
+            print(f'    {label}: {self.winners[i]} victorias')
+        print('='*width + '\n')
+
+
+def _game_result(state, kind, player, turn_count):
+    """GameResult de una partida terminada (los nombres son los del estado final: pueden haber cambiado)"""
+    names = [p.name for p in state.players]
+    n = len(names)
+    if kind == 'Game End':
+        scores = [1 if i == player else 0 for i in range(n)]
+        parts = [names[player] + ",1"] + [names[i] + ",0" for i in range(n) if i != player]
+    elif kind == 'Action Limit Reached':
+        tie_score = round(1.0 / float(n), 2)
+        scores = [tie_score] * n
+        parts = [name + "," + str(tie_score) for name in names]
+    else:
+        time_out_score = round(1.0 / float(n - 1), 2)
+        scores = [0 if i == player else time_out_score for i in range(n)]
+        parts = [names[player] + ",0"] + [names[i] + "," + str(time_out_score) for i in range(n) if i != player]
+    final_string = "RISKRESULT|" + "|".join(parts) + "|" + kind + '|Turn Count = ' + str(turn_count)
+    return GameResult(kind, player, scores, turn_count, final_string)
+
+
+def play_game(players, player_names, sinks=(), game_id=None, action_limit=ACTION_LIMIT, time_limit=TIME_LIMIT, board_file=None):
+    """
+    Juega una partida: players[i] (con getAction(state, time_left)) juega en el puesto i con el nombre player_names[i].
+    Un jugador que lanza una excepción, elige una acción inválida o agota su tiempo pierde la partida
+    (la acción inválida se sustituye por una legal al azar para terminar el paso).
+    sinks (MatchSink) reciben el estado inicial, cada acción antes de ejecutarla y el resultado.
+    Devuelve el GameResult
+    """
+    board = risktools.loadBoard(board_file if board_file is not None else WORLD_FILE)
+    for name in player_names:
+        board.add_player(risktools.RiskPlayer(name, len(board.players), 0, False, ECON_START, HAPP_START, DEVP_START))
+    state = risktools.getInitialState(board)
+    for sink in sinks:
+        sink.start_game(state, game_id)
+
+    time_left = [time_limit] * len(player_names)
+    action_count = 0
+    turn_count = 0
+    last_player_name = None
+    result = None
+
+    while result is None:
+        player = state.current_player
+        player_name = state.players[player].name
+
+        start_action = time.perf_counter()
+        try:
+            action = players[player].getAction(state.copy_state(), time_left[player])
+        except Exception as e:
+            print('There was an error for player: ', player_name, '  THEY LOSE!')
+            print(' ERROR INFORMATION: ')
+            print(e)
+            traceback.print_exc()
+            action = None
+            time_left[player] = -1.0
+        seconds = time.perf_counter() - start_action
+        time_left[player] -= seconds
+
+        # Las acciones validadas (o sustituidas por una legal) se ejecutan sin volver a validarlas.
+        # Se aceptan los ataques completos (macro), que usan los jugadores PPO de fases
+        mode = risktools.EXEC_TRUSTED
+        if not risktools.isLegal(state, action, macro=True):
+            if action is not None:
+                print('Player selected invalid action.  ERROR, THEY LOSE!')
+                print('  Action selected: ', action.to_string(state.board))
+            # La lista completa de acciones solo hace falta aquí, para elegir la sustituta
+            allowed = list(itertools.chain.from_iterable(risktools.getAllowedFaseActions(state).values()))
+            if allowed:
+                action = random.choice(allowed)
+            else:
+                action = risktools.RiskAction('Pasar', None, None, None)
+                mode = None
+            time_left[player] = -1.0
+
+        if player_name != last_player_name:
+            turn_count += 1
+            last_player_name = player_name
+
+        for sink in sinks:
+            sink.action(state, action, seconds, time_left[player])
+        state = risktools.sampleAction(state, action, mode=mode)
+
+        if state.turn_type == 'GameOver':
+            print('Game is over.', state.players[player].name, ' is the winner.')
+            result = _game_result(state, 'Game End', player, turn_count)
+        elif action_count > action_limit:
+            print('Action limit exceeded.  Game ends in a tie')
+            result = _game_result(state, 'Action Limit Reached', player, turn_count)
+        elif time_left[player] < 0:
+            print('Agent time limit exceeded. ', state.players[player].name, ' loses by time-out.')
+            result = _game_result(state, 'Time Out', player, turn_count)
+        action_count += 1
+
+    print(result.final_string)
+    for sink in sinks:
+        sink.end_game(state, result)
+    return result
+
+
+def load_players(ai_specs, player_names):
+    """Carga los jugadores de ai_specs con AIFactory (una vez en cada proceso del torneo)"""
+    return [AIFactory.create_ai(ai_spec, name)[0] for ai_spec, name in zip(ai_specs, player_names)]
+
+
+def play_tournament_game(players, game, log_prefix, save_logfile, verbose, binary_log=False):
+    """Juega la partida game (TournamentGame) de un torneo con los jugadores cargados por load_players"""
+    sinks = []
+    if save_logfile:
+        sinks.append(BinaryLogSink(log_prefix) if binary_log else TextLogSink(log_prefix))
+    if verbose:
+        sinks.append(VerboseSink())
+    return play_game([players[i] for i in game.order], game.names, sinks, game_id=game.number)
+
+
+def run_match(games, ai_specs, player_names, stats, log_prefix='RISKGAME', save_logfile=False, verbose=False, n_workers=1,
+              binary_log=False, policy_server=False):
+    """
+    Juega las partidas games (TournamentGame) en n_workers procesos (ver tournament.py) y suma sus resultados en stats.
+    ai_specs y player_names son los archivos y nombres de los jugadores, en el orden al que se refiere game.order.
+    Con binary_log los logs se guardan con BinaryLogSink en lugar de TextLogSink.
+    Con policy_server cada modelo PPO (.zip) se carga una sola vez, en un PolicyServer que resuelve por lotes
+    las peticiones de todos los procesos.
+    Devuelve el tiempo total en segundos
+    """
+    def on_result(game, result):
+        stats.record(result, game.order)
+        print('GAME', game.number + 1, 'OF', len(games), ':', game.names, '->', result.final_string)
+
+    ai_specs = list(ai_specs)
+    servers = dict()
+    try:
+        if policy_server:
+            _add_ppo_path()
+            from policy_server import PolicyServer
+            for i, ai_spec in enumerate(ai_specs):
+                if AIFactory.extension(ai_spec) != '.zip':
+                    continue
+                if str(ai_spec) not in servers:
+                    servers[str(ai_spec)] = PolicyServer(str(ai_spec))
+                server = servers[str(ai_spec)]
+                ai_specs[i] = RemotePolicy(server.model_path, server.address, server.authkey)
+        return run_tournament(games, load_players, (ai_specs, list(player_names)), play_tournament_game, on_result,
+                              n_workers, (log_prefix, save_logfile, verbose, binary_log), quiet=not verbose)
+    finally:
+        for server in servers.values():
+            server.close()
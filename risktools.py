@@ -1,13 +1,16 @@
 """
 This file contains the RISK simulator that consitutes the backbone of the RISK AI Assignment
+The simulator does not depend on the GUI: gui.riskengine (and with it tkinter) is only loaded by the
+functions that talk to it (createRiskBoard, createRiskState, translateAction)
 """
-import gui.riskengine as riskengine
 import random
 import zipfile
 import xml.dom.minidom
 import math
 import json
 import sys
+import os
+import hashlib
 
 from config_atrib import *
 
@@ -16,7 +19,10 @@ from clases.board import RiskBoard
 from clases.continent import RiskContinent
 from clases.player import RiskPlayer
 from clases.state import RiskState
+from clases.packed_state import RiskPackedState
 from clases.territory import RiskTerritory
+from clases.zobrist import RiskTranspositionTable
+from clases.execution import EXEC_NORMAL, EXEC_TRUSTED, EXEC_STRICT, RiskActionError
 
 from acciones.attack import *
 from acciones.fortify import *
@@ -44,12 +50,23 @@ from turnos.turnos import *
 # ------------------------------------------------------------------------------------------
 
 
-def simulateAction(input_state, action):
+def simulateAction(input_state, action, mode=None):
     """
     Returns a list of all possible future states that this action could lead to, along with the probability of each.  
     This function makes a copy of the input_state, so it is not modified
+    mode (EXEC_NORMAL, EXEC_TRUSTED o EXEC_STRICT) sustituye solo para esta llamada el execution_mode del estado
     Returns: [state0, state1, ....], [probability0, probability1]
     """
+    if mode is not None and mode != input_state.execution_mode:
+        saved = input_state.execution_mode
+        input_state.execution_mode = mode
+        try:
+            rstates, rsprobs = simulateAction(input_state, action)
+        finally:
+            input_state.execution_mode = saved
+        for state in rstates:
+            state.execution_mode = saved
+        return rstates, rsprobs
     
     rstates = []
     rsprobs = []
@@ -59,55 +76,173 @@ def simulateAction(input_state, action):
         rstates,rsprobs = simulateAttack(input_state, action)
     else:
         s = input_state.copy_state()
-
-        if action.type=="Pasar": pass
-        elif action.type == 'PreAssign':
-            simulatePreAssignAction(s, action)
-        elif action.type == 'PrePlace':
-            simulatePrePlaceAction(s, action)
-        elif action.type == 'Comprar_Soldados':
-            simulateComprarSoldadosAction(s, action)
-        elif action.type == 'Place':
-            simulatePlaceAction(s, action)
-        elif action.type == 'Occupy':
-            simulateOccupyAction(s, action)
-        elif action.type == 'Fortify':
-            simulateFortifyAction(s, action)
-        elif action.type == 'Invertir':
-            simulateInvertirAction(s, action)
-        elif action.type == 'Casino':
-            simulateCasinoAction(s ,action)
-        elif action.type == 'Festin':
-            simulateFestinAction(s ,action)
-        elif action.type == 'Comercio':
-            simulateComercioAction(s ,action)
-        else:
-            print(f'ILLEGAL ACTION TYPE!{action.type}2')
-        
+        executeAction(s, action)
         rstates = [s]
         rsprobs = [1]
         
     # Lógica de Transición de Fase
     for state in rstates:
-        avanz_fase = nextFase(state, action)
-
-        if avanz_fase:
-            if state.turn_type != "GameOver":
-                try:
-                    # Si el jugador es el jugador con el numero más alto de la lista owners significa que es el último
-                    if state.fase!='fase_0' and state.current_player==max([x for x in state.owners if x is not None]):
-                        state.mes = (state.mes % 12) + 1
-                    nextPlayer(state) # Avanza al siguiente jugador
-                except:
-                    # todos muertos
-                    state.turn_type = "GameOver"
-                if state.fase == 'fase_1': #FIN DEL TURNO
-                    updateHappinessFinTurno(state)
-                    beginTurn(state)    
-                
+        advanceFase(state, action)
         
     return rstates, rsprobs
 
+def sampleOutcome(probs, rng=random):
+    """
+    Elige un outcome_index según la lista de probabilidades probs, usando rng.random().
+    Si solo hay un resultado no consume números aleatorios.
+    """
+    if len(probs) == 1:
+        return 0
+    r = rng.random()
+    i = 0
+    prob_sum = probs[0]
+    while prob_sum < r and i < len(probs) - 1:
+        i += 1
+        prob_sum += probs[i]
+    return i
+
+def sampleAction(state, action, rng=random, in_place=False, mode=None):
+    """
+    Equivale a elegir un estado de simulateAction(state, action) según sus probabilidades, pero
+    sortea primero el resultado y solo construye ese sucesor.
+    rng es cualquier objeto con un método random() (el módulo random, random.Random, numpy.random...).
+    Si in_place es True se modifica y devuelve el propio state; si no, se trabaja sobre una copia.
+    mode sustituye solo para esta llamada el execution_mode del estado (ver simulateAction)
+    """
+    outcome_index = sampleOutcome(getActionProbabilities(state, action), rng)
+    if not in_place:
+        state = state.copy_state()
+    saved = state.execution_mode
+    if mode is not None:
+        state.execution_mode = mode
+    try:
+        if action.type == 'Attack':
+            if action.from_territory is not None:
+                simulateAttackAction(state, action, outcome_index)
+        else:
+            executeAction(state, action)
+        advanceFase(state, action)
+    finally:
+        state.execution_mode = saved
+    return state
+
+def executeAction(state, action):
+    """
+    Ejecuta sobre el estado cualquier acción que no sea un ataque (sin copiarlo y sin cambiar de fase).
+    """
+    if action.type=="Pasar": pass
+    elif action.type == 'PreAssign':
+        simulatePreAssignAction(state, action)
+    elif action.type == 'PrePlace':
+        simulatePrePlaceAction(state, action)
+    elif action.type == 'Comprar_Soldados':
+        simulateComprarSoldadosAction(state, action)
+    elif action.type == 'Place':
+        simulatePlaceAction(state, action)
+    elif action.type == 'Occupy':
+        simulateOccupyAction(state, action)
+    elif action.type == 'Fortify':
+        simulateFortifyAction(state, action)
+    elif action.type == 'Invertir':
+        simulateInvertirAction(state, action)
+    elif action.type == 'Casino':
+        simulateCasinoAction(state ,action)
+    elif action.type == 'Festin':
+        simulateFestinAction(state ,action)
+    elif action.type == 'Comercio':
+        simulateComercioAction(state ,action)
+    elif state.execution_mode == EXEC_STRICT:
+        raise RiskActionError(action, 'unknown action type', state.board)
+    else:
+        print(f'ILLEGAL ACTION TYPE!{action.type}2')
+
+def advanceFase(state, action):
+    """
+    Aplica la transición de fase tras ejecutar la acción y, si el jugador ha terminado,
+    pasa al siguiente (mes, felicidad de fin de turno e ingresos del nuevo turno).
+    """
+    avanz_fase = nextFase(state, action)
+
+    if avanz_fase:
+        if state.turn_type != "GameOver":
+            try:
+                # Si el jugador es el jugador con el numero más alto de la lista owners significa que es el último
+                if state.fase!='fase_0' and state.current_player==max([x for x in state.owners if x is not None]):
+                    state.mes = (state.mes % 12) + 1
+                nextPlayer(state) # Avanza al siguiente jugador
+            except:
+                # todos muertos
+                state.turn_type = "GameOver"
+            if state.fase == 'fase_1': #FIN DEL TURNO
+                updateHappinessFinTurno(state)
+                beginTurn(state)    
+
+def getActionProbabilities(state, action):
+    """
+    Devuelve la probabilidad de cada outcome_index posible de la acción (ver applyAction).
+    Solo los ataques tienen más de un resultado.
+    """
+    if action.type == 'Attack':
+        return getAttackProbabilities(state, action)
+    return [1]
+
+def applyAction(state, action, outcome_index=0, mode=None):
+    """
+    Ejecuta la acción directamente sobre state (sin copiarlo), suponiendo el resultado outcome_index
+    para los ataques, y aplica la transición de fase igual que simulateAction.
+    mode sustituye solo para esta llamada el execution_mode del estado (ver simulateAction).
+    Devuelve un registro compacto para deshacer la acción con undoAction:
+        (fase, turn_type, current_player, mes, turn_in_number, last_attacker, last_defender,
+         jugadores guardados, [(territorio, dueño, tropas) antes de la acción], revoluciones)
+    Los registros deben deshacerse en orden inverso al que se aplicaron.
+    """
+    cells = []
+    for t in (action.from_territory, action.to_territory):
+        if t is not None:
+            cells.append((t, state.owners[t], state.armies[t]))
+
+    record = (state.fase, state.turn_type, state.current_player, state.mes, state.turn_in_number,
+              state.last_attacker, state.last_defender, state.save_players(), cells, [])
+    
+    state.undo_log = record[9]
+    saved = state.execution_mode
+    if mode is not None:
+        state.execution_mode = mode
+    try:
+        if action.type == 'Attack':
+            if action.from_territory is not None:
+                simulateAttackAction(state, action, outcome_index)
+        else:
+            executeAction(state, action)
+        advanceFase(state, action)
+    finally:
+        state.undo_log = None
+        state.execution_mode = saved
+    return record
+
+def undoAction(state, record):
+    """Deshace sobre state una acción aplicada con applyAction, a partir de su registro"""
+    fase, turn_type, current_player, mes, turn_in_number, last_attacker, last_defender, players, cells, revoluciones = record
+    
+    # Primero el tablero tal y como estaba antes de cada revolución, luego las casillas tocadas por la acción
+    if revoluciones:
+        for owners, armies in reversed(revoluciones):
+            state.owners = owners
+            state.armies = armies
+        state.recount()
+    for idx, owner, armies in cells:
+        state.set_owner(idx, owner)
+        state.set_armies(idx, armies)
+    
+    state.restore_players(players)
+    state.fase = fase
+    state.turn_type = turn_type
+    state.current_player = current_player
+    state.mes = mes
+    state.turn_in_number = turn_in_number
+    state.last_attacker = last_attacker
+    state.last_defender = last_defender
+
 def nextFase(state, action):
     """
     Establece el turn_type y la fase del estado DESPUÉS de que se realiza una acción.
@@ -128,7 +263,7 @@ def nextFase(state, action):
         # Organización del tablero
         if action.type == 'PreAssign':
             advance_player = True 
-            if len(getPreAssignActions(state)) == 0:
+            if state.owned_mask[-1] == 0:
                 # Todos los territorios asignados pasamos a PrePlace
                 state.turn_type = 'PrePlace'
             
@@ -177,9 +312,8 @@ def nextFase(state, action):
         
         elif action.type == 'Occupy':
             state.turn_type = 'Attack'
-            if None not in state.owners:
-                if max(state.owners) == min(state.owners):
-                    state.turn_type = 'GameOver'
+            if state.owned_mask[state.current_player] == state.board.index.all_mask:
+                state.turn_type = 'GameOver'
         elif action.type=="Pasar":
             state.fase = 'fase_3'
             state.turn_type = "Fase 3"
@@ -202,10 +336,13 @@ def nextFase(state, action):
         advance_player = True
 
     return advance_player        
-def getAllowedFaseActions(state):
+def getAllowedFaseActions(state, expand=True, macro=False):
     """
     Devuelve un diccionario de todas las acciones permitidas, agrupadas por tipo,
     basado en el *estado exacto* actual (fase Y turn_type).
+    Con expand=False, Fortify y Occupy se devuelven como acciones de rango (una por par de territorios,
+    ver RiskAction.unidades_max) en lugar de una acción por cantidad de tropas.
+    Con macro=True se incluyen también los ataques completos (hasta conquistar, ver getBattleOutcomes).
     """
     actions = {}
 
@@ -215,7 +352,7 @@ def getAllowedFaseActions(state):
         return actions 
     
     if state.turn_type == 'Occupy':
-        actions['Occupy'] = getOccupyActions(state)
+        actions['Occupy'] = getOccupyActions(state, expand)
         return actions 
 
     if state.turn_type == 'PreAssign':
@@ -228,7 +365,7 @@ def getAllowedFaseActions(state):
     
     # Una vez hemos atacado, estamos obligados a seguir atacando o parar, no podemos dejar de atacar y hacer otra acción de fase_2 (ahorrar etc)
     if state.turn_type == 'Attack':
-        actions['Attack'] = getAttackActions(state)
+        actions['Attack'] = getAttackActions(state, macro)
         return actions
     
     
@@ -239,7 +376,7 @@ def getAllowedFaseActions(state):
             actions['Comprar_Soldados'] = acts_comprar
         if state.players[state.current_player].free_armies > 0:
             actions['Place'] = getPlaceActions(state)
-        actions['Pasar'] = getPasarActions()
+        actions['Pasar'] = getPasarActions(state)
         acts_invertir = getInvertirActions(state)
         if acts_invertir is not None and len(acts_invertir) > 0:
             actions['Invertir'] = acts_invertir
@@ -248,10 +385,10 @@ def getAllowedFaseActions(state):
             actions['Festin'] = acts_festin
 
     elif state.fase == "fase_2":
-        acts_attack = getAttackActions(state)
+        acts_attack = getAttackActions(state, macro)
         if acts_attack is not None and len(acts_attack) > 0:
             actions['Attack'] = acts_attack
-        actions['Pasar'] = getPasarActions()
+        actions['Pasar'] = getPasarActions(state)
         actions['Comercio'] = getComercioActions(state)
         acts_casino = getCasinoActions(state)
         if acts_casino: 
@@ -260,10 +397,65 @@ def getAllowedFaseActions(state):
             
                 
     elif state.fase == "fase_3":
-        actions['Fortify'] = getFortifyActions(state)
-        actions['Pasar'] = getPasarActions()
+        actions['Fortify'] = getFortifyActions(state, expand)
+        actions['Pasar'] = getPasarActions(state)
     return actions
 
+def isLegal(state, action, macro=False):
+    """
+    Devuelve True si action se puede ejecutar en state: si es una de las acciones de
+    getAllowedFaseActions(state, expand=False, macro) o, en Fortify y Occupy, el mismo movimiento con una
+    cantidad del rango (lo que aceptaría RiskAction.accepts).
+    Comprueba las reglas de la acción directamente (ver isXLegal en acciones/), sin generar la lista: O(1)
+    """
+    if action is None or action.to_player is not None or action.from_player is not None:
+        return False
+    action_type = action.type
+    if action.unidades_max is not None and action_type not in ('Occupy', 'Fortify'):
+        return False
+
+    # Acciones forzadas por otra acción
+    if state.turn_type == 'Place':
+        return action_type == 'Place' and isPlaceLegal(state, action)
+    if state.turn_type == 'Occupy':
+        return action_type == 'Occupy' and isOccupyLegal(state, action)
+    if state.turn_type == 'PreAssign':
+        return action_type == 'PreAssign' and isPreAssignLegal(state, action)
+    if state.turn_type == 'PrePlace':
+        return action_type == 'PrePlace' and isPrePlaceLegal(state, action)
+    if state.turn_type == 'Attack':
+        return action_type == 'Attack' and isAttackLegal(state, action, macro)
+
+    # Acciones que se pueden elegir
+    if state.fase == "fase_1":
+        if action_type == 'Comprar_Soldados':
+            return isComprarSoldadosLegal(state, action)
+        if action_type == 'Place':
+            return state.players[state.current_player].free_armies > 0 and isPlaceLegal(state, action)
+        if action_type == 'Pasar':
+            return isPasarLegal(state, action)
+        if action_type == 'Invertir':
+            return isInvertirLegal(state, action)
+        if action_type == 'Festin':
+            return isFestinLegal(state, action)
+
+    elif state.fase == "fase_2":
+        if action_type == 'Attack':
+            return isAttackLegal(state, action, macro)
+        if action_type == 'Pasar':
+            return isPasarLegal(state, action)
+        if action_type == 'Comercio':
+            return isComercioLegal(state, action)
+        if action_type == 'Casino':
+            return isCasinoLegal(state, action)
+
+    elif state.fase == "fase_3":
+        if action_type == 'Fortify':
+            return isFortifyLegal(state, action)
+        if action_type == 'Pasar':
+            return isPasarLegal(state, action)
+    return False
+
 # ------------------------------------------------------------------------------------------
 # Board
 # ------------------------------------------------------------------------------------------
@@ -273,6 +465,7 @@ def createRiskBoard():
      Creates a RiskBoard from the current riskengine state.  
      Used to interface with the GUI that allows humans to play the AIs
     """
+    import gui.riskengine as riskengine
     
     board = RiskBoard()
     
@@ -305,6 +498,7 @@ def createRiskBoard():
         
     board.set_turn_in_values(riskengine.cardvals)
     board.set_increment_value(riskengine.incrementval)
+    board.compile_index()
         
     return board
     
@@ -313,6 +507,7 @@ def createRiskState(board, function_name, occupying=None):
      Creates a RiskState from the current riskengine state.  
      Used to interface with the GUI that allows humans to play the AIs
     """
+    import gui.riskengine as riskengine
 
     #players, armies, owners, current_player, turn_type
     #Create players and save the current player
@@ -371,9 +566,38 @@ def createRiskState(board, function_name, occupying=None):
     state = RiskState(fase,players,armies,owners,current_player,turn_type,turn_in_number, last_attacker, last_defender, board)
 
     return state
+
+def translateAction(state, action):
+    """
+     Translates a RiskAction into the answer expected by the GUI for the corresponding AI function.
+     Actions carry territory ids; here they are resolved (by name) into the riskengine territories
+    """
+    import gui.riskengine as riskengine
+    def territory(idx):
+        if idx is None:
+            return None
+        return riskengine.territories[state.board.territories[idx].name]
+
+    if action is None:
+        return None
+    if action.type in ['PreAssign', 'PrePlace', 'Place']:
+        return territory(action.to_territory)
+    if action.type == 'Attack':
+        return territory(action.from_territory), territory(action.to_territory)
+    if action.type == 'Occupy':
+        return action.unidades
+    if action.type == 'Fortify':
+        if action.to_territory is None:
+            return None, None, 0
+        return territory(action.from_territory), territory(action.to_territory), action.unidades
+    return None
     
-def getInitialState(board):
-    """Get the initial state for this board."""
+def getInitialState(board, packed=False, execution_mode=EXEC_NORMAL):
+    """
+    Get the initial state for this board.
+    If packed is True the state is a RiskPackedState (compact buffers, cheap copy_state)
+    execution_mode fija cómo se validan las acciones durante toda la partida (ver clases.execution)
+    """
     
     #Initialize the state with the information in the board
 
@@ -394,12 +618,101 @@ def getInitialState(board):
     last_attacker = None
     last_defender = None
     
-    state = RiskState(fase,state_players, armies, owners, current_player, turn_type, turn_in_number, last_attacker, last_defender, board)
+    state_class = RiskPackedState if packed else RiskState
+    state = state_class(fase,state_players, armies, owners, current_player, turn_type, turn_in_number, last_attacker, last_defender, board)
+    state.execution_mode = execution_mode
     return state
     
     
-def loadBoard(filename):
-    """Loads a RiskBoard from the given filename"""
+# Memo de loadBoard en este proceso: hash del contenido del zip -> mapa compilado (ver boardMapData)
+BOARD_CACHE = dict()
+
+# Hash del contenido de cada zip ya leído, indexado por (ruta, tamaño, fecha de modificación)
+BOARD_HASHES = dict()
+
+def loadBoard(filename, cache=True):
+    """
+    Loads a RiskBoard from the given filename
+    With cache=True the XML of each map is parsed only once: the compiled map is kept in this process (BOARD_CACHE)
+    and on disk (see boardCachePath), keyed by the hash of the zip contents. Every call returns a new RiskBoard
+    (without players), which shares the read-only RiskBoardIndex with the other boards of the same map
+    """
+    if not cache:
+        return parseBoard(filename)
+    
+    digest = boardHash(filename)
+    data = BOARD_CACHE.get(digest)
+    if data is None:
+        board = readBoardCache(filename, digest)
+        if board is None:
+            board = parseBoard(filename)
+            writeBoardCache(filename, digest, board)
+        data = BOARD_CACHE[digest] = boardMapData(board)
+    return boardFromMapData(data)
+
+def boardHash(filename):
+    """SHA-1 of the contents of the map file (only read again if its size or modification time change)"""
+    st = os.stat(filename)
+    key = (os.path.abspath(filename), st.st_size, st.st_mtime_ns)
+    digest = BOARD_HASHES.get(key)
+    if digest is None:
+        with open(filename, 'rb') as f:
+            digest = BOARD_HASHES[key] = hashlib.sha1(f.read()).hexdigest()
+    return digest
+
+def boardCachePath(filename, digest):
+    """File of the on-disk cache of the map: __pycache__ next to the zip, named after the zip and its hash"""
+    folder = os.path.join(os.path.dirname(os.path.abspath(filename)), '__pycache__')
+    return os.path.join(folder, '%s.%s.board' % (os.path.basename(filename), digest[:16]))
+
+def readBoardCache(filename, digest):
+    """RiskBoard saved in the on-disk cache of the map (in RiskBoard.to_string format), or None if there is none"""
+    try:
+        with open(boardCachePath(filename, digest), encoding='utf-8') as f:
+            s = f.read()
+        if not s.startswith('RISKBOARD|'):
+            return None
+        board = RiskBoard()
+        board.from_string(s)
+        return board
+    except (OSError, ValueError, IndexError):
+        return None
+
+def writeBoardCache(filename, digest, board):
+    """Saves the map of board in the on-disk cache (if the folder can't be written the cache is just skipped)"""
+    path = boardCachePath(filename, digest)
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(board.to_string())
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+def boardMapData(board):
+    """Compiled map of a board (without players): territories with their neighbors, continents and the RiskBoardIndex"""
+    territories = tuple((t.name, tuple(t.neighbors)) for t in board.territories)
+    continents = tuple((c.name, c.reward, tuple(c.territories)) for c in board.continents.values())
+    return territories, continents, board.index
+
+def boardFromMapData(data):
+    """New RiskBoard with the map of boardMapData (same ids and neighbor order as the parsed board)"""
+    territories, continents, index = data
+    board = RiskBoard()
+    for tid, (name, neighbors) in enumerate(territories):
+        t = RiskTerritory(name, tid)
+        t.neighbors = list(neighbors)
+        board.add_territory(t)
+    for name, reward, ids in continents:
+        c = RiskContinent(name, reward)
+        c.territories = list(ids)
+        board.add_continent(c)
+    board.compile_index(index)
+    return board
+
+def parseBoard(filename):
+    """Loads a RiskBoard from the given filename, parsing its territory.xml"""
     
     #Open the zip file to get map data
     zfile = zipfile.ZipFile(filename)
@@ -409,6 +722,9 @@ def loadBoard(filename):
     #Close the zip file
     zfile.close()
 
+    #Precompile the adjacency and continent index used by the engine
+    board.compile_index()
+
     return board
     
 def loadTerritories(zfile, board):
@@ -0,0 +1,114 @@
+"""
+Torneos en paralelo para play_risk_ai.py, PPO/play_rl_vs_rl.py y PPO/play_rl_vs_heuristics.py
+
+Las partidas de un torneo se reparten entre un pool de procesos. Cada proceso carga una sola vez sus propias
+IAs (módulos de IA o modelos PPO, que no se pueden mandar entre procesos) con la función de carga del script,
+y juega las partidas que le tocan. Antes de cada partida se siembran random (y numpy, si está cargado) con la
+semilla de la partida, así que el resultado de una partida no depende del proceso que la juegue ni del
+número de procesos. Los resultados vuelven según terminan las partidas.
+
+Con un solo proceso las partidas se juegan en el proceso principal, como siempre.
+"""
+import os
+import sys
+import time
+import random
+import multiprocessing
+
+
+class TournamentGame():
+    """Una partida del torneo"""
+    def __init__(self, number, names, order, seed):
+        self.number = number
+        """ Posición de la partida en el torneo (empieza en 0) """
+
+        self.names = names
+        """ Nombres de los jugadores, en el orden en que juegan """
+
+        self.order = order
+        """ Índice en la lista de IAs cargadas de la IA de cada puesto """
+
+        self.seed = seed
+        """ Semilla de random (y numpy) de la partida """
+
+
+def game_seeds(n_games, seed=None):
+    """Semillas de n_games partidas: seed, seed+1... o, sin seed, sacadas del generador random"""
+    if seed is None:
+        return [random.randrange(2**31) for _ in range(n_games)]
+    return [seed + i for i in range(n_games)]
+
+
+_worker_ais = None
+""" IAs cargadas en este proceso del pool """
+
+_worker_error = None
+""" Error al cargar las IAs en este proceso (se relanza en la primera partida) """
+
+
+def _init_worker(load_ais, load_args, quiet):
+    global _worker_ais, _worker_error
+    if quiet:
+        # Sin la salida de cada partida: el proceso principal informa de los resultados
+        sys.stdout = open(os.devnull, 'w')
+    try:
+        _worker_ais = load_ais(*load_args)
+    except Exception as e:
+        # Si el initializer fallara, el pool volvería a lanzar el proceso una y otra vez
+        _worker_error = e
+
+
+def _play(ais, play_one, game, play_args):
+    """Juega game con las IAs dadas, después de sembrar los generadores con su semilla"""
+    random.seed(game.seed)
+    if 'numpy' in sys.modules:
+        sys.modules['numpy'].random.seed(game.seed % 2**32)
+    return play_one(ais, game, *play_args)
+
+
+def _play_in_worker(task):
+    play_one, game, play_args = task
+    if _worker_error is not None:
+        raise _worker_error
+    return game, _play(_worker_ais, play_one, game, play_args)
+
+
+def run_tournament(games, load_ais, load_args, play_one, on_result, n_workers=1, play_args=(), quiet=True, start_method=None):
+    """
+    Juega las partidas de games (TournamentGame) en n_workers procesos.
+
+    load_ais(*load_args) carga las IAs (una vez en cada proceso) y play_one(ais, game, *play_args) juega una partida
+    y devuelve su resultado; on_result(game, result) se llama en el proceso principal cada vez que termina una partida.
+    load_ais y play_one deben ser funciones de nivel de módulo (se mandan por nombre a los procesos).
+    Con quiet se descarta lo que imprimen los procesos del pool.
+    Devuelve el tiempo total en segundos e imprime el ritmo del torneo (partidas por minuto).
+    """
+    games = list(games)
+    start = time.perf_counter()
+    played = 0
+
+    def report(game, result):
+        nonlocal played
+        played += 1
+        on_result(game, result)
+        elapsed = time.perf_counter() - start
+        print(f'[TORNEO] {played}/{len(games)} partidas ({60.0 * played / elapsed:.1f} partidas/min)')
+
+    n_workers = max(1, min(n_workers, len(games)))
+    if n_workers == 1:
+        ais = load_ais(*load_args)
+        for game in games:
+            report(game, _play(ais, play_one, game, play_args))
+    else:
+        if start_method is None:
+            # forkserver y spawn no heredan nada del proceso padre (ni modelos ni estado de torch)
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        ctx = multiprocessing.get_context(start_method)
+        with ctx.Pool(n_workers, initializer=_init_worker, initargs=(load_ais, load_args, quiet)) as pool:
+            for game, result in pool.imap_unordered(_play_in_worker, [(play_one, game, play_args) for game in games]):
+                report(game, result)
+
+    elapsed = time.perf_counter() - start
+    rate = 60.0 * len(games) / elapsed if elapsed > 0 else 0.0
+    print(f'[TORNEO] {len(games)} partidas en {elapsed:.1f} s con {n_workers} procesos: {rate:.1f} partidas/min')
+    return elapsed